@@ -78,6 +78,7 @@ class CfgFunction(DbAugment):
                 newfunc.source = newfunc.source.replace(pat, repl)
             if '{{' in newfunc.name:
                 newfunc.name = newfunc.name.replace(pat, repl)
+                newfunc.reset_key()
             if '{{' in newfunc.description:
                 newfunc.description = newfunc.description.replace(pat, repl)
         return newfunc
@@ -27,6 +27,7 @@ class CfgTrigger(DbAugment):
         newtrg._iscfg = True
         if newtrg.name.startswith('{{table_name}}'):
             newtrg.name = newtrg.name.replace(newtrg.name[:14], table.name)
+            newtrg.reset_key()
         newtrg._table = table
         if not hasattr(table, 'triggers'):
             table.triggers = {}
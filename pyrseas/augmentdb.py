@@ -13,6 +13,7 @@
     method.
 """
 from pyrseas.database import Database
+from pyrseas.lib.trace import phase, traced
 from pyrseas.dbobject.language import Language
 from pyrseas.augment.schema import AugSchemaDict
 from pyrseas.augment.table import AugClassDict
@@ -81,6 +82,7 @@ class AugmentDatabase(Database):
             if lang not in self.current.languages:
                 self.current.languages[lang] = Language(lang)
 
+    @traced
     def from_augmap(self, aug_map):
         """Populate the augment objects from the input augment map
 
@@ -140,6 +142,7 @@ class AugmentDatabase(Database):
         if not self.db:
             self.from_catalog()
         self.from_augmap(aug_map)
-        for sch in self.adb.schemas:
-            self.adb.schemas[sch].apply(self.adb)
+        with phase("augment"):
+            for sch in self.adb.schemas:
+                self.adb.schemas[sch].apply(self.adb)
         return self.to_map()
@@ -5,9 +5,9 @@ import os
 from argparse import ArgumentParser, FileType
 import getpass
 
-import yaml
-
 from pyrseas.config import Config
+from pyrseas.lib import trace
+from pyrseas.yamlutil import yamlload
 
 _cfg = None
 
@@ -46,14 +46,16 @@ def cmd_parser(description, version):
     :param description: text to display before the argument help
     :param version: version of the caller
     :return: the created parser
+
+    A new configuration is read for each parser, so that a utility run
+    in-process does not see the options of an earlier run.
     """
     global _cfg
 
     parent = ArgumentParser(add_help=False)
     parent.add_argument('dbname', help='database name')
     group = parent.add_argument_group('Connection options')
-    if _cfg is None:
-        _cfg = Config()
+    _cfg = Config()
     dbcfg = _cfg['database'] if 'database' in _cfg else {}
     group.add_argument('-H', '--host', **_help_dflt('host', dbcfg))
     group.add_argument('-p', '--port', type=int, **_help_dflt('port', dbcfg))
@@ -66,19 +68,37 @@ def cmd_parser(description, version):
                         help="root of repository (default %(default)s)")
     parent.add_argument('-o', '--output', type=FileType('w'),
                         help="output file name (default stdout)")
+    parent.add_argument('--profile', metavar='FILE',
+                        help="save the duration, CPU time and peak memory "
+                        "of each processing phase to a trace file")
+    parent.add_argument('--record-queries', metavar='FILE',
+                        help="save the queries and their results to a file, "
+                        "for replay without a server")
     parser = ArgumentParser(parents=[parent], description=description)
     parser.add_argument('--version', action='version',
                         version='%(prog)s ' + '%s' % version)
     return parser
 
 
-def parse_args(parser):
+def parse_args(parser, argv=None):
     """Parse command line arguments and return configuration object
 
     :param parser: ArgumentParser created by cmd_parser
+    :param argv: list of arguments (default sys.argv[1:])
     :return: a Configuration object
+
+    The profiling and query recording of an earlier run in the same
+    process are stopped.
     """
-    arg_opts = parser.parse_args()
+    arg_opts = parser.parse_args(argv)
+    from pyrseas.lib.dbconn import DbConnection
+    DbConnection.recorder = None
+    trace.stop()
+    if arg_opts.profile:
+        trace.start()
+    if arg_opts.record_queries:
+        from pyrseas.lib import replay
+        replay.record_to()
     args = vars(arg_opts)
     for key in ['database', 'files']:
         if key not in _cfg:
@@ -97,7 +117,8 @@ def parse_args(parser):
         tfr('files', key, args[key])
 
     if 'config' in _cfg['files'] and _cfg['files']['config']:
-        _cfg.merge(yaml.safe_load(_cfg['files']['config']))
+        with trace.phase("load config"):
+            _cfg.merge(yamlload(_cfg['files']['config']))
     if 'repository' in args:
         if args['repository'] != os.getcwd():
             _cfg['repository']['path'] = args['repository']
@@ -108,3 +129,22 @@ def parse_args(parser):
 
     _cfg['options'] = arg_opts
     return _cfg
+
+
+def finish_run(cfg):
+    """Save the profiling trace and recorded queries of a run
+
+    :param cfg: the Configuration object returned by parse_args
+
+    Profiling and query recording are then stopped.
+    """
+    from pyrseas.lib.dbconn import DbConnection
+    options = cfg['options']
+    try:
+        if options.profile:
+            trace.save(options.profile)
+        if options.record_queries and DbConnection.recorder is not None:
+            DbConnection.recorder.save(options.record_queries)
+    finally:
+        DbConnection.recorder = None
+        trace.stop()
@@ -4,10 +4,11 @@
 import os
 import sys
 
-import yaml
+from pyrseas.lib import binfile
 
 
 CFG_FILE = os.environ.get("PYRSEAS_CONFIG_FILE", "config.yaml")
+CACHE_KIND = 'config'
 
 
 def _home_dir():
@@ -18,17 +19,39 @@ def _home_dir():
     return os.path.abspath(dir)
 
 
-def _load_cfg(cfgdir):
-    cfgpath = ''
+def _cfg_path(cfgdir):
+    """Return the path of a configuration file, which may not exist
+
+    :param cfgdir: directory or file path (or None)
+    :return: path, or '' if there is none
+    """
+    if not cfgdir:
+        return ''
+    if os.path.isfile(cfgdir):
+        return cfgdir
+    return os.path.join(cfgdir, CFG_FILE)
+
+
+def _file_stamp(path):
+    """Return the identity of a file's current version
+
+    :param path: file path
+    :return: tuple of path, modification time and size (None if the
+             file does not exist)
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (path, None, None)
+    return (path, st.st_mtime_ns, st.st_size)
+
+
+def _load_cfg(cfgpath):
     cfg = {}
-    if cfgdir is not None:
-        if os.path.isdir(cfgdir):
-            cfgpath = os.path.join(cfgdir, CFG_FILE)
-        elif os.path.isfile(cfgdir):
-            cfgpath = cfgdir
-        if os.path.exists(cfgpath):
-            with open(cfgpath) as f:
-                cfg = yaml.safe_load(f)
+    if cfgpath and os.path.exists(cfgpath):
+        from pyrseas.yamlutil import yamlload
+        with open(cfgpath) as f:
+            cfg = yamlload(f)
     return cfg
 
 
@@ -36,18 +59,54 @@ class Config(dict):
     "A configuration dictionary"
 
     def __init__(self, sys_only=False):
-        self.update(_load_cfg(
-            os.environ.get("PYRSEAS_SYS_CONFIG", os.path.abspath(os.path.join(
-                           os.path.dirname(__file__))))))
-        if sys_only:
+        syspath = _cfg_path(os.environ.get(
+            "PYRSEAS_SYS_CONFIG", os.path.abspath(os.path.join(
+                os.path.dirname(__file__)))))
+        userpath = None
+        if not sys_only:
+            userpath = _cfg_path(os.environ.get(
+                "PYRSEAS_USER_CONFIG", os.path.join(_home_dir(), 'pyrseas')))
+        cachepath = os.path.join(binfile.cache_dir(), CACHE_KIND,
+                                 binfile.digest(syspath, repr(userpath),
+                                                os.getcwd()))
+        if self._load_cache(cachepath):
             return
-        self.merge(_load_cfg(os.environ.get("PYRSEAS_USER_CONFIG",
-                             os.path.join(_home_dir(), 'pyrseas'))))
-        if 'repository' in self and 'path' in self['repository']:
-            cfgpath = self['repository']['path']
-        else:
-            cfgpath = os.getcwd()
-        self.merge(_load_cfg(cfgpath))
+        stamps = [_file_stamp(syspath)]
+        self.update(_load_cfg(syspath))
+        if not sys_only:
+            stamps.append(_file_stamp(userpath))
+            self.merge(_load_cfg(userpath))
+            if 'repository' in self and 'path' in self['repository']:
+                cfgpath = self['repository']['path']
+            else:
+                cfgpath = os.getcwd()
+            repopath = _cfg_path(cfgpath)
+            stamps.append(_file_stamp(repopath))
+            self.merge(_load_cfg(repopath))
+        try:
+            binfile.save(cachepath, CACHE_KIND, {'files': stamps,
+                                                 'config': dict(self)})
+        except Exception:
+            pass
+
+    def _load_cache(self, path):
+        """Load the configuration saved by a previous run, if still valid
+
+        :param path: file name/path of the cached configuration
+        :return: True if the configuration was loaded
+
+        The cached configuration is only used if none of the files it
+        was merged from has been modified, created or removed since.
+        """
+        try:
+            cached = binfile.load(path, CACHE_KIND)
+        except Exception:
+            return False
+        if any(_file_stamp(stamp[0]) != tuple(stamp)
+               for stamp in cached['files']):
+            return False
+        self.update(cached['config'])
+        return True
 
     def merge(self, cfg):
         """Merge extra configuration
@@ -10,39 +10,76 @@
     system catalogs.  The `ndb` Dicts object defines the schemas based
     on the `input_map` supplied to the `from_map` method.
 """
+import asyncio
+import copy
 import os
 import sys
+from importlib import import_module
 from operator import itemgetter
 from collections import defaultdict, deque
-import yaml
-
-from pyrseas.lib.dbconn import DbConnection
-
-from pyrseas.yamlutil import yamldump
-from pyrseas.dbobject import fetch_reserved_words, DbObjectDict, DbSchemaObject
-from pyrseas.dbobject.language import LanguageDict
-from pyrseas.dbobject.cast import CastDict
-from pyrseas.dbobject.schema import SchemaDict
-from pyrseas.dbobject.dbtype import TypeDict
-from pyrseas.dbobject.table import ClassDict
-from pyrseas.dbobject.column import ColumnDict
-from pyrseas.dbobject.constraint import ConstraintDict
-from pyrseas.dbobject.index import IndexDict
-from pyrseas.dbobject.function import ProcDict
-from pyrseas.dbobject.operator import OperatorDict
-from pyrseas.dbobject.operclass import OperatorClassDict
-from pyrseas.dbobject.operfamily import OperatorFamilyDict
-from pyrseas.dbobject.rule import RuleDict
-from pyrseas.dbobject.trigger import TriggerDict
-from pyrseas.dbobject.conversion import ConversionDict
-from pyrseas.dbobject.textsearch import TSConfigurationDict, TSDictionaryDict
-from pyrseas.dbobject.textsearch import TSParserDict, TSTemplateDict
-from pyrseas.dbobject.foreign import ForeignDataWrapperDict
-from pyrseas.dbobject.foreign import ForeignServerDict, UserMappingDict
-from pyrseas.dbobject.foreign import ForeignTableDict
-from pyrseas.dbobject.extension import ExtensionDict
-from pyrseas.dbobject.collation import CollationDict
-from pyrseas.dbobject.eventtrig import EventTriggerDict
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+
+from pyrseas import __version__
+from pyrseas.lib import binfile, replay
+from pyrseas.lib.dbconn import AsyncDbConnection, DbConnection
+from pyrseas.lib.trace import phase, traced
+
+from pyrseas.yamlutil import yamldump, yamlload
+from pyrseas.dbobject import fetch_reserved_words, set_reserved_words
+from pyrseas.dbobject import RESERVED_WORDS_QUERY
+from pyrseas.dbobject import DbSchemaObject
+
+DICT_CLASSES = [
+    ('schemas', 'schema', 'SchemaDict'),
+    ('extensions', 'extension', 'ExtensionDict'),
+    ('languages', 'language', 'LanguageDict'),
+    ('casts', 'cast', 'CastDict'),
+    ('types', 'dbtype', 'TypeDict'),
+    ('tables', 'table', 'ClassDict'),
+    ('columns', 'column', 'ColumnDict'),
+    ('constraints', 'constraint', 'ConstraintDict'),
+    ('indexes', 'index', 'IndexDict'),
+    ('functions', 'function', 'ProcDict'),
+    ('operators', 'operator', 'OperatorDict'),
+    ('operclasses', 'operclass', 'OperatorClassDict'),
+    ('operfams', 'operfamily', 'OperatorFamilyDict'),
+    ('rules', 'rule', 'RuleDict'),
+    ('triggers', 'trigger', 'TriggerDict'),
+    ('conversions', 'conversion', 'ConversionDict'),
+    ('tstempls', 'textsearch', 'TSTemplateDict'),
+    ('tsdicts', 'textsearch', 'TSDictionaryDict'),
+    ('tsparsers', 'textsearch', 'TSParserDict'),
+    ('tsconfigs', 'textsearch', 'TSConfigurationDict'),
+    ('fdwrappers', 'foreign', 'ForeignDataWrapperDict'),
+    ('servers', 'foreign', 'ForeignServerDict'),
+    ('usermaps', 'foreign', 'UserMappingDict'),
+    ('ftables', 'foreign', 'ForeignTableDict'),
+    ('collations', 'collation', 'CollationDict'),
+    ('eventtrigs', 'eventtrig', 'EventTriggerDict')]
+"""Attribute, pyrseas.dbobject module and class of each `Dicts` member"""
+
+_dict_classes = {}
+
+
+def dict_class(attr):
+    """Return the class of a `Dicts` member, importing its module
+
+    :param attr: attribute name, e.g., 'tables'
+    :return: DbObjectDict-derived class
+
+    The object type modules are only imported when first needed, so
+    that, e.g., printing the help of a command does not load them.
+    """
+    if attr not in _dict_classes:
+        for (name, module, clsname) in DICT_CLASSES:
+            if name == attr:
+                break
+        else:
+            raise KeyError(attr)
+        _dict_classes[attr] = getattr(import_module(
+            'pyrseas.dbobject.' + module), clsname)
+    return _dict_classes[attr]
 
 
 def flatten(lst):
@@ -55,76 +92,352 @@ def flatten(lst):
             yield elem
 
 
+def _load_batches(stmts):
+    """Group statements into batches that may be executed concurrently
+
+    :param stmts: list of SQL statements and data copy tuples
+    :return: list of tuples (concurrent flag, list of statement lists)
+
+    A data copy, together with the TRUNCATE preceding it, a data sync
+    through the staging table, and a foreign key validation are each
+    independent of other statements of the same kind next to them.
+    Any other statement forms a batch of its own, to be executed
+    serially.
+    """
+    from pyrseas.dbobject.table import STAGE_TABLE
+
+    batches = []
+    i = 0
+    while i < len(stmts):
+        stmt = stmts[i]
+        kind = None
+        unit = [stmt]
+        if isinstance(stmt, tuple):
+            kind = 'load'
+        elif stmt.startswith("TRUNCATE ONLY ") and i + 1 < len(stmts) \
+                and isinstance(stmts[i + 1], tuple):
+            kind = 'load'
+            unit.append(stmts[i + 1])
+            i += 1
+        elif stmt.startswith("CREATE TEMP TABLE %s " % STAGE_TABLE):
+            kind = 'load'
+            while i + 1 < len(stmts) and \
+                    stmts[i] != "DROP TABLE %s" % STAGE_TABLE:
+                i += 1
+                unit.append(stmts[i])
+        elif stmt.startswith("ALTER TABLE ") and \
+                " VALIDATE CONSTRAINT " in stmt:
+            kind = 'validate'
+        i += 1
+        if batches and kind is not None and batches[-1][0] == kind:
+            batches[-1][1].append(unit)
+        else:
+            batches.append((kind, [unit]))
+    return [(kind is not None, units) for (kind, units) in batches]
+
+
+CURRENT_SCHEMAS_QUERY = "SELECT current_schemas(false)"
+
+EXT_LANGS_QUERY = """SELECT lanname FROM pg_language l
+                       JOIN pg_depend p ON (l.oid = p.objid)
+                     WHERE deptype = 'e' """
+"""Query returning the languages installed by extensions"""
+
+
+def search_path_stmt(schemas):
+    """Return the statement restricting the search path to pg_catalog
+
+    :param schemas: current schemas of the search path
+    :return: SQL statement
+
+    Schemas other than public, e.g., from the role settings, are kept
+    after pg_catalog.
+    """
+    addschs = [sch for sch in schemas if sch != "public"]
+    srch_path = "pg_catalog"
+    if addschs:
+        srch_path += ", " + ", ".join(addschs)
+    return "set search_path to %s" % srch_path
+
+
 class CatDbConnection(DbConnection):
     """A database connection, specialized for querying catalogs"""
 
+    _version = None
+    _schema_rows = None
+
     def connect(self):
         """Connect to the database"""
         super(CatDbConnection, self).connect()
-        schs = self.fetchall("SELECT current_schemas(false)")
-        addschs = [sch for sch in schs[0]["current_schemas"] if sch != "public"]
-        srch_path = "pg_catalog"
-        if addschs:
-            srch_path += ", " + ", ".join(addschs)
-        self.execute("set search_path to %s" % srch_path)
+        self._set_search_path()
+
+    def _set_search_path(self):
+        """Restrict the search path of a new connection to pg_catalog
+
+        Schemas other than public, e.g., from the role settings, are
+        kept after pg_catalog.
+        """
+        schs = self.fetchall(CURRENT_SCHEMAS_QUERY)
+        self.execute(search_path_stmt(schs[0]["current_schemas"]))
+        # the catalogs are unchanged: keep the rows memoized before
+        # a reconnection
+        memo = self._schema_rows
         self.commit()
+        self._schema_rows = memo
         self._version = self.conn.info.server_version
 
+    def clone(self):
+        """Return a new, not yet connected, connection to the same database
+
+        :return: CatDbConnection object
+
+        Memoized catalog rows are not shared with the new connection.
+        """
+        dbconn = super(CatDbConnection, self).clone()
+        dbconn._schema_rows = None
+        return dbconn
+
+    def commit(self):
+        """Commit the current transaction
+
+        Catalog rows memoized before the commit are discarded, since
+        the committed statements may have changed the catalogs.
+        """
+        super(CatDbConnection, self).commit()
+        self.invalidate_schema_rows()
+
+    def invalidate_schema_rows(self):
+        """Discard the memoized catalog rows
+
+        This should be called after the catalogs are changed by other
+        means than this connection's :meth:`commit`.
+        """
+        self._schema_rows = None
+
+    def fetch_schema_rows(self, query, column, schemas):
+        """Execute a catalog query for some schemas, memoizing the rows
+
+        :param query: a SELECT query returning a schema name column
+        :param column: name of the schema name column
+        :param schemas: list of schema names
+        :return: list of rows, in query order within each schema
+
+        Only the schemas not yet fetched with the same query are
+        queried from the server.  The schema condition is placed on a
+        plain subquery so that the server pushes it down into the
+        catalog scans, rather than running the query over the whole
+        database.  The memoized rows are discarded on commit or by
+        calling :meth:`invalidate_schema_rows`.
+        """
+        memo = self._schema_rows or {}
+        missing = [sch for sch in schemas if (query, sch) not in memo]
+        if missing:
+            data = self.fetchall(
+                "SELECT * FROM (%s) q WHERE q.%s::text = ANY(%%s)" % (
+                    query.replace('%', '%%'), column), (missing, ))
+            self.rollback()
+            for sch in missing:
+                memo[(query, sch)] = []
+            for row in data:
+                memo[(query, row[column])].append(row)
+        self._schema_rows = memo
+        rows = []
+        for sch in schemas:
+            rows.extend(memo[(query, sch)])
+        return rows
+
     @property
     def version(self):
         "The server's version number"
-        if self.conn is None:
+        if self._version is None:
             self.connect()
         return self._version
 
 
+class ReplayDbConnection(CatDbConnection):
+    """A catalog connection serving previously recorded query results
+
+    The results are those saved by a
+    :class:`~pyrseas.lib.replay.QueryRecorder`, so that catalogs can
+    be processed without a server.  If a query was recorded several
+    times, the results are returned in the order they were recorded,
+    the last one being repeated.
+    """
+
+    def __init__(self, path):
+        """Initialize the connection
+
+        :param path: file name/path of the recorded queries, or a
+                     dictionary as loaded by :func:`replay.load`
+        """
+        recording = path if isinstance(path, dict) else replay.load(path)
+        super(ReplayDbConnection, self).__init__(recording['dbname'])
+        self._recorded_version = recording['version']
+        self.results = defaultdict(list)
+        for (key, rows) in recording['queries']:
+            self.results[tuple(key)].append(rows)
+        self.served = defaultdict(int)
+
+    def connect(self):
+        """Pretend to connect to the database"""
+        self._version = self._recorded_version
+
+    def close(self):
+        """Pretend to close the database connection"""
+
+    def commit(self):
+        """Pretend to commit the current transaction"""
+
+    def rollback(self):
+        """Pretend to roll back the current transaction"""
+
+    def _result(self, query, args):
+        key = replay.query_key(query, args)
+        if key not in self.results:
+            raise KeyError("Query was not recorded: %s" % query)
+        results = self.results[key]
+        n = self.served[key]
+        self.served[key] = n + 1
+        return copy.deepcopy(results[min(n, len(results) - 1)])
+
+    def execute(self, query, args=None):
+        """Execute a query, if it was recorded
+
+        :param query: text of the statement to execute
+        :param args: arguments to query
+        """
+        self._result(query, args)
+
+    def fetchone(self, query, args=None):
+        """Return the row recorded for a single row SELECT query
+
+        :param query: a SELECT query
+        :param args: arguments to query
+        :return: a row dictionary
+        """
+        return self._result(query, args)
+
+    def fetchall(self, query, args=None):
+        """Return the rows recorded for a SELECT query
+
+        :param query: a SELECT query
+        :param args: arguments to query
+        :return: a list of row dictionaries
+        """
+        return self._result(query, args)
+
+    def sql_copy_to(self, sql, path):
+        """Data cannot be copied without a server"""
+        raise ValueError("Cannot copy data through a replayed connection")
+
+    def copy_from(self, path, table, bufsize=None, use_mmap=False,
+                  binary=False):
+        """Data cannot be copied without a server"""
+        raise ValueError("Cannot copy data through a replayed connection")
+
+
+class _PrefetchedDbConnection(ReplayDbConnection):
+    """A catalog connection serving rows fetched by an AsyncDbConnection
+
+    The rows of all the queries needed are fetched beforehand, by
+    :class:`AsyncDatabase`.  Any other query, e.g., one looking up a
+    single object, is an error.
+    """
+
+    def __init__(self, aconn, version, results):
+        """Initialize the connection
+
+        :param aconn: the AsyncDbConnection that fetched the rows
+        :param version: the server's version number
+        :param results: dictionary of lists of rows, keyed by
+                        :func:`replay.query_key`
+        """
+        self.__dict__.update(aconn.__getstate__())
+        self._recorded_version = self._version = version
+        self.results = results
+
+    def clone(self):
+        """Return a new, not yet connected, connection to the same database
+
+        :return: CatDbConnection object
+
+        The new connection is a regular, blocking, connection.
+        """
+        dbconn = CatDbConnection.__new__(CatDbConnection)
+        dbconn.__dict__.update(DbConnection.__getstate__(self))
+        return dbconn
+
+    def _result(self, query, args):
+        key = replay.query_key(query, args)
+        if key not in self.results:
+            raise KeyError("Query was not prefetched by AsyncDatabase: %s" %
+                           query)
+        return copy.deepcopy(self.results[key])
+
+    def fetchone(self, query, args=None):
+        """Return the first row fetched for a SELECT query
+
+        :param query: a SELECT query
+        :param args: arguments to query
+        :return: a row dictionary, or None
+        """
+        rows = self._result(query, args)
+        return rows[0] if rows else None
+
+    def fetch_schema_rows(self, query, column, schemas):
+        """Return the rows fetched for a catalog query, for some schemas
+
+        :param query: a SELECT query returning a schema name column
+        :param column: name of the schema name column
+        :param schemas: list of schema names
+        :return: list of rows, in query order within each schema
+        """
+        rows = self._result(query, None)
+        return [row for sch in schemas for row in rows if row[column] == sch]
+
+
 class Database(object):
     """A database definition, from its catalogs and/or a YAML spec."""
 
     class Dicts(object):
         """A holder for dictionaries (maps) describing a database"""
 
-        def __init__(self, dbconn=None, single_db=False):
+        def __init__(self, dbconn=None, single_db=False, schemas=None):
             """Initialize the various DbObjectDict-derived dictionaries
 
             :param dbconn: a DbConnection object
+            :param schemas: list of schemas whose objects are to be
+                            fetched (default all)
+
+            Without a connection, each dictionary is only created, and
+            its module imported, when it is first used.
             """
-            self.schemas = SchemaDict(dbconn)
-            self.extensions = ExtensionDict(dbconn)
-            self.languages = LanguageDict(dbconn)
-            self.casts = CastDict(dbconn)
-            self.types = TypeDict(dbconn)
-            self.tables = ClassDict(dbconn)
-            self.columns = ColumnDict(dbconn)
-            self.constraints = ConstraintDict(dbconn)
-            self.indexes = IndexDict(dbconn)
-            self.functions = ProcDict(dbconn)
-            self.operators = OperatorDict(dbconn)
-            self.operclasses = OperatorClassDict(dbconn)
-            self.operfams = OperatorFamilyDict(dbconn)
-            self.rules = RuleDict(dbconn)
-            self.triggers = TriggerDict(dbconn)
-            self.conversions = ConversionDict(dbconn)
-            self.tstempls = TSTemplateDict(dbconn)
-            self.tsdicts = TSDictionaryDict(dbconn)
-            self.tsparsers = TSParserDict(dbconn)
-            self.tsconfigs = TSConfigurationDict(dbconn)
-            self.fdwrappers = ForeignDataWrapperDict(dbconn)
-            self.servers = ForeignServerDict(dbconn)
-            self.usermaps = UserMappingDict(dbconn)
-            self.ftables = ForeignTableDict(dbconn)
-            self.collations = CollationDict(dbconn)
-            self.eventtrigs = EventTriggerDict(dbconn)
-
-            # Populate a map from system catalog to the respective dict
-            self._catalog_map = {}
-            for _, d in self.all_dicts(single_db):
-                if d.cls.catalog is not None:
-                    self._catalog_map[d.cls.catalog] = d
+            if dbconn is not None:
+                for (attr, _, _) in DICT_CLASSES:
+                    setattr(self, attr, dict_class(attr)(dbconn, schemas))
+
+            # Map from system catalog to the respective dict, populated
+            # when first needed
+            self._single_db = single_db
+            self._catalog_map = None
 
             # Map from objects extkey to their (dict name, key)
             self._extkey_map = {}
 
+        def __getattr__(self, attr):
+            """Create an empty dictionary on first use
+
+            :param attr: attribute name, e.g., 'tables'
+            :return: DbObjectDict object
+            """
+            try:
+                cls = dict_class(attr)
+            except KeyError:
+                raise AttributeError(attr)
+            objdict = cls()
+            setattr(self, attr, objdict)
+            return objdict
+
         def _get_by_extkey(self, extkey):
             """Return any database item from its extkey
 
@@ -159,15 +472,15 @@ class Database(object):
             :return: list of tuples
             """
             rv = []
-            for attr in self.__dict__:
+            for (attr, _, _) in DICT_CLASSES:
+                # skip ColumnDict as not needed for dependency tracking
+                # and internally has lists, not objects
+                if attr == 'columns':
+                    continue
                 d = getattr(self, attr)
                 if non_empty and len(d) == 0:
                     continue
-                if isinstance(d, DbObjectDict):
-                    # skip ColumnDict as not needed for dependency tracking
-                    # and internally has lists, not objects
-                    if not isinstance(d, ColumnDict):
-                        rv.append((attr, d))
+                rv.append((attr, d))
 
             # first return the dicts for non-schema objects, then the
             # others, each group sorted alphabetically.
@@ -182,6 +495,11 @@ class Database(object):
             :param catalog: full name of a pg_ catalog
             :return: DbObjectDict object
             """
+            if self._catalog_map is None:
+                self._catalog_map = {}
+                for _, d in self.all_dicts(self._single_db):
+                    if d.cls.catalog is not None:
+                        self._catalog_map[d.cls.catalog] = d
             return self._catalog_map.get(catalog)
 
         def find_type(self, name):
@@ -196,26 +514,41 @@ class Database(object):
             rv = self.tables.find(name)
             return rv
 
-    def __init__(self, config):
+    def __init__(self, config, dbconn=None):
         """Initialize the database
 
         :param config: configuration dictionary
+        :param dbconn: a CatDbConnection, e.g., a ReplayDbConnection
+                       (default: one created from the configuration)
         """
-        db = config['database']
-        self.dbconn = CatDbConnection(db['dbname'], db['username'],
-                                      db['password'], db['host'], db['port'])
+        if dbconn is None:
+            db = config['database']
+            dbconn = CatDbConnection(db['dbname'], db['username'],
+                                     db['password'], db['host'], db['port'],
+                                     db.get('pool'))
+        self.dbconn = dbconn
         self.db = None
         self.config = config
+        self._ext_langs = None
+        self._spec_cache = None
+        self._loaded_schemas = None
 
+    def _extension_langs(self):
+        """Return the names of the languages installed by extensions
+
+        :return: list of language names
+        """
+        if self._ext_langs is None:
+            self._ext_langs = []
+            if self.dbconn.version >= 90100:
+                self._ext_langs = [lang["lanname"] for lang in
+                                   self.dbconn.fetchall(EXT_LANGS_QUERY)]
+        return self._ext_langs
+
+    @traced
     def _link_refs(self, db):
         """Link related objects"""
-        langs = []
-        if self.dbconn.version >= 90100:
-            langs = [lang["lanname"] for lang in self.dbconn.fetchall(
-                """SELECT lanname FROM pg_language l
-                     JOIN pg_depend p ON (l.oid = p.objid)
-                    WHERE deptype = 'e' """)]
-        db.languages.link_refs(db.functions, langs)
+        db.languages.link_refs(db.functions, self._extension_langs())
         copycfg = {}
         if 'datacopy' in self.config:
             copycfg = self.config['datacopy']
@@ -229,13 +562,18 @@ class Database(object):
         db.types.link_refs(db.columns, db.constraints, db.functions)
         db.constraints.link_refs(db)
 
-    def _build_dependency_graph(self, db, dbconn):
-        """Build the dependency graph of the database objects
+    @staticmethod
+    def _dependency_queries(oids=None):
+        """Return the queries used to build the dependency graph
 
-        :param db: dictionary of dictionary of all objects
-        :param dbconn: a DbConnection object
+        :param oids: list of the object OIDs whose dependencies are
+                     needed (default all)
+        :return: list of tuples (query, arguments), each query
+                 returning class_name, objid, refclass and refobjid
         """
-        alldeps = defaultdict(list)
+        args = None
+        if oids is not None:
+            args = (oids, )
 
         # This query wanted to be simple. it got complicated because
         # we don't handle indexes together with the other pg_class
@@ -257,14 +595,15 @@ class Database(object):
                              AND refobjid = i2.indexrelid
                    WHERE deptype = 'n'
                    AND NOT (objid < 16384 AND refobjid < 16384)"""
-        for r in dbconn.fetchall(query):
-            alldeps[r['class_name'], r['objid']].append(
-                (r['refclass'], r['refobjid']))
+        if oids is not None:
+            query += " AND objid = ANY(%s)"
+        queries = [(query, args)]
 
         # The dependencies across views is not in pg_depend. We have to
         # parse the rewrite rule.  "ev_class >= 16384" is to exclude
         # system views.
-        query = r"""SELECT DISTINCT 'pg_class' AS class_name, ev_class,
+        query = r"""SELECT DISTINCT 'pg_class' AS class_name,
+                          ev_class AS objid,
                           CASE WHEN depid[1] = 'relid' THEN 'pg_class'
                                WHEN depid[1] = 'funcid' THEN 'pg_proc'
                                END AS refclass, depid[2]::oid AS refobjid
@@ -282,20 +621,39 @@ class Database(object):
                    WHERE ev_class <> depid[2]::oid
                    AND coalesce(cs.nspname, ps.nspname)
                          NOT IN ('information_schema', 'pg_catalog')"""
-        for r in dbconn.fetchall(query):
-            alldeps[r['class_name'], r['ev_class']].append(
-                (r['refclass'], r['refobjid']))
+        if oids is not None:
+            query += " AND ev_class = ANY(%s)"
+        queries.append((query, args))
 
         # Add the dependencies between a table and other objects through the
-        # columns defaults
-        query = """SELECT 'pg_class' AS class_name, adrelid,
-                          d.refclassid::regclass, d.refobjid
+        # columns defaults, but not those of generated columns on other
+        # columns of the same table
+        query = """SELECT 'pg_class' AS class_name, adrelid AS objid,
+                          d.refclassid::regclass AS refclass, d.refobjid
                    FROM pg_attrdef ad JOIN pg_depend d
                         ON classid = 'pg_attrdef'::regclass AND objid = ad.oid
-                        AND deptype = 'n'"""
-        for r in dbconn.fetchall(query):
-            alldeps[r['class_name'], r['adrelid']].append(
-                (r['refclassid'], r['refobjid']))
+                        AND deptype = 'n'
+                        AND NOT (refclassid = 'pg_class'::regclass
+                                 AND d.refobjid = adrelid)"""
+        if oids is not None:
+            query += " WHERE adrelid = ANY(%s)"
+        queries.append((query, args))
+        return queries
+
+    @traced
+    def _build_dependency_graph(self, db, dbconn, oids=None):
+        """Build the dependency graph of the database objects
+
+        :param db: dictionary of dictionary of all objects
+        :param dbconn: a DbConnection object
+        :param oids: list of the object OIDs whose dependencies are
+                     needed (default all)
+        """
+        alldeps = defaultdict(list)
+        for (query, args) in self._dependency_queries(oids):
+            for r in dbconn.fetchall(query, args):
+                alldeps[r['class_name'], r['objid']].append(
+                    (r['refclass'], r['refobjid']))
 
         for (stbl, soid), deps in list(alldeps.items()):
             sdict = db.dbobjdict_from_catalog(stbl)
@@ -311,7 +669,7 @@ class Database(object):
                 tgt = tdict.by_oid.get(toid)
                 if tgt is None:
                     continue
-                src.depends_on.append(tgt)
+                src.add_dependencies([tgt])
 
     def _trim_objects(self, schemas):
         """Remove unwanted schema objects
@@ -332,13 +690,15 @@ class Database(object):
             if sch not in schemas:
                 del self.db.schemas[sch]
         # exclude database-wide objects
-        self.db.languages = LanguageDict()
-        self.db.casts = CastDict()
+        self.db.languages = dict_class('languages')()
+        self.db.casts = dict_class('casts')()
 
-    def from_catalog(self, single_db=False):
+    def from_catalog(self, single_db=False, schemas=None):
         """Populate the database objects by querying the catalogs
 
         :param single_db: populating only this database?
+        :param schemas: list of schemas whose objects are to be
+                        fetched (default all)
 
         The `db` holder is populated by various DbObjectDict-derived
         classes by querying the catalogs.  A dependency graph is
@@ -346,12 +706,65 @@ class Database(object):
         the dictionary are then linked to related objects, e.g.,
         columns are linked to the tables they belong.
         """
-        self.db = self.Dicts(self.dbconn, single_db)
-        self._build_dependency_graph(self.db, self.dbconn)
-        if self.dbconn.conn:
-            self.dbconn.conn.close()
+        self.db = self.Dicts(self.dbconn, single_db, schemas)
+        oids = None
+        if schemas is not None:
+            oids = [oid for _, d in self.db.all_dicts() for oid in d.by_oid]
+        self._build_dependency_graph(self.db, self.dbconn, oids)
+        self.dbconn.close()
         self._link_refs(self.db)
 
+    def load_schemas(self, schemas):
+        """Populate the objects of some schemas by querying the catalogs
+
+        :param schemas: list of schema names
+
+        Only the objects belonging to the given schemas, to schemas
+        loaded by earlier calls and to any schemas their objects depend
+        on, directly or not, are fetched.  The dependencies are those
+        recorded in pg_depend, e.g., of a foreign key, an inherited
+        table, a view, a column default or a trigger on an object of
+        another schema.  The catalog rows are memoized per schema by
+        the connection, so a schema is only queried the first time it
+        is needed.
+        """
+        query = """WITH RECURSIVE deps AS (
+                       SELECT CASE classid
+                              WHEN 'pg_rewrite'::regclass THEN
+                                  (SELECT ev_class FROM pg_rewrite
+                                   WHERE oid = objid)
+                              WHEN 'pg_attrdef'::regclass THEN
+                                  (SELECT adrelid FROM pg_attrdef
+                                   WHERE oid = objid)
+                              WHEN 'pg_trigger'::regclass THEN
+                                  (SELECT tgrelid FROM pg_trigger
+                                   WHERE oid = objid)
+                              END AS relid,
+                              classid, objid, refclassid, refobjid
+                       FROM pg_depend
+                       WHERE deptype IN ('n', 'a')
+                       AND objid >= 16384 AND refobjid >= 16384),
+                   refs AS (
+                       SELECT DISTINCT src.schema AS src, tgt.schema AS tgt
+                       FROM deps,
+                            pg_identify_object(
+                                CASE WHEN relid IS NULL THEN classid
+                                     ELSE 'pg_class'::regclass END,
+                                coalesce(relid, objid), 0) src,
+                            pg_identify_object(refclassid, refobjid, 0) tgt
+                       WHERE src.schema <> tgt.schema),
+                   closure(schema) AS (
+                       SELECT unnest(%s::name[])
+                       UNION
+                       SELECT tgt FROM refs JOIN closure ON (src = schema))
+                   SELECT schema FROM closure ORDER BY schema"""
+        loaded = set(self._loaded_schemas or []) | set(schemas)
+        rows = self.dbconn.fetchall(query, (sorted(loaded), ))
+        self.dbconn.rollback()
+        self._loaded_schemas = [row['schema'] for row in rows]
+        self.from_catalog(schemas=self._loaded_schemas)
+
+    @traced
     def from_map(self, input_map, langs=None):
         """Populate the new database objects from the input map
 
@@ -396,6 +809,7 @@ class Database(object):
         self.ndb.eventtrigs.from_map(input_evttrigs, self.ndb)
         self._link_refs(self.ndb)
 
+    @traced
     def map_from_dir(self):
         """Read the database maps starting from the metadata directory
 
@@ -407,7 +821,7 @@ class Database(object):
 
         def load(subdir, obj):
             with open(os.path.join(subdir, obj), 'r') as f:
-                objmap = yaml.safe_load(f)
+                objmap = yamlload(f)
             return objmap if isinstance(objmap, dict) else {}
 
         inmap = {}
@@ -429,11 +843,182 @@ class Database(object):
                 subdir = os.path.join(metadata_dir, entry)
                 if os.path.isdir(subdir):
                     for schobj in os.listdir(subdir):
-                        schmap[key].update(load(subdir, schobj))
+                        # skip data files, which may share the directory
+                        if schobj.endswith('.yaml'):
+                            schmap[key].update(load(subdir, schobj))
                 inmap.update(schmap)
 
         return inmap
 
+    def spec_digest(self, spec=None):
+        """Return a digest identifying a compiled YAML specification
+
+        :param spec: text of the YAML specification (if None, the files
+                     in the metadata directory are used)
+        :return: hexadecimal digest string
+
+        Besides the specification itself, the digest covers the
+        elements that influence the result of :meth:`from_map`: the
+        Pyrseas version, the schemas selected, the datacopy
+        configuration and the languages installed by extensions.
+        """
+        opts = self.config['options']
+
+        def parts():
+            yield __version__
+            yield repr(sorted(getattr(opts, 'schemas', [])))
+            yield repr(self.config.get('datacopy'))
+            yield repr(sorted(self._extension_langs()))
+            if spec is not None:
+                yield spec
+                return
+            metadata_dir = self.config['files']['metadata_path']
+            for path in self._spec_files(metadata_dir):
+                yield os.path.relpath(path, metadata_dir)
+                with open(path, 'rb') as f:
+                    yield f
+
+        return binfile.digest_parts(parts())
+
+    @staticmethod
+    def _spec_files(metadata_dir):
+        """Return the YAML files of a metadata directory, in a stable order
+
+        :param metadata_dir: path to the metadata directory
+        :return: list of paths
+
+        These are the files that :meth:`map_from_dir` may read.  Data
+        files and the manifest, which may share the directories, are
+        left out.
+        """
+        paths = []
+        for entry in sorted(os.listdir(metadata_dir)):
+            path = os.path.join(metadata_dir, entry)
+            if entry.endswith('.yaml'):
+                if not entry.startswith('database.'):
+                    paths.append(path)
+            elif entry.startswith('schema.') and os.path.isdir(path):
+                paths.extend(os.path.join(path, schobj)
+                             for schobj in sorted(os.listdir(path))
+                             if schobj.endswith('.yaml'))
+        return paths
+
+    def load_spec_cache(self, spec=None):
+        """Enable the compiled specification cache and try to use it
+
+        :param spec: text of the YAML specification (if None, the files
+                     in the metadata directory are used)
+        :return: True if the `ndb` holder was loaded from the cache
+
+        If the cache has no entry for the specification, the `ndb`
+        holder built by :meth:`diff_map` is saved to the cache for
+        subsequent runs.
+        """
+        self._spec_cache = os.path.join(binfile.cache_dir(), 'spec',
+                                        self.spec_digest(spec))
+        try:
+            self.ndb = binfile.load(self._spec_cache, 'spec')
+        except Exception:
+            return False
+        return True
+
+    def save_snapshot(self, path):
+        """Fetch the objects from the catalogs and save a snapshot file
+
+        :param path: file name/path of the snapshot
+
+        The snapshot holds the rows returned by the catalog queries of
+        :meth:`from_catalog`, together with the server version and the
+        reserved words, so that :meth:`load_snapshot` can later rebuild
+        the same objects, including the dependencies between objects
+        and their oids, without connecting to the database.  It is
+        saved as data only (JSON), so that loading a snapshot received
+        from elsewhere cannot execute any code.
+        """
+        dbconn = self.dbconn
+        previous = dbconn.recorder
+        dbconn.recorder = recorder = replay.QueryRecorder()
+        self._ext_langs = None
+        try:
+            self.from_catalog()
+        finally:
+            del dbconn.recorder
+            if dbconn.recorder is not previous:
+                dbconn.recorder = previous
+        if previous is not None:
+            previous.merge(recorder)
+        binfile.save_data(path, 'snapshot', {
+            'dbname': dbconn.dbname, 'version': dbconn.version,
+            'reserved_words': fetch_reserved_words(dbconn),
+            'queries': recorder.queries})
+
+    def load_snapshot(self, path):
+        """Populate the database objects from a catalog snapshot
+
+        :param path: file name/path of a snapshot saved by
+                     :meth:`save_snapshot`
+
+        The objects are built by :meth:`from_catalog` from the rows
+        saved in the snapshot, served by a :class:`ReplayDbConnection`.
+        """
+        snap = binfile.load_data(path, 'snapshot')
+        dbconn = self.dbconn
+        self.dbconn = ReplayDbConnection(snap)
+        self._ext_langs = None
+        try:
+            self.from_catalog()
+        finally:
+            self.dbconn = dbconn
+        self.dbconn._version = snap['version']
+        set_reserved_words(snap['reserved_words'])
+
+    def fingerprints(self):
+        """Compute structural fingerprints of the database on the server
+
+        :return: dictionary of MD5 digests, keyed by 'schema name' or,
+                 for objects that do not belong to a schema, 'database'
+
+        Each fingerprint is a hash over the rows returned by the same
+        catalog queries used by :meth:`from_catalog`, excluding object
+        identifiers, so that only the digests are transferred.
+        """
+        from pyrseas.dbobject.schema import Schema
+
+        version = self.dbconn.version
+        subqueries = []
+        for (attr, _, _) in DICT_CLASSES:
+            objdict = dict_class(attr)
+            if objdict.cls is Schema:
+                schcol = "q.name"
+            elif issubclass(objdict.cls, DbSchemaObject):
+                schcol = "q.schema"
+            else:
+                schcol = "NULL"
+            for query in objdict.catalog_queries(version):
+                subqueries.append(
+                    "SELECT %s AS schema, (to_jsonb(q) - 'oid')::text AS item"
+                    "\n FROM (%s) q" % (schcol, query))
+        rows = self.dbconn.fetchall(
+            """SELECT coalesce('schema ' || schema, 'database') AS key,
+                      md5(string_agg(item, E'\\n' ORDER BY item)) AS digest
+               FROM (%s) f GROUP BY 1""" % "\nUNION ALL\n".join(subqueries))
+        self.dbconn.rollback()
+        return dict((row['key'], row['digest']) for row in rows)
+
+    def drifted_schemas(self, fingerprints):
+        """Return the schemas whose fingerprints have changed
+
+        :param fingerprints: dictionary as returned by :meth:`fingerprints`
+        :return: sorted list of schema names, or None if objects that
+                 do not belong to a schema have changed
+        """
+        current = self.fingerprints()
+        if current.get('database') != fingerprints.get('database'):
+            return None
+        return sorted(key[7:] for key in set(current) | set(fingerprints)
+                      if key.startswith('schema ') and
+                      current.get(key) != fingerprints.get(key))
+
     def to_map(self, quote_reserved=True):
         """Convert the db maps to a single hierarchy suitable for YAML
 
@@ -460,7 +1045,7 @@ class Database(object):
                                       self.dbconn.dbname)
             if os.path.exists(dbfilepath):
                 with open(dbfilepath, 'r') as f:
-                    objmap = yaml.safe_load(f)
+                    objmap = yamlload(f)
                 for obj, val in list(objmap.items()):
                     if isinstance(val, dict):
                         dirpath = ''
@@ -489,47 +1074,76 @@ class Database(object):
             if not os.path.exists(opts.data_dir):
                 mkdir_parents(opts.data_dir)
         dbmap.update(self.db.schemas.to_map(self.db, opts))
+        if 'datacopy' in self.config:
+            self._copy_data(opts)
 
         if opts.multiple_files:
-            with open(dbfilepath, 'w') as f:
+            with phase("write files"), open(dbfilepath, 'w') as f:
                 f.write(yamldump(dbmap))
 
         return dbmap
 
-    def diff_map(self, input_map, quote_reserved=True):
-        """Generate SQL to transform an existing database
-
-        :param input_map: a YAML map defining the new database
-        :param quote_reserved: fetch reserved words
-        :return: list of SQL statements
+    def _copy_data(self, opts):
+        """Copy out the data of the tables in the datacopy configuration
 
-        Compares the existing database definition, as fetched from the
-        catalogs, to the input YAML map and generates SQL statements
-        to transform the database into the one represented by the
-        input.
+        :param opts: options to include/exclude schemas/tables, etc.
         """
-        from .dbobject.table import Table
+        copycfg = self.config['datacopy']
+        self.db.schemas.data_export(
+            opts, getattr(opts, 'jobs', 1), copycfg.get('compression'),
+            copycfg.get('skip_unchanged', False))
 
-        if not self.db:
-            self.from_catalog()
+    def _prepare_diff(self, input_map, quote_reserved):
+        """Populate the existing and new database objects to be compared
+
+        :param input_map: a YAML map defining the new database (None
+                          if :meth:`load_spec_cache` loaded it)
+        :param quote_reserved: fetch reserved words
+        """
         opts = self.config['options']
+        if not self.db:
+            if opts.schemas:
+                self.load_schemas(opts.schemas)
+            else:
+                self.from_catalog()
         if opts.schemas:
-            schlist = ['schema ' + sch for sch in opts.schemas]
-            for sch in list(input_map.keys()):
-                if sch not in schlist and sch.startswith('schema '):
-                    del input_map[sch]
+            if input_map is not None:
+                # database-wide objects are excluded, as in _trim_objects
+                schlist = ['schema ' + sch for sch in opts.schemas]
+                for sch in list(input_map.keys()):
+                    if sch not in schlist:
+                        del input_map[sch]
             self._trim_objects(opts.schemas)
 
         # quote_reserved is only set to False by most tests
         if quote_reserved:
             fetch_reserved_words(self.dbconn)
 
-        self.from_map(input_map)
+        if input_map is not None:
+            self.from_map(input_map)
+            if self._spec_cache is not None:
+                try:
+                    binfile.save(self._spec_cache, 'spec', self.ndb)
+                except Exception as exc:
+                    print("Unable to save compiled specification: %s" % exc,
+                          file=sys.stderr)
         if opts.revert:
             (self.db, self.ndb) = (self.ndb, self.db)
             del self.ndb.schemas['pg_catalog']
             self.db.languages.dbconn = self.dbconn
 
+    def _diff_objects(self):
+        """Compare the existing database objects to the new ones
+
+        :return: iterator of tuples (object, SQL statements)
+
+        The new objects are visited in dependency order, yielding the
+        statements to create or alter each one.  The existing objects
+        are then visited in reverse dependency order, yielding the
+        statements to drop those that are no longer needed.
+        """
+        from .dbobject.table import Table
+
         # First sort the objects in the new db in dependency order
         new_objs = []
         for _, d in self.ndb.all_dicts():
@@ -542,27 +1156,29 @@ class Database(object):
         # Then generate the sql for all the objects, walking in dependency
         # order over all the db objects
 
-        stmts = []
         for new in new_objs:
             d = self.db.dbobjdict_from_catalog(new.catalog)
             old = d.get(new.key())
             if old is not None:
-                stmts.append(old.alter(new))
+                yield (new, old.alter(new))
             else:
-                stmts.append(new.create_sql(self.dbconn.version))
+                stmts = new.create_sql(self.dbconn.version)
 
                 # Check if the object just created was renamed, in which case
                 # don't try to delete the original one
                 if getattr(new, 'oldname', None):
                     try:
                         origname, new.name = new.name, new.oldname
+                        new.reset_key()
                         oldkey = new.key()
                     finally:
                         new.name = origname
+                        new.reset_key()
                     # Intentionally raising KeyError as tested e.g. in
                     # test_bad_rename_view -- ok Joe?
                     old = d[oldkey]
                     old._nodrop = True
+                yield (new, stmts)
 
         # Order the old database objects in reverse dependency order
         old_objs = []
@@ -576,16 +1192,73 @@ class Database(object):
         # Drop the objects that don't appear in the new db
         for old in old_objs:
             d = self.ndb.dbobjdict_from_catalog(old.catalog)
+            stmts = []
             if isinstance(old, Table):
                 new = d.get(old.key())
                 if new is not None:
                     stmts.extend(old.alter_drop_columns(new))
             if not getattr(old, '_nodrop', False) and old.key() not in d:
                 stmts.extend(old.drop())
+            yield (old, stmts)
+
+    def _unchanged_data(self, datadir):
+        """Return a function to check whether a table need not be loaded
+
+        :param datadir: full path to the data directory
+        :return: function taking a table and the path of its data file
+
+        A table need not be loaded if its data file has not changed
+        since it was exported and the current table contents match
+        those that were exported, according to the checksums and hashes
+        recorded by :meth:`SchemaDict.data_export`.
+        """
+        from pyrseas.dbobject.schema import file_checksum, read_manifest
+        from pyrseas.dbobject.table import Table
+
+        manifest = read_manifest(datadir)
+
+        def unchanged(table, path):
+            entry = manifest.get(os.path.relpath(path, datadir))
+            current = self.db.tables.get(table.key())
+            if entry is None or not isinstance(current, Table) or \
+                    not os.path.exists(path) or \
+                    file_checksum(path) != entry.get('sha256'):
+                return False
+            return self.dbconn.fetchone(
+                current.data_hash_sql())['hash'] == entry.get('rows')
+        return unchanged
+
+    def diff_map(self, input_map, quote_reserved=True):
+        """Generate SQL to transform an existing database
+
+        :param input_map: a YAML map defining the new database (None
+                          if :meth:`load_spec_cache` loaded it)
+        :param quote_reserved: fetch reserved words
+        :return: list of SQL statements
+
+        Compares the existing database definition, as fetched from the
+        catalogs, to the input YAML map and generates SQL statements
+        to transform the database into the one represented by the
+        input.
+        """
+        self._prepare_diff(input_map, quote_reserved)
+        with phase("generate statements"):
+            stmts = [objstmts for _, objstmts in self._diff_objects()]
 
         if 'datacopy' in self.config:
+            opts = self.config['options']
             opts.data_dir = self.config['files']['data_path']
-            stmts.append(self.ndb.schemas.data_import(opts))
+            copycfg = self.config['datacopy']
+            unchanged = None
+            if copycfg.get('skip_unchanged', False):
+                unchanged = self._unchanged_data(opts.data_dir)
+            stmts.append(self.ndb.schemas.data_import(
+                opts, copycfg.get('deferred_validation', False),
+                copycfg.get('compression'), self.dbconn.version,
+                unchanged))
+            if unchanged is not None:
+                # release the locks taken by the table hash queries
+                self.dbconn.rollback()
 
         stmts = [s for s in flatten(stmts)]
         funcs = False
@@ -600,6 +1273,94 @@ class Database(object):
 
         return stmts
 
+    def check_map(self, input_map, quote_reserved=True):
+        """Check whether an existing database matches the input map
+
+        :param input_map: a YAML map defining the new database (None
+                          if :meth:`load_spec_cache` loaded it)
+        :param quote_reserved: fetch reserved words
+        :return: None if there are no differences, otherwise a short
+                 description of the first difference found
+
+        Unlike :meth:`diff_map`, the comparison stops as soon as an
+        object is found that would require an SQL statement.  Data
+        copying is not considered.
+        """
+        self._prepare_diff(input_map, quote_reserved)
+        for obj, objstmts in self._diff_objects():
+            objstmts = [s for s in flatten([objstmts]) if s]
+            if objstmts:
+                return "%s %s: %s" % (obj.objtype.lower(), obj.identifier(),
+                                      objstmts[0].split('\n')[0])
+        return None
+
+    @traced
+    def apply_stmts(self, stmts, jobs=1):
+        """Execute the statements generated by :meth:`diff_map`
+
+        :param stmts: list of SQL statements and data copy tuples
+        :param jobs: number of connections used to load the data
+
+        With a single job, all statements are executed in one
+        transaction.  With more jobs, the statements preceding the
+        data copies are committed first.  The tables are then truncated
+        and loaded concurrently, each in its own transaction, and
+        finally the foreign keys are added back.  Deferred foreign key
+        validations are also run concurrently.  Hence, if a statement
+        fails, the changes made by the earlier steps remain.
+        """
+        copycfg = self.config.get('datacopy', {})
+
+        def run(dbconn, stmts):
+            try:
+                for stmt in stmts:
+                    if isinstance(stmt, tuple):
+                        # expected format: (\copy, table, from, path, format)
+                        dbconn.copy_from(
+                            stmt[3], stmt[1], copycfg.get('buffer_size'),
+                            copycfg.get('mmap', False),
+                            stmt[4].endswith('binary'))
+                    else:
+                        dbconn.execute(stmt)
+            except:
+                dbconn.rollback()
+                raise
+            else:
+                dbconn.commit()
+
+        if jobs < 2:
+            run(self.dbconn, stmts)
+            return
+
+        conns = Queue()
+        clones = []
+
+        def run_unit(unit):
+            dbconn = conns.get()
+            try:
+                run(dbconn, unit)
+            finally:
+                conns.put(dbconn)
+
+        try:
+            for (concurrent, units) in _load_batches(stmts):
+                if not concurrent or len(units) < 2:
+                    run(self.dbconn, list(flatten(units)))
+                    continue
+                workers = min(jobs, len(units))
+                while len(clones) < workers:
+                    clones.append(self.dbconn.clone())
+                    conns.put(clones[-1])
+                with ThreadPoolExecutor(workers) as executor:
+                    futures = [executor.submit(run_unit, unit)
+                               for unit in units]
+                    for future in futures:
+                        future.result()
+        finally:
+            for dbconn in clones:
+                dbconn.close()
+
+    @traced
     def dep_sorted(self, objs, db):
         """Sort `objs` in order of dependency.
 
@@ -648,3 +1409,167 @@ class Database(object):
         else:
             # is it possible? How do we deal with that?
             raise Exception("the objects dependencies graph has loops")
+
+
+class _DeferredCopyDatabase(Database):
+    """A database whose table data is copied out after mapping it"""
+
+    copy_opts = None
+
+    def _copy_data(self, opts):
+        self.copy_opts = opts
+
+
+class AsyncDatabase(object):
+    """A database definition, usable from asyncio applications
+
+    The methods that query the catalogs are coroutines.  The rows of
+    all the catalog queries are first awaited on an AsyncDbConnection.
+    The Database objects are then built, compared and mapped from the
+    fetched rows, on the event loop, without further I/O.  A query
+    that was not fetched beforehand raises a KeyError.  The data of
+    the tables in the datacopy configuration is copied out by a
+    worker thread, with a regular connection.  Several AsyncDatabase
+    objects can thus be processed concurrently, e.g., with
+    asyncio.gather().  Calls on the same object are serialized.
+    """
+
+    def __init__(self, config, dbconn=None):
+        """Initialize the database
+
+        :param config: configuration dictionary
+        :param dbconn: an AsyncDbConnection (default: one created from
+                       the database configuration)
+        """
+        db = config['database']
+        self.dbconn = dbconn or AsyncDbConnection(
+            db['dbname'], db['username'], db['password'], db['host'],
+            db['port'])
+        self.database = _DeferredCopyDatabase(config)
+        self._lock = None
+        self._loop = None
+
+    @property
+    def db(self):
+        "The objects fetched from the catalogs"
+        return self.database.db
+
+    def _serialized(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            (self._lock, self._loop) = (asyncio.Lock(), loop)
+        return self._lock
+
+    async def _prefetch(self, quote_reserved=False):
+        """Fetch the rows of the catalog queries
+
+        :param quote_reserved: fetch reserved words
+        :return: a _PrefetchedDbConnection serving the rows
+
+        The catalog objects are only queried if not yet fetched.
+        """
+        aconn = self.dbconn
+        if aconn.conn is None or aconn.conn.closed:
+            await aconn.connect()
+            rows = await aconn.fetchall(CURRENT_SCHEMAS_QUERY)
+            await (await aconn.execute(
+                search_path_stmt(rows[0]["current_schemas"]))).close()
+            await aconn.commit()
+        version = aconn.conn.info.server_version
+        queries = []
+        if not self.database.db:
+            for (attr, _, _) in DICT_CLASSES:
+                queries.extend((query, None) for query in
+                               dict_class(attr).catalog_queries(version))
+            queries.extend(self.database._dependency_queries())
+        if not self.database.db or self.database._ext_langs is None:
+            queries.append((EXT_LANGS_QUERY, None))
+        if quote_reserved:
+            queries.append((RESERVED_WORDS_QUERY, None))
+        results = {}
+        try:
+            for (query, args) in queries:
+                key = replay.query_key(query, args)
+                if key not in results:
+                    results[key] = await aconn.fetchall(query, args)
+        finally:
+            await aconn.rollback()
+        conn = _PrefetchedDbConnection(aconn, version, results)
+        self.database.dbconn = conn
+        if self.database.db:
+            for (_, objdict) in self.database.db.all_dicts():
+                objdict.dbconn = conn
+        return conn
+
+    def _from_catalog(self, single_db=False, schemas=None):
+        database = self.database
+        database.db = database.Dicts(database.dbconn, single_db, schemas)
+        database._ext_langs = None
+        # the dependencies of all objects were fetched: those of the
+        # objects not loaded are ignored
+        database._build_dependency_graph(database.db, database.dbconn)
+        database._link_refs(database.db)
+
+    def _copy_data(self, opts):
+        schemas = self.database.db.schemas
+        conn = schemas.dbconn
+        schemas.dbconn = conn.clone()
+        try:
+            Database._copy_data(self.database, opts)
+        finally:
+            schemas.dbconn.close()
+            schemas.dbconn = conn
+
+    async def from_catalog(self, single_db=False, schemas=None):
+        """Populate the database objects by querying the catalogs
+
+        :param single_db: populating only this database?
+        :param schemas: list of schemas whose objects are to be
+                        fetched (default all)
+
+        See :meth:`Database.from_catalog`.
+        """
+        async with self._serialized():
+            self.database.db = None
+            await self._prefetch()
+            self._from_catalog(single_db, schemas)
+
+    async def to_map(self, quote_reserved=True):
+        """Convert the db maps to a single hierarchy suitable for YAML
+
+        :param quote_reserved: fetch reserved words
+        :return: a YAML-suitable dictionary (without any Python objects)
+
+        See :meth:`Database.to_map`.
+        """
+        async with self._serialized():
+            await self._prefetch(quote_reserved)
+            if not self.database.db:
+                self._from_catalog(True)
+            self.database.copy_opts = None
+            dbmap = self.database.to_map(quote_reserved)
+            if self.database.copy_opts is not None:
+                await asyncio.to_thread(self._copy_data,
+                                        self.database.copy_opts)
+            return dbmap
+
+    async def diff_map(self, input_map, quote_reserved=True):
+        """Generate SQL to transform an existing database
+
+        :param input_map: a YAML map defining the new database
+        :param quote_reserved: fetch reserved words
+        :return: list of SQL statements
+
+        All the catalog objects are fetched, even if the `schemas`
+        option is given: those of other schemas are then ignored.
+        See :meth:`Database.diff_map`.
+        """
+        async with self._serialized():
+            await self._prefetch(quote_reserved)
+            if not self.database.db:
+                self._from_catalog()
+            return self.database.diff_map(input_map, quote_reserved)
+
+    async def close(self):
+        """Close the database connection"""
+        await self.dbconn.close()
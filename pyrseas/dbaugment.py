@@ -6,16 +6,22 @@ from __future__ import print_function
 import sys
 from argparse import FileType
 
-import yaml
-
 from pyrseas import __version__
-from pyrseas.yamlutil import yamldump
-from pyrseas.augmentdb import AugmentDatabase
-from pyrseas.cmdargs import cmd_parser, parse_args
+from pyrseas.yamlutil import yamldump, yamlload
+from pyrseas.cmdargs import cmd_parser, parse_args, finish_run
+from pyrseas.lib.trace import phase
+
 
+def main(argv=None, stdout=None):
+    """Augment database specifications
 
-def main():
-    """Augment database specifications"""
+    :param argv: list of arguments (default sys.argv[1:])
+    :param stdout: stream for the output (default sys.stdout), unless
+                   the --output option is given
+
+    This can be called in-process, e.g., by test harnesses.  Errors
+    in the arguments raise SystemExit.
+    """
     parser = cmd_parser("Generate a modified schema for a PostgreSQL "
                         "database, in YAML format, augmented with specified "
                         "attributes and procedures", __version__)
@@ -29,20 +35,28 @@ def main():
                         help='exclude privilege (GRANT/REVOKE) information')
     parser.add_argument('spec', nargs='?', type=FileType('r'),
                         default=sys.stdin, help='YAML augmenter specification')
-    cfg = parse_args(parser)
-    output = cfg['files']['output']
-    options = cfg['options']
-    augdb = AugmentDatabase(cfg)
-    augmap = yaml.safe_load(options.spec)
+    cfg = parse_args(parser, argv)
     try:
-        outmap = augdb.apply(augmap)
-    except BaseException as exc:
-        if type(exc) != KeyError:
-            raise
-        sys.exit("ERROR: %s" % str(exc))
-    print(yamldump(outmap), file=output or sys.stdout)
-    if output:
-        output.close()
+        stdout = stdout or sys.stdout
+        output = cfg['files']['output']
+        options = cfg['options']
+        # not imported at the top, so that --help need not load it
+        from pyrseas.augmentdb import AugmentDatabase
+        augdb = AugmentDatabase(cfg)
+        augmap = yamlload(options.spec)
+        try:
+            outmap = augdb.apply(augmap)
+        except BaseException as exc:
+            if type(exc) != KeyError:
+                raise
+            sys.exit("ERROR: %s" % str(exc))
+        with phase("write output"):
+            print(yamldump(outmap), file=output or stdout)
+            if output:
+                output.close()
+    finally:
+        finish_run(cfg)
+
 
 if __name__ == '__main__':
     main()
@@ -10,8 +10,11 @@
 import os
 import re
 import string
+import sys
 from functools import wraps
+from operator import attrgetter
 
+from pyrseas.lib.trace import phase
 from pyrseas.yamlutil import yamldump
 from .privileges import privileges_to_map, add_grant, diff_privs
 from .privileges import privileges_from_map
@@ -20,22 +23,50 @@ from .privileges import privileges_from_map
 VALID_FIRST_CHARS = string.ascii_lowercase + '_'
 VALID_CHARS = string.ascii_lowercase + string.digits + '_$'
 RESERVED_WORDS = []
+RESERVED_WORDS_QUERY = """SELECT word FROM pg_get_keywords()
+                          WHERE catcode != 'U'"""
 NON_FILENAME_CHARS = re.compile(r'\W', re.U)
 MAX_PG_IDENT_LEN = 63
 MAX_IDENT_LEN = int(os.environ.get("PYRSEAS_MAX_IDENT_LEN", 32))
+_SLOT_ATTRS = {}
+_UNSET = object()
+
+
+def interned(value):
+    """Return the shared copy of a string, e.g., a schema or type name
+
+    :param value: string (or None)
+    :return: interned string, or value if it is not a string
+
+    Names such as the schema, table and data type of each column are
+    repeated across many catalog objects.  Interning them keeps a
+    single copy in memory.
+    """
+    return sys.intern(value) if type(value) is str else value
 
 
 def fetch_reserved_words(db):
     """Fetch PostgreSQL reserved words
 
     :param db: DbConnection object
+    :return: list of reserved words
     """
     global RESERVED_WORDS
 
     if len(RESERVED_WORDS) == 0:
         RESERVED_WORDS = [word["word"] for word in
-                          db.fetchall("""SELECT word FROM pg_get_keywords()
-                                         WHERE catcode != 'U'""")]
+                          db.fetchall(RESERVED_WORDS_QUERY)]
+    return RESERVED_WORDS
+
+
+def set_reserved_words(words):
+    """Set the PostgreSQL reserved words, e.g., from a catalog snapshot
+
+    :param words: list of reserved words
+    """
+    global RESERVED_WORDS
+
+    RESERVED_WORDS = list(words)
 
 
 def quote_id(name):
@@ -141,6 +172,15 @@ def ownable(func):
 class DbObject(object):
     "A single object in a database catalog, e.g., a schema, a table, a column"
 
+    __slots__ = ('name', 'description', 'depends_on', 'owner', 'privileges',
+                 '_objtype', 'oldname', '_nodrop', '_key', '_hash')
+    """Attributes common to all objects
+
+    The most numerous object types, e.g., columns and indexes, also
+    declare their attributes as slots, so that their instances do not
+    need a `__dict__`.  Other object types get one as usual.
+    """
+
     keylist = ['name']
     """List of attributes that uniquely identify the object in the catalogs
 
@@ -177,10 +217,12 @@ class DbObject(object):
         """
         self.name = name
         self.description = description
-        self.depends_on = []
+        # objects without privileges or dependencies share empty tuples
+        self.depends_on = ()
         self.owner = None
-        self.privileges = []
+        self.privileges = ()
         self._objtype = None
+        self._key = self._hash = None
 
     def _init_own_privs(self, owner=None, privileges=[]):
         """Initialize owner and privileges attributes
@@ -195,16 +237,31 @@ class DbObject(object):
         self.owner = owner
         if isinstance(privileges, str):
             privileges = privileges.split(',')
-        self.privileges = privileges or []
+        self.privileges = privileges or ()
+
+    def add_dependencies(self, deps):
+        """Add explicit dependencies to the object
+
+        :param deps: list of `DbObject` or external keys
+        """
+        if not deps:
+            return
+        if not isinstance(self.depends_on, list):
+            self.depends_on = list(self.depends_on)
+        self.depends_on.extend(deps)
 
     def __repr__(self):
         return "<%s at 0x%x>" % (self.extern_key(), id(self))
 
     # hash and eq allow to use the objects as dict keys
     def __hash__(self):
-        return hash((self.__class__, self.key()))
+        if self._hash is None:
+            self._hash = hash((self.__class__, self.key()))
+        return self._hash
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if self.__class__ is other.__class__:
             return self.key() == other.key()
         else:
@@ -304,9 +361,35 @@ class DbObject(object):
         Each class implementing an object type specifies a
         :attr:`keylist` attribute, i.e., a list giving the names of
         attributes making up the key.
+
+        The key and the hash of the object are computed once.  Code
+        that changes an attribute in the :attr:`keylist` must call
+        :meth:`reset_key` afterwards.
+        """
+        if self._key is None:
+            lst = [getattr(self, k) for k in self.keylist]
+            self._key = len(lst) == 1 and lst[0] or tuple(lst)
+        return self._key
+
+    def reset_key(self):
+        """Discard the saved key and hash, e.g., after a rename"""
+        self._key = self._hash = None
+
+    def __setstate__(self, state):
+        """Restore the attributes of an unpickled object
+
+        :param state: dictionary, or tuple of the `__dict__` and the
+                      slots dictionaries
+
+        The saved hash is discarded, since string hashes differ from
+        one process to another.
         """
-        lst = [getattr(self, k) for k in self.keylist]
-        return len(lst) == 1 and lst[0] or tuple(lst)
+        (dct, slots) = state if isinstance(state, tuple) else (state, None)
+        if dct:
+            self.__dict__.update(dct)
+        for (attr, value) in (slots or {}).items():
+            setattr(self, attr, value)
+        self._hash = None
 
     def identifier(self):
         """Returns a full identifier for the database object
@@ -319,7 +402,41 @@ class DbObject(object):
         overridden methods) other elements, e.g., the arguments to a
         function.
         """
-        return quote_id(self.__dict__[self.keylist[0]])
+        return quote_id(getattr(self, self.keylist[0]))
+
+    def _attrs(self):
+        """Return the public attributes of the object as a dictionary
+
+        :return: dictionary
+
+        This takes the place of `__dict__`, which the slotted object
+        types lack.  Private slots, e.g., links to related objects,
+        are omitted since they are never mapped, and so are slots that
+        have not been assigned.
+        """
+        cls = self.__class__
+        slots = _SLOT_ATTRS.get(cls)
+        if slots is None:
+            names = tuple(
+                name for klass in reversed(cls.__mro__)
+                for name in klass.__dict__.get('__slots__', ())
+                if not name.startswith('_') and name != 'oldname')
+            slots = _SLOT_ATTRS[cls] = (names, attrgetter(*names))
+        (names, getter) = slots
+        try:
+            dct = dict(zip(names, getter(self)))
+        except AttributeError:
+            dct = {}
+            for name in names:
+                value = getattr(self, name, _UNSET)
+                if value is not _UNSET:
+                    dct[name] = value
+        # oldname is only assigned to objects being renamed
+        oldname = getattr(self, 'oldname', _UNSET)
+        if oldname is not _UNSET:
+            dct['oldname'] = oldname
+        dct.update(getattr(self, '__dict__', ()))
+        return dct
 
     def to_map(self, db, no_owner=False, no_privs=False, deepcopy=True):
         """Convert an object to a YAML-suitable format
@@ -334,9 +451,9 @@ class DbObject(object):
         """
         import copy
         if deepcopy:
-            dct = copy.deepcopy(self.__dict__)
+            dct = copy.deepcopy(self._attrs())
         else:
-            dct = self.__dict__.copy()
+            dct = self._attrs()
         for key in self.keylist:
             del dct[key]
         if self.description is None:
@@ -534,9 +651,11 @@ class DbObject(object):
 class DbSchemaObject(DbObject):
     "A database object that is owned by a certain schema"
 
+    __slots__ = ('schema', )
+
     def __init__(self, name, schema='public', description=None, **attrs):
         super(DbSchemaObject, self).__init__(name, description, **attrs)
-        self.schema = schema
+        self.schema = interned(schema)
 
     def identifier(self):
         """Return a full identifier for a schema object
@@ -613,10 +732,12 @@ class DbObjectDict(dict):
     the objects belong to.
     """
 
-    def __init__(self, dbconn=None):
+    def __init__(self, dbconn=None, schemas=None):
         """Initialize the dictionary
 
         :param dbconn: a DbConnection object
+        :param schemas: list of schemas whose objects are to be fetched
+                        (default all)
 
         If dbconn is not None, the _from_catalog method is called to
         initialize the dictionary from the catalogs.
@@ -624,8 +745,19 @@ class DbObjectDict(dict):
         dict.__init__(self)
         self.by_oid = {}
         self.dbconn = dbconn
+        self.only_schemas = schemas
         if dbconn:
-            self._from_catalog()
+            with phase("fetch " + self.__class__.__name__):
+                self._from_catalog()
+
+    def __getstate__(self):
+        """Return the attributes to be saved when pickling
+
+        The database connection is not saved.
+        """
+        state = self.__dict__.copy()
+        state['dbconn'] = None
+        return state
 
     def _from_catalog(self):
         """Initialize the dictionary by querying the catalogs
@@ -667,6 +799,42 @@ class DbObjectDict(dict):
                 objdict.update(outobj)
         return objdict
 
+    def fetchall(self, query, cls=None):
+        """Execute a catalog query, restricted to the selected schemas
+
+        :param query: a SELECT query returning objects of class `cls`
+        :param cls: the class of the objects (default `self.cls`)
+        :return: list of rows
+
+        If the dictionary was initialized with a list of schemas and
+        the objects belong to schemas, the rows are fetched per schema
+        by :meth:`CatDbConnection.fetch_schema_rows`.
+        """
+        cls = cls or self.cls
+        if self.only_schemas is not None:
+            if issubclass(cls, DbSchemaObject):
+                return self.dbconn.fetch_schema_rows(
+                    query, 'schema', self.only_schemas)
+            elif cls.catalog == 'pg_namespace':
+                return self.dbconn.fetch_schema_rows(
+                    query, 'name', self.only_schemas)
+        data = self.dbconn.fetchall(query)
+        self.dbconn.rollback()
+        return data
+
+    @classmethod
+    def catalog_queries(cls, dbversion):
+        """Return the queries used to fetch the objects from the catalogs
+
+        :param dbversion: Postgres version identifier
+        :return: list of SQL query strings
+
+        This is used to compute structural fingerprints of a database
+        on the server.  It should be overridden by derived classes
+        whose :meth:`_from_catalog` issues other queries.
+        """
+        return [cls.cls.query(dbversion)]
+
     def fetch(self):
         """Fetch all objects from the catalogs using the associated
         :meth:`query` methods.
@@ -675,6 +843,5 @@ class DbObjectDict(dict):
 
         """
         self.query = self.cls.query(self.dbconn.version)
-        data = self.dbconn.fetchall(self.query)
-        self.dbconn.rollback()
+        data = self.fetchall(self.query)
         return [self.cls(**dict(row)) for row in data]
@@ -6,23 +6,27 @@
     This module defines two classes: Column derived from
     DbSchemaObject and ColumnDict derived from DbObjectDict.
 """
-from . import DbObjectDict, DbSchemaObject, quote_id
+from . import DbObjectDict, DbSchemaObject, quote_id, interned
 from .privileges import privileges_from_map, add_grant, diff_privs
 
 
 IDENTITY_TYPES = {'a': 'always', 'd': 'by default'}
+GENERATED_TYPES = {'s': 'stored'}
 
 
 class Column(DbSchemaObject):
     "A table column or attribute of a composite type"
 
+    __slots__ = ('table', 'number', 'type', 'not_null', 'default',
+                 'identity', 'generated', 'collation', 'statistics',
+                 'inherited', 'dropped', '_table', '_type', '_owner_seq')
     keylist = ['schema', 'table']    # plus attribute number
     allprivs = 'arwx'
 
     def __init__(self, name, schema, table, number, type, description=None,
                  privileges=[], not_null=True, default=None, identity=None,
                  collation=None, statistics=None, inherited=False,
-                 dropped=False):
+                 dropped=False, generated=None):
         """Initialize the column
 
         :param name: column/attribute name (from attname)
@@ -39,12 +43,14 @@ class Column(DbSchemaObject):
         :param statistics: statistics detail level (from attstattarget)
         :param inherited: inherited indicator (from attinhcount)
         :param dropped: dropped indicator (from attisdropped)
+        :param generated: type of generated column (from attgenerated),
+                          whose expression is given by `default`
         """
         super(Column, self).__init__(name, schema, description)
         self._init_own_privs(None, privileges)
-        self.table = table
+        self.table = interned(table)
         self.number = number
-        self.type = type
+        self.type = interned(type)
         self.not_null = not_null
         self.default = default
         if identity == '' or identity is None:
@@ -55,6 +61,12 @@ class Column(DbSchemaObject):
             self.identity = identity
         assert self.identity is None or \
             self.identity in IDENTITY_TYPES.values()
+        if generated == '' or generated is None:
+            self.generated = None
+        else:
+            self.generated = GENERATED_TYPES.get(generated, generated)
+        assert self.generated is None or \
+            self.generated in GENERATED_TYPES.values()
         self.collation = collation
         self.statistics = statistics
         self.inherited = inherited
@@ -64,12 +76,13 @@ class Column(DbSchemaObject):
 
     @staticmethod
     def query(dbversion=None):
-        return """
+        query = """
             SELECT nspname AS schema, relname AS table, attname AS name,
                    attnum AS number, format_type(atttypid, atttypmod) AS type,
                    attnotnull AS not_null, attinhcount > 0 AS inherited,
                    pg_get_expr(adbin, adrelid) AS default,
-                   attidentity AS identity, attstattarget AS statistics,
+                   attidentity AS identity, %s AS generated,
+                   attstattarget AS statistics,
                    collname AS collation, attisdropped AS dropped,
                    array_to_string(attacl, ',') AS privileges,
                    col_description(c.oid, attnum) AS description
@@ -82,6 +95,9 @@ class Column(DbSchemaObject):
               AND (nspname != 'pg_catalog' AND nspname != 'information_schema')
               AND attnum > 0
            ORDER BY nspname, relname, attnum"""
+        if dbversion is not None and dbversion < 120000:
+            return query % "''"
+        return query % "attgenerated"
 
     @staticmethod
     def from_map(name, table, num, inobj):
@@ -99,7 +115,7 @@ class Column(DbSchemaObject):
             inobj.pop('not_null', False), inobj.pop('default', None),
             inobj.pop('identity', None), inobj.pop('collation', None),
             inobj.pop('statistics', None), inobj.pop('inherited', False),
-            inobj.pop('dropped', False))
+            inobj.pop('dropped', False), inobj.pop('generated', None))
         obj.set_oldname(inobj)
         if len(obj.privileges) > 0:
             if table.owner is None:
@@ -125,6 +141,8 @@ class Column(DbSchemaObject):
             dct.pop('default')
         if self.identity is None:
             dct.pop('identity')
+        if self.generated is None:
+            dct.pop('generated')
         if self.collation is None or self.collation == 'default':
             dct.pop('collation')
         if not self.inherited:
@@ -141,7 +159,10 @@ class Column(DbSchemaObject):
         stmt = "%s %s" % (quote_id(self.name), self.type)
         if self.not_null:
             stmt += ' NOT NULL'
-        if self.default is not None:
+        if self.generated is not None:
+            stmt += " GENERATED ALWAYS AS (%s) %s" % (
+                self.default, self.generated.upper())
+        elif self.default is not None:
             stmt += ' DEFAULT ' + self.default
         if self.identity is not None:
             stmt += " GENERATED %s AS IDENTITY" % self.identity.upper()
@@ -221,9 +242,24 @@ class Column(DbSchemaObject):
         Compares the column to an input column and generates partial
         SQL statements to transform it into the one represented by the
         input.
+
+        A generated column whose expression changes, or a regular
+        column that becomes generated, is dropped and added again,
+        since its values are computed anyway.  A generated column that
+        becomes a regular one keeps its values, through DROP
+        EXPRESSION (which needs Postgres 13 or later).
         """
+        if incol.generated is not None and (
+                self.generated is None or self.default != incol.default):
+            (stmt, descr) = incol.add()
+            return ("DROP COLUMN %s, ADD COLUMN %s" % (
+                quote_id(self.name), stmt), descr)
         stmts = []
         base = "ALTER COLUMN %s " % quote_id(self.name)
+        if self.generated is not None and incol.generated is None:
+            stmts.append(base + "DROP EXPRESSION")
+            if incol.default is not None:
+                stmts.append(base + "SET DEFAULT %s" % incol.default)
         # check NOT NULL
         if not self.not_null and incol.not_null:
             stmts.append(base + "SET NOT NULL")
@@ -237,14 +273,15 @@ class Column(DbSchemaObject):
         if self.type != incol.type:
             # validate type conversion?
             stmts.append(base + "TYPE %s" % incol.type)
-        # check DEFAULTs
-        if self.default is None and incol.default is not None:
-            stmts.append(base + "SET DEFAULT %s" % incol.default)
-        if self.default is not None:
-            if incol.default is None:
-                stmts.append(base + "DROP DEFAULT")
-            elif self.default != incol.default:
+        # check DEFAULTs (a generated column's is its expression)
+        if self.generated is None:
+            if self.default is None and incol.default is not None:
                 stmts.append(base + "SET DEFAULT %s" % incol.default)
+            if self.default is not None:
+                if incol.default is None:
+                    stmts.append(base + "DROP DEFAULT")
+                elif self.default != incol.default:
+                    stmts.append(base + "SET DEFAULT %s" % incol.default)
         # check STATISTICS
         if self.statistics is not None:
             if self.statistics == -1 and (incol.statistics is not None
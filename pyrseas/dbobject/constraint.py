@@ -14,7 +14,7 @@
 import copy
 
 from . import DbObjectDict, DbSchemaObject
-from . import quote_id, split_schema_obj, commentable
+from . import quote_id, split_schema_obj, commentable, interned
 from .index import Index
 
 
@@ -22,6 +22,8 @@ class Constraint(DbSchemaObject):
     """A constraint definition, such as a primary key, foreign key or
     unique constraint.  This also covers check constraints on domains."""
 
+    __slots__ = ('table', 'columns', 'inherited', 'oid', '_table')
+
     keylist = ['schema', 'table', 'name']
     catalog = 'pg_constraint'
 
@@ -35,7 +37,7 @@ class Constraint(DbSchemaObject):
         """
         super(Constraint, self).__init__(name, schema, description)
         self._init_own_privs(None, [])
-        self.table = self.unqualify(table)
+        self.table = interned(self.unqualify(table))
 
     def key_columns(self):
         """Return comma-separated list of key column names
@@ -110,6 +112,8 @@ class Constraint(DbSchemaObject):
 class CheckConstraint(Constraint):
     "A check constraint definition"
 
+    __slots__ = ('expression', 'is_domain_check')
+
     def __init__(self, name, schema, table, description, columns,
                  expression, is_domain_check=False, inherited=False,
                  oid=None):
@@ -167,7 +171,7 @@ class CheckConstraint(Constraint):
             inobj.pop('columns', []), inobj.pop('expression', None),
             (target != ''), inobj.pop('inherited', False))
         if 'depends_on' in inobj:
-            obj.depends_on.extend(inobj.pop('depends_on'))
+            obj.add_dependencies(inobj.pop('depends_on'))
         return obj
 
     @property
@@ -236,6 +240,9 @@ class CheckConstraint(Constraint):
 class PrimaryKey(Constraint):
     "A primary key constraint definition"
 
+    __slots__ = ('access_method', 'tablespace', 'cluster', 'deferrable',
+                 'deferred')
+
     def __init__(self, name, schema, table, description, columns,
                  access_method='btree', tablespace=None, cluster=False,
                  inherited=False, deferrable=False, deferred=False,
@@ -359,6 +366,10 @@ MATCH_TYPES = {'f': 'full', 'p': 'partial', 's': 'simple'}
 class ForeignKey(Constraint):
     "A foreign key constraint definition"
 
+    __slots__ = ('ref_schema', 'ref_table', 'ref_cols', 'on_update',
+                 'on_delete', 'match', 'access_method', 'tablespace',
+                 'cluster', 'deferrable', 'deferred', '_references')
+
     def __init__(self, name, schema, table, description, columns,
                  ref_table, ref_cols, on_update, on_delete, match,
                  access_method='btree', tablespace=None, cluster=False,
@@ -462,7 +473,7 @@ class ForeignKey(Constraint):
             inobj.pop('tablespace', None), inobj.pop('cluster', False),
             inobj.pop('inherited', False), inobj.pop('deferrable', False),
             inobj.pop('deferred', False))
-        obj.depends_on.extend(inobj.get('depends_on', ()))
+        obj.add_dependencies(inobj.get('depends_on', ()))
         return obj
 
     @property
@@ -514,9 +525,10 @@ class ForeignKey(Constraint):
         return {self.name: copy.deepcopy(dct)}
 
     @commentable
-    def add(self):
+    def add(self, not_valid=False):
         """Return string to add the foreign key via ALTER TABLE
 
+        :param not_valid: do not check the existing rows
         :return: SQL statement
         """
         match = ''
@@ -531,6 +543,8 @@ class ForeignKey(Constraint):
             actions += " DEFERRABLE"
         if self.deferred:
             actions += " INITIALLY DEFERRED"
+        if not_valid:
+            actions += " NOT VALID"
 
         return "ALTER TABLE %s ADD CONSTRAINT %s FOREIGN KEY (%s) " \
             "REFERENCES %s (%s)%s%s" % (
@@ -538,6 +552,14 @@ class ForeignKey(Constraint):
                 self.key_columns(), self._references.qualname(),
                 self.ref_columns(), match, actions)
 
+    def validate(self):
+        """Return string to check the existing rows against the foreign key
+
+        :return: SQL statement
+        """
+        return "ALTER TABLE %s VALIDATE CONSTRAINT %s" % (
+            self._table.qualname(), quote_id(self.name))
+
     def alter(self, infk):
         """Generate SQL to transform an existing foreign key
 
@@ -599,6 +621,9 @@ class ForeignKey(Constraint):
 class UniqueConstraint(Constraint):
     "A unique constraint definition"
 
+    __slots__ = ('access_method', 'tablespace', 'cluster', 'deferrable',
+                 'deferred')
+
     def __init__(self, name, schema, table, description, columns,
                  access_method='btree', tablespace=None, cluster=False,
                  inherited=False, deferrable=False, deferred=False,
@@ -721,6 +746,11 @@ class ConstraintDict(DbObjectDict):
 
     cls = Constraint
 
+    @classmethod
+    def catalog_queries(cls, dbversion):
+        return [subcls.query(dbversion) for subcls in (
+            CheckConstraint, PrimaryKey, ForeignKey, UniqueConstraint)]
+
     def _from_catalog(self):
         """Initialize the dictionary of constraints by querying the catalogs"""
         for cls in (CheckConstraint, PrimaryKey, ForeignKey,
@@ -779,4 +809,4 @@ class ConstraintDict(DbObjectDict):
                 # an operator class for a non-builtin type.
                 idx = db.indexes.get((c.schema, c.table, c.name))
                 if idx:
-                    c.depends_on.extend(idx.depends_on)
+                    c.add_dependencies(idx.depends_on)
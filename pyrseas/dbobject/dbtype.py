@@ -657,6 +657,11 @@ class TypeDict(DbObjectDict):
     # TODO: consider to fetch all the objects belonging to extensions:
     # not to dump them but to trace dependency from objects to the extension
 
+    @classmethod
+    def catalog_queries(cls, dbversion):
+        return [subcls.query(dbversion) for subcls in (
+            BaseType, Composite, Domain, Enum, Range)]
+
     def _from_catalog(self):
         """Initialize the dictionary of types by querying the catalogs"""
         for cls in (BaseType, Composite, Domain, Enum, Range):
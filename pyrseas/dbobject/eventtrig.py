@@ -119,6 +119,12 @@ class EventTriggerDict(DbObjectDict):
 
     cls = EventTrigger
 
+    @classmethod
+    def catalog_queries(cls, dbversion):
+        if dbversion < 90300:
+            return []
+        return super(EventTriggerDict, cls).catalog_queries(dbversion)
+
     def _from_catalog(self):
         """Initialize the dictionary of triggers by querying the catalogs"""
         if self.dbconn.version < 90300:
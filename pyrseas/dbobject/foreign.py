@@ -655,6 +655,10 @@ class ForeignTableDict(ClassDict):
 
     cls = ForeignTable
 
+    @classmethod
+    def catalog_queries(cls, dbversion):
+        return [ForeignTable.query(dbversion)]
+
     def _from_catalog(self):
         """Initialize the dictionary of tables by querying the catalogs"""
         for tbl in self.fetch():
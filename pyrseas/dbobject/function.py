@@ -9,7 +9,7 @@
 """
 from pyrseas.yamlutil import MultiLineStr
 from . import DbObjectDict, DbSchemaObject
-from . import commentable, ownable, grantable, split_schema_obj
+from . import commentable, ownable, grantable, split_schema_obj, interned
 
 VOLATILITY_TYPES = {'i': 'immutable', 's': 'stable', 'v': 'volatile'}
 PARALLEL_SAFETY = {'r': 'restricted', 's': 'safe', 'u': 'unsafe'}
@@ -44,6 +44,8 @@ def join_schema_func(func):
 class Proc(DbSchemaObject):
     """A procedure such as a FUNCTION or an AGGREGATE"""
 
+    __slots__ = ('arguments', )
+
     keylist = ['schema', 'name', 'arguments']
     catalog = 'pg_proc'
 
@@ -104,6 +106,11 @@ class Proc(DbSchemaObject):
 class Function(Proc):
     """A procedural language function"""
 
+    __slots__ = ('language', 'returns', 'source', 'obj_file',
+                 'configuration', 'allargs', 'volatility', 'leakproof',
+                 'strict', 'security_definer', 'cost', 'rows', 'oid',
+                 '_defining')
+
     def __init__(self, name, schema, description, owner, privileges,
                  arguments, language, returns, source, obj_file=None,
                  configuration=None, volatility=None, leakproof=False,
@@ -128,8 +135,8 @@ class Function(Proc):
         """
         super(Function, self).__init__(
             name, schema, description, owner, privileges, arguments)
-        self.language = language
-        self.returns = returns
+        self.language = interned(language)
+        self.returns = interned(returns)
         if source and '\n' in source:
             newsrc = []
             for line in source.split('\n'):
@@ -673,6 +680,10 @@ class ProcDict(DbObjectDict):
 
     cls = Proc
 
+    @classmethod
+    def catalog_queries(cls, dbversion):
+        return [subcls.query(dbversion) for subcls in (Function, Aggregate)]
+
     def _from_catalog(self):
         """Initialize the dictionary of procedures by querying the catalogs"""
         for cls in (Function, Aggregate):
@@ -7,7 +7,7 @@
     from DbSchemaObject and DbObjectDict, respectively.
 """
 from . import DbObjectDict, DbSchemaObject
-from . import quote_id, commentable
+from . import quote_id, commentable, interned
 
 
 def split_exprs(idx_exprs):
@@ -51,6 +51,9 @@ class Index(DbSchemaObject):
     """
     # TODO:  This should be fixed in this or a subsequent release.
 
+    __slots__ = ('table', 'unique', 'access_method', 'keys', 'predicate',
+                 'tablespace', 'cluster', 'oid', '_table')
+
     keylist = ['schema', 'table', 'name']
     catalog = 'pg_index'
 
@@ -74,7 +77,7 @@ class Index(DbSchemaObject):
         :param defn: index definition (from pg_get_indexdef)
         """
         super(Index, self).__init__(name, schema, description)
-        self.table = self.unqualify(table)
+        self.table = interned(self.unqualify(table))
         self.unique = unique
         self.access_method = access_method
         if defn is not None:
@@ -129,7 +132,7 @@ class Index(DbSchemaObject):
             inobj.pop(keys, []), inobj.pop('predicate', None),
             inobj.pop('tablespace', None), inobj.pop('cluster', False))
         if 'depends_on' in inobj:
-            obj.depends_on.extend(inobj['depends_on'])
+            obj.add_dependencies(inobj['depends_on'])
         obj.set_oldname(inobj)
         return obj
 
@@ -208,12 +208,16 @@ class OperatorClassDict(DbObjectDict):
 
     cls = OperatorClass
 
+    @classmethod
+    def catalog_queries(cls, dbversion):
+        return [OperatorClass.query(dbversion), OperatorClass.opquery(),
+                OperatorClass.prquery()]
+
     def _from_catalog(self):
         """Initialize the dictionary of operator classes from the catalogs"""
         for opclass in self.fetch():
             self[opclass.key()] = opclass
-        opers = self.dbconn.fetchall(self.cls.opquery())
-        self.dbconn.rollback()
+        opers = self.fetchall(self.cls.opquery())
         for opdata in opers:
             sch = opdata["schema"]
             opc = opdata["name"]
@@ -222,8 +226,7 @@ class OperatorClassDict(DbObjectDict):
             oper =  opdata["operator"]
             opcls = self[(sch, opc, idx)]
             opcls.operators.update({strat: oper})
-        funcs = self.dbconn.fetchall(self.cls.prquery())
-        self.dbconn.rollback()
+        funcs = self.fetchall(self.cls.prquery())
         for oprdata in funcs:
             sch = oprdata["schema"]
             opc = oprdata["name"]
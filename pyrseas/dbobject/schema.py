@@ -6,9 +6,12 @@
     This defines two classes, Schema and SchemaDict, derived from
     DbObject and DbObjectDict, respectively.
 """
+import hashlib
 import os
 
-from pyrseas.yamlutil import yamldump
+from pyrseas.lib.dbconn import DbConnection, major_version
+from pyrseas.lib.trace import traced
+from pyrseas.yamlutil import yamldump, yamlload
 from . import DbObjectDict, DbObject
 from . import quote_id, commentable, ownable, grantable
 from .dbtype import BaseType, Composite, Domain, Enum, Range
@@ -146,14 +149,6 @@ class Schema(DbObject):
         if self.name == 'pg_catalog' and not schobjs:
             return {}
 
-        if hasattr(self, 'datacopy') and self.datacopy:
-            dir = self.extern_dir(opts.data_dir)
-            if not os.path.exists(dir):
-                os.mkdir(dir)
-            for tbl in self.datacopy:
-                self.tables[tbl].data_export(dbschemas.dbconn, dir)
-            dbschemas.dbconn.commit()
-
         if opts.multiple_files:
             dir = self.extern_dir(opts.metadata_dir)
             if not os.path.exists(dir):
@@ -194,18 +189,31 @@ class Schema(DbObject):
             return []
         return ["CREATE SCHEMA %s" % quote_id(self.name)]
 
+    def data_export(self, opts):
+        """Return the tables in this schema whose data is to be exported
+
+        :param opts: options to include/exclude schemas/tables, etc.
+        :return: list of tuples (table, directory for the file)
+        """
+        tables = []
+        if hasattr(self, 'datacopy') and self.datacopy:
+            dir = self.extern_dir(opts.data_dir)
+            if not os.path.exists(dir):
+                os.mkdir(dir)
+            tables = [(self.tables[tbl], dir) for tbl in self.datacopy]
+        return tables
+
     def data_import(self, opts):
-        """Generate SQL to import data from the tables in this schema
+        """Return the tables in this schema whose data is to be imported
 
         :param opts: options to include/exclude schemas/tables, etc.
-        :return: list of SQL statements
+        :return: list of tuples (table, directory for the file)
         """
-        stmts = []
+        tables = []
         if hasattr(self, 'datacopy') and self.datacopy:
             dir = self.extern_dir(opts.data_dir)
-            for tbl in self.datacopy:
-                stmts.append(self.tables[tbl].data_import(dir))
-        return stmts
+            tables = [(self.tables[tbl], dir) for tbl in self.datacopy]
+        return tables
 
     def drop(self):
         if self.name not in ('public', 'pg_catalog'):
@@ -214,6 +222,71 @@ class Schema(DbObject):
             return []
 
 
+_export_conn = None
+
+
+def _export_init(params, snapshot):
+    """Connect a data export worker process to a snapshot
+
+    :param params: connection parameters, see :meth:`DbConnection.params`
+    :param snapshot: identifier returned by pg_export_snapshot()
+
+    The worker makes its own connection, so that it shares no state
+    with the main process, even if it was forked from it.
+    """
+    global _export_conn
+    _export_conn = dbconn = DbConnection(**params)
+    dbconn.connect()
+    dbconn.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+    dbconn.execute("SET TRANSACTION SNAPSHOT '%s'" % snapshot)
+
+
+def _export_table(sql, path, hashsql=None):
+    """Copy data out to a file in a data export worker process
+
+    :param sql: SQL copy command
+    :param path: file name/path to copy into
+    :param hashsql: query returning a hash of the table contents
+    :return: the hash, if requested
+    """
+    _export_conn.sql_copy_to(sql, path)
+    if hashsql is not None:
+        return _export_conn.fetchone(hashsql)['hash']
+
+
+DATACOPY_OPTIONS = ['buffer_size', 'mmap', 'deferred_validation',
+                    'compression', 'skip_unchanged']
+"""Keys of the datacopy configuration that are not schemas"""
+
+MANIFEST_FILE = 'datacopy.manifest'
+"""Name of the file, in the data directory, with the data file checksums"""
+
+
+def file_checksum(path):
+    """Return the SHA-256 checksum of a file
+
+    :param path: file name/path
+    :return: hexadecimal digest string
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while data := f.read(1024 * 1024):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def read_manifest(datadir):
+    """Read the data file checksums recorded by a previous export
+
+    :param datadir: full path to the data directory
+    :return: dictionary of checksums, keyed by relative file path
+    """
+    path = os.path.join(datadir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return yamlload(f) or {}
+
 PREFIXES = {'domain ': 'types', 'type': 'types', 'table ': 'tables',
             'view ': 'tables', 'sequence ': 'tables',
             'materialized view ': 'tables',
@@ -330,6 +403,8 @@ class SchemaDict(DbObjectDict):
             for keys in targ:
                 link_one(targ, objtype, keys)
         for key in datacopy:
+            if key in DATACOPY_OPTIONS:
+                continue
             if not key.startswith('schema '):
                 raise KeyError("Unrecognized object type: %s" % key)
             sch = key[7:]
@@ -339,8 +414,27 @@ class SchemaDict(DbObjectDict):
             if not hasattr(schema, 'datacopy'):
                 schema.datacopy = []
             for tbl in datacopy[key]:
+                fmt = 'csv'
+                mode = 'replace'
+                if isinstance(tbl, dict):
+                    if len(tbl) != 1:
+                        raise KeyError("Invalid datacopy table entry: %s" %
+                                       tbl)
+                    (tbl, tblcfg) = list(tbl.items())[0]
+                    fmt = (tblcfg or {}).get('format', 'csv')
+                    if fmt not in ('csv', 'binary'):
+                        raise ValueError("Invalid datacopy format for "
+                                         "table %s: %s" % (tbl, fmt))
+                    mode = (tblcfg or {}).get('mode', 'replace')
+                    if mode not in ('replace', 'sync'):
+                        raise ValueError("Invalid datacopy mode for "
+                                         "table %s: %s" % (tbl, mode))
                 if hasattr(schema, 'tables') and tbl in schema.tables:
                     schema.datacopy.append(tbl)
+                    if fmt == 'binary':
+                        schema.tables[tbl]._copy_format = fmt
+                    if mode == 'sync':
+                        schema.tables[tbl]._copy_mode = mode
 
     def to_map(self, db, opts):
         """Convert the schema dictionary to a regular dictionary
@@ -362,10 +456,175 @@ class SchemaDict(DbObjectDict):
 
         return schemas
 
-    def data_import(self, opts):
-        """Iterate over schemas with tables to be imported
+    def _binary_versions(self, tables, compression):
+        """Determine which tables can be exported in binary format
+
+        :param tables: list of tuples (table, directory for the file)
+        :param compression: compression method for the files
+        :return: list of tuples (table, directory, server major version
+                 if the table is to be exported in binary format)
+
+        A table configured for binary format is exported as CSV if any
+        of its columns has a type without binary send and receive
+        functions, or a type whose binary representation includes the
+        OIDs of other types: a composite type, or an array of a type
+        created in the database, which may have another OID in the
+        database the file is imported into.  Domains are checked
+        according to their base types.  The file in the format not
+        being exported is removed, so that it is not imported instead.
+        """
+        oids = [table.oid for (table, dir) in tables
+                if getattr(table, '_copy_format', 'csv') == 'binary']
+        if not oids:
+            return [(table, dir, None) for (table, dir) in tables]
+        version = major_version(self.dbconn.version)
+        rows = self.dbconn.fetchall(
+            """WITH RECURSIVE coltypes(attrelid, typid) AS (
+                   SELECT attrelid, atttypid FROM pg_attribute
+                   WHERE attrelid = ANY(%s::oid[]) AND attnum > 0
+                     AND NOT attisdropped
+                   UNION
+                   SELECT attrelid, typbasetype
+                   FROM coltypes JOIN pg_type t ON (typid = t.oid)
+                   WHERE typtype = 'd')
+               SELECT DISTINCT attrelid
+               FROM coltypes JOIN pg_type t ON (typid = t.oid)
+               WHERE typsend = 0 OR typreceive = 0 OR typtype = 'c'
+                  OR (typcategory = 'A' AND typelem >= 16384)""", (oids,))
+        unsupported = set(row['attrelid'] for row in rows)
+        result = []
+        for (table, dir) in tables:
+            binver = None
+            if table.oid in oids:
+                if table.oid not in unsupported:
+                    binver = version
+                stale = table.data_filename(
+                    dir, compression, None if binver else version)
+                if os.path.exists(stale):
+                    os.remove(stale)
+            result.append((table, dir, binver))
+        return result
+
+    @traced
+    def data_export(self, opts, jobs=1, compression=None, checksums=False):
+        """Copy out the data of the tables to be exported
 
         :param opts: options to include/exclude schemas/tables, etc.
+        :param jobs: number of tables to copy concurrently
+        :param compression: compression method for the files, e.g., 'gzip'
+        :param checksums: record the checksums of the files and hashes
+                          of the table contents in the MANIFEST_FILE
+
+        With more than one job, the tables are copied by worker
+        processes, each with its own connection.  The connections share
+        a snapshot exported by the main connection, so that the files
+        are consistent with each other.
+        """
+        tables = []
+        selschs = getattr(opts, 'schemas', [])
+        exclschs = getattr(opts, 'excl_schemas', None) or []
+        for sch in self:
+            if (not selschs or sch in selschs) and sch not in exclschs \
+                    and sch != 'pyrseas':
+                tables.extend(self[sch].data_export(opts))
+        if not tables:
+            return
+        dbconn = self.dbconn
+        tables = self._binary_versions(tables, compression)
+        hashes = []
+        if jobs < 2 or len(tables) < 2:
+            if checksums:
+                # the hashes must match the data copied out
+                if dbconn.conn is not None and not dbconn.conn.closed:
+                    dbconn.rollback()
+                dbconn.execute(
+                    "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            for (table, dir, binver) in tables:
+                table.data_export(dbconn, dir, compression, binver)
+                if checksums:
+                    hashes.append(dbconn.fetchone(
+                        table.data_hash_sql())['hash'])
+            dbconn.commit()
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+
+            if dbconn.conn is not None and not dbconn.conn.closed:
+                dbconn.rollback()
+            dbconn.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            snapshot = dbconn.fetchone(
+                "SELECT pg_export_snapshot() AS snapshot")['snapshot']
+            try:
+                with ProcessPoolExecutor(
+                        min(jobs, len(tables)), initializer=_export_init,
+                        initargs=(dbconn.params(), snapshot)) as executor:
+                    futures = [executor.submit(
+                        _export_table,
+                        *table.data_export_sql(dir, compression, binver),
+                        hashsql=table.data_hash_sql() if checksums else None)
+                               for (table, dir, binver) in tables]
+                    hashes = [future.result() for future in futures]
+            finally:
+                dbconn.rollback()
+        if checksums:
+            manifest = read_manifest(opts.data_dir)
+            for ((table, dir, binver), hash) in zip(tables, hashes):
+                path = table.data_filename(dir, compression, binver)
+                manifest[os.path.relpath(path, opts.data_dir)] = {
+                    'sha256': file_checksum(path), 'rows': hash}
+            with open(os.path.join(opts.data_dir, MANIFEST_FILE), 'w') as f:
+                f.write(yamldump(manifest))
+
+    @traced
+    def data_import(self, opts, deferred_validation=False,
+                    compression=None, version=None, unchanged=None):
+        """Generate SQL to import data into the tables of all schemas
+
+        :param opts: options to include/exclude schemas/tables, etc.
+        :param deferred_validation: add foreign keys as NOT VALID and
+                                    validate them separately
+        :param compression: compression method for the files, e.g., 'gzip'
+        :param version: server version, to import binary format files
+        :param unchanged: function taking a table and the path of its
+                          data file, which returns True if the table
+                          need not be loaded
         :return: list of SQL statements
+
+        The foreign keys referring to any of the tables are dropped
+        once, before all tables are truncated and loaded, and added
+        back once at the end, so that each is validated only once.
+        Each TRUNCATE is immediately followed by the copy of its table,
+        so that the loads can be run concurrently.  Tables configured
+        with the ``sync`` mode are instead loaded into a staging table,
+        from which only the differences are applied: the foreign keys
+        referring to them are kept, since the table is not truncated.
         """
-        return [self[sch].data_import(opts) for sch in self]
+        loads = []
+        for sch in self:
+            for (table, dir) in self[sch].data_import(opts):
+                binver = None
+                if version is not None and \
+                        getattr(table, '_copy_format', 'csv') == 'binary':
+                    binver = major_version(version)
+                tblstmts = table.data_import(
+                    dir, compression, binver,
+                    getattr(table, '_copy_mode', 'replace') == 'sync')
+                if unchanged is not None and unchanged(table, [
+                        stmt for stmt in tblstmts
+                        if isinstance(stmt, tuple)][0][3]):
+                    continue
+                loads.append((table, tblstmts))
+        fkeys = []
+        for (table, tblstmts) in loads:
+            if getattr(table, '_copy_mode', 'replace') == 'sync':
+                continue
+            for constr in getattr(table, '_referred_by', []):
+                if not any(constr is fk for fk in fkeys):
+                    fkeys.append(constr)
+        stmts = ["ALTER TABLE %s DROP CONSTRAINT %s" % (
+            fk._table.qualname(), fk.name) for fk in fkeys]
+        for (table, tblstmts) in loads:
+            stmts.extend(tblstmts)
+        stmts.extend(fk.add(deferred_validation) for fk in fkeys)
+        if deferred_validation:
+            stmts.extend(fk.validate() for fk in fkeys)
+        return stmts
@@ -11,8 +11,12 @@
 import copy
 import re
 import os
+import shlex
 import sys
+from glob import glob, escape as glob_escape
 
+from pyrseas.lib.dbconn import COMPRESSION_SUFFIXES, DECOMPRESS_PROGRAMS
+from pyrseas.lib.dbconn import compression_suffix, file_compression
 from . import DbObjectDict, DbSchemaObject, split_schema_obj
 from . import quote_id, commentable, ownable, grantable
 from .constraint import CheckConstraint, PrimaryKey
@@ -21,6 +25,25 @@ from .privileges import add_grant
 
 MAX_BIGINT = 9223372036854775807
 
+STAGE_TABLE = 'pyrseas_stage'
+"""Temporary table into which data files are loaded to be synced"""
+
+
+def copy_command(stmt):
+    """Return the text of a psql \\copy command
+
+    :param stmt: tuple (\\copy, table, from, path, format), as returned
+                 by :meth:`Table.data_import`
+    :return: string
+
+    A path given to a decompression program is quoted for the shell,
+    and single quotes are doubled for psql.
+    """
+    (cmd, table, source, path, fmt) = stmt
+    if source.startswith(" from program "):
+        path = shlex.quote(path)
+    return "".join((cmd, table, source, path.replace("'", "''"), fmt))
+
 
 def seq_max_value(seq):
     if seq.max_value is None or seq.max_value == MAX_BIGINT:
@@ -128,25 +151,53 @@ class Sequence(DbClass):
     def allprivs(self):
         return 'rwU'
 
-    def get_attrs(self, dbconn):
-        """Get the attributes for the sequence
+    @staticmethod
+    def attrs_query():
+        return """SELECT schemaname AS schema, sequencename AS name,
+                         start_value, increment_by, max_value, min_value,
+                         cache_size AS cache_value, data_type
+                  FROM pg_sequences
+                  WHERE schemaname NOT IN ('pg_catalog', 'information_schema')
+                  ORDER BY schemaname, sequencename"""
 
-        :param dbconn: a DbConnection object
-        """
-        query = """SELECT start_value, increment_by, max_value, min_value,
-                          cache_size AS cache_value, data_type
-                   FROM pg_sequences
-                   WHERE schemaname = '%s'
-                   AND sequencename = '%s'""" % (self.schema, self.name)
-        data = dbconn.fetchone(query)
+    @staticmethod
+    def owner_query():
+        return """SELECT nspname AS schema, relname AS name,
+                         refobjid::regclass::text AS owner_table,
+                         refobjsubid AS owner_column
+                  FROM pg_depend JOIN pg_class c ON (objid = c.oid)
+                       JOIN pg_namespace n ON (relnamespace = n.oid)
+                  WHERE classid = 'pg_class'::regclass
+                    AND refclassid = 'pg_class'::regclass
+                    AND relkind = 'S'
+                  ORDER BY nspname, relname, refobjid, refobjsubid"""
 
-        for key, val in list(data.items()):
-            setattr(self, key, val)
+    @staticmethod
+    def dependent_query():
+        return """SELECT nspname AS schema, relname AS name,
+                         adrelid::regclass::text AS dependent_table
+                  FROM pg_attrdef a JOIN pg_depend ON (a.oid = objid)
+                       JOIN pg_class c ON (refobjid = c.oid)
+                       JOIN pg_namespace n ON (relnamespace = n.oid)
+                  WHERE classid = 'pg_attrdef'::regclass
+                    AND refclassid = 'pg_class'::regclass
+                    AND relkind = 'S'
+                  ORDER BY nspname, relname, adrelid"""
+
+    def set_attrs(self, data):
+        """Set the attributes of the sequence
+
+        :param data: row returned by :meth:`attrs_query`
+        """
+        for key in ('start_value', 'increment_by', 'max_value', 'min_value',
+                    'cache_value', 'data_type'):
+            setattr(self, key, data[key])
 
-    def get_dependent_table(self, dbconn):
-        """Get the table and column name that uses or owns the sequence
+    def set_dependent_table(self, owner, dependent):
+        """Set the table and column name that uses or owns the sequence
 
-        :param dbconn: a DbConnection object
+        :param owner: row returned by :meth:`owner_query`, if any
+        :param dependent: row returned by :meth:`dependent_query`, if any
         """
 
         def split_table(obj, sch):
@@ -163,22 +214,12 @@ class Sequence(DbClass):
                 tbl = tbl[1:-1]
             return tbl
 
-        data = dbconn.fetchone(
-            """SELECT refobjid::regclass, refobjsubid
-               FROM pg_depend
-               WHERE objid = '%s'::regclass
-                 AND refclassid = 'pg_class'::regclass""" % self.identifier())
-        if data:
-            self.owner_table = split_table(data["refobjid"], self.schema)
-            self.owner_column = data["refobjsubid"]
-            return
-        data = dbconn.fetchone(
-            """SELECT adrelid::regclass AS regclass
-               FROM pg_attrdef a JOIN pg_depend ON (a.oid = objid)
-               WHERE refobjid = '%s'::regclass
-               AND classid = 'pg_attrdef'::regclass""" % self.qualname())
-        if data:
-            self.dependent_table = split_table(data["regclass"], self.schema)
+        if owner is not None:
+            self.owner_table = split_table(owner["owner_table"], self.schema)
+            self.owner_column = owner["owner_column"]
+        elif dependent is not None:
+            self.dependent_table = split_table(dependent["dependent_table"],
+                                               self.schema)
 
     def to_map(self, db, opts):
         """Convert a sequence definition to a YAML-suitable format
@@ -406,10 +447,11 @@ class Table(DbClass):
 
     @staticmethod
     def inhquery():
-        return """SELECT inhrelid::regclass AS sub,
-                         inhparent::regclass AS parent, inhseqno
-                  FROM pg_inherits
-                  ORDER BY 1, 3"""
+        return """SELECT nspname AS schema, relname AS name,
+                         inhparent::regclass::text AS parent, inhseqno
+                  FROM pg_inherits JOIN pg_class c ON (inhrelid = c.oid)
+                       JOIN pg_namespace n ON (relnamespace = n.oid)
+                  ORDER BY inhrelid, inhseqno"""
 
     @staticmethod
     def from_map(name, schema, inobj):
@@ -666,7 +708,8 @@ class Table(DbClass):
         input.
         """
         stmts = []
-        if len(intable.columns) == 0:
+        if len(intable.columns) == 0 and \
+                intable.partition_bound_spec is None:
             raise KeyError("Table '%s' has no columns" % intable.name)
         colnames = [col.name for col in self.columns if not col.dropped]
         dbcols = len(colnames)
@@ -725,7 +768,8 @@ class Table(DbClass):
         statements to drop any columns missing from the one
         represented by the input.
         """
-        if len(intable.columns) == 0:
+        if len(intable.columns) == 0 and \
+                intable.partition_bound_spec is None:
             raise KeyError("Table '%s' has no columns" % intable.name)
         stmts = []
         incolnames = set(attr.name for attr in intable.columns)
@@ -736,42 +780,163 @@ class Table(DbClass):
 
         return stmts
 
-    def data_export(self, dbconn, dirpath):
-        """Copy table data out to a file
+    def data_filename(self, dirpath, compression=None, binary_version=None):
+        """Return the path of the file holding the table data
+
+        :param dirpath: full path to the directory for the file
+        :param compression: compression method, e.g., 'gzip'
+        :param binary_version: server major version, for a file in
+                               binary COPY format
+        :return: file path
+        """
+        ext = 'data'
+        if binary_version is not None:
+            ext = 'pg%d.bin' % binary_version
+        return os.path.join(dirpath, self.extern_filename(ext) +
+                            compression_suffix(compression))
+
+    def data_export_sql(self, dirpath, compression=None, binary_version=None):
+        """Return the SQL and file path to copy table data out
 
-        :param dbconn: database connection to use
         :param dirpath: full path to the directory for the file to be created
+        :param compression: compression method, e.g., 'gzip'
+        :param binary_version: server major version, to copy in binary
+                               COPY format rather than CSV
+        :return: tuple of COPY statement and file path
         """
-        filepath = os.path.join(dirpath, self.extern_filename('data'))
+        filepath = self.data_filename(dirpath, compression, binary_version)
         if self.primary_key is not None:
             order_by = [quote_id(self.columns[col - 1].name)
                         for col in self.primary_key.columns]
         else:
             order_by = ['%d' % (n + 1) for n in range(len(self.columns))]
-        dbconn.sql_copy_to(
-            "COPY (SELECT * FROM %s ORDER BY %s) TO STDOUT WITH CSV" % (
-                self.qualname(), ', '.join(order_by)), filepath)
+        return ("COPY (SELECT * FROM %s ORDER BY %s) TO STDOUT WITH %s" % (
+            self.qualname(), ', '.join(order_by),
+            'CSV' if binary_version is None else 'BINARY'), filepath)
+
+    def data_hash_sql(self):
+        """Return a query computing a hash of the table contents
+
+        :return: SQL statement
 
-    def data_import(self, dirpath):
+        The hash combines the number of rows with the sum of hashes of
+        each row's text representation, so it does not depend on the
+        order of the rows and needs little memory on the server.
+        """
+        return ("SELECT count(*) || ':' || coalesce(sum(('x' || "
+                "left(md5(t::text), 16))::bit(64)::bigint), 0) AS hash "
+                "FROM %s t" % self.qualname())
+
+    def data_export(self, dbconn, dirpath, compression=None,
+                    binary_version=None):
+        """Copy table data out to a file
+
+        :param dbconn: database connection to use
+        :param dirpath: full path to the directory for the file to be created
+        :param compression: compression method, e.g., 'gzip'
+        :param binary_version: server major version, to copy in binary
+                               COPY format rather than CSV
+        """
+        dbconn.sql_copy_to(*self.data_export_sql(dirpath, compression,
+                                                 binary_version))
+
+    def data_import(self, dirpath, compression=None, binary_version=None,
+                    sync=False):
         """Generate SQL to import data into a table
 
         :param dirpath: full path for the directory for the file
+        :param compression: compression method, e.g., 'gzip'
+        :param binary_version: server major version, to import a file
+                               in binary COPY format if there is one
+        :param sync: load the file into a staging table and apply only
+                     the differences, instead of truncating the table
+        :return: list of SQL statements
+
+        Foreign keys referring to the table have to be dropped first.
+        See :meth:`SchemaDict.data_import`.  If no compression method
+        is given and there is no uncompressed file, a compressed one
+        is used if present.  A binary file is only imported if it was
+        exported from a server of the same major version, otherwise
+        the CSV file is used.
+        """
+        def existing(filepath):
+            if compression is None and not os.path.exists(filepath):
+                for suffix in COMPRESSION_SUFFIXES.values():
+                    if os.path.exists(filepath + suffix):
+                        return filepath + suffix
+            return filepath
+
+        binary = False
+        if binary_version is not None:
+            filepath = existing(self.data_filename(dirpath, compression,
+                                                   binary_version))
+            binary = os.path.exists(filepath)
+        if not binary:
+            filepath = existing(self.data_filename(dirpath, compression))
+            if binary_version is not None and not os.path.exists(filepath) \
+                    and glob(os.path.join(glob_escape(dirpath), glob_escape(
+                        self.extern_filename('pg')) + '*.bin*')):
+                raise ValueError("Data file for table %s is in binary "
+                                 "format for a different server version" %
+                                 self.qualname())
+        method = file_compression(filepath)
+        if method is None:
+            source = " from '"
+        else:
+            source = " from program '%s " % DECOMPRESS_PROGRAMS[method]
+        if not sync:
+            return ["TRUNCATE ONLY %s" % self.qualname(),
+                    ("\\copy ", self.qualname(), source, filepath,
+                     "' binary" if binary else "' csv")]
+        generated = any(col.generated is not None for col in self.columns)
+        return ["CREATE TEMP TABLE %s (LIKE %s%s)" % (
+            STAGE_TABLE, self.qualname(),
+            " INCLUDING GENERATED" if generated else ''),
+                ("\\copy ", STAGE_TABLE, source, filepath,
+                 "' binary" if binary else "' csv")] + \
+            self.data_sync() + ["DROP TABLE %s" % STAGE_TABLE]
+
+    def data_sync(self):
+        """Generate SQL to apply the differences from the staging table
+
         :return: list of SQL statements
+
+        The rows of the table are matched to those loaded into the
+        STAGE_TABLE by primary key.  Only the rows that are missing,
+        changed or no longer present are inserted, updated or deleted.
+        Generated columns are left to be computed by the server, and
+        identity columns generated always are inserted overriding the
+        system value, but not updated.
         """
-        filepath = os.path.join(dirpath, self.extern_filename('data'))
-        stmts = []
-        if hasattr(self, '_referred_by'):
-            for constr in self._referred_by:
-                stmts.append(
-                    "ALTER TABLE %s DROP CONSTRAINT %s"
-                    % (constr._table.qualname(), constr.name)
-                )
-        stmts.append("TRUNCATE ONLY %s" % self.qualname())
-        stmts.append(("\\copy ", self.qualname(), " from '", filepath,
-                      "' csv"))
-        if hasattr(self, '_referred_by'):
-            for constr in self._referred_by:
-                stmts.append(constr.add())
+        if self.primary_key is None:
+            raise ValueError("Table %s needs a primary key to be synced" %
+                             self.qualname())
+        keys = [self.columns[col - 1].name if isinstance(col, int) else col
+                for col in self.primary_key.columns]
+        keys = [quote_id(col) for col in keys]
+        cols = [quote_id(col.name) for col in self.columns
+                if col.generated is None]
+        always = [quote_id(col.name) for col in self.columns
+                  if col.identity == 'always']
+        vals = [col for col in cols if col not in keys and col not in always]
+        match = " AND ".join("s.%s = t.%s" % (col, col) for col in keys)
+        stmts = ["DELETE FROM %s t WHERE NOT EXISTS (SELECT 1 FROM %s s "
+                 "WHERE %s)" % (self.qualname(), STAGE_TABLE, match)]
+        if vals:
+            stmts.append(
+                "UPDATE %s t SET %s FROM %s s WHERE %s AND (%s) IS DISTINCT "
+                "FROM (%s)" % (
+                    self.qualname(),
+                    ", ".join("%s = s.%s" % (col, col) for col in vals),
+                    STAGE_TABLE, match,
+                    ", ".join("t.%s" % col for col in vals),
+                    ", ".join("s.%s" % col for col in vals)))
+        stmts.append("INSERT INTO %s (%s)%s SELECT %s FROM %s s WHERE NOT "
+                     "EXISTS (SELECT 1 FROM %s t WHERE %s)" % (
+                         self.qualname(), ", ".join(cols),
+                         " OVERRIDING SYSTEM VALUE" if always else '',
+                         ", ".join("s.%s" % col for col in cols),
+                         STAGE_TABLE, self.qualname(), match))
         return stmts
 
     def get_implied_deps(self, db):
@@ -810,30 +975,44 @@ class ClassDict(DbObjectDict):
 
     cls = DbClass
 
+    @classmethod
+    def catalog_queries(cls, dbversion):
+        from .view import View, MaterializedView
+        return [Table.query(dbversion), Table.inhquery(),
+                Sequence.query(dbversion), Sequence.attrs_query(),
+                Sequence.owner_query(), Sequence.dependent_query(),
+                View.query(dbversion), MaterializedView.query(dbversion)]
+
     def _from_catalog(self):
         """Initialize the dictionary of tables by querying the catalogs"""
         self.cls = Table
         for obj in self.fetch():
             self[obj.key()] = obj
             self.by_oid[obj.oid] = obj
-        inhtbls = self.dbconn.fetchall(Table.inhquery())
-        self.dbconn.rollback()
-        for tdata in inhtbls:
-            tbl = tdata["sub"]
-            partbl = tdata["parent"]
-            num = tdata["inhseqno"]
-            (sch, tbl) = split_schema_obj(tbl)
-            table = self[(sch, tbl)]
-            (sch, tbl) = split_schema_obj(partbl)
-            if table.schema == sch:
-                partbl = tbl
+        for tdata in self.fetchall(Table.inhquery()):
+            table = self[(tdata["schema"], tdata["name"])]
+            (sch, partbl) = split_schema_obj(tdata["parent"])
+            if table.schema != sch:
+                partbl = tdata["parent"]
             table.inherits.append(partbl)
         self.cls = Sequence
         for obj in self.fetch():
             self[obj.key()] = obj
             self.by_oid[obj.oid] = obj
-            obj.get_attrs(self.dbconn)
-            obj.get_dependent_table(self.dbconn)
+        for data in self.fetchall(Sequence.attrs_query()):
+            seq = self.get((data["schema"], data["name"]))
+            if seq is not None:
+                seq.set_attrs(data)
+        # only the first owner of each sequence is used
+        owners = {}
+        for data in self.fetchall(Sequence.owner_query()):
+            owners.setdefault((data["schema"], data["name"]), data)
+        dependents = {}
+        for data in self.fetchall(Sequence.dependent_query()):
+            dependents.setdefault((data["schema"], data["name"]), data)
+        for (key, obj) in self.items():
+            if isinstance(obj, Sequence):
+                obj.set_dependent_table(owners.get(key), dependents.get(key))
         from .view import View, MaterializedView
         self.cls = View
         for obj in self.fetch():
@@ -896,7 +1075,7 @@ class ClassDict(DbObjectDict):
                 raise KeyError("Unrecognized object type: %s" % k)
             obj = self[(schema.name, key)]
             if 'depends_on' in inobj:
-                obj.depends_on.extend(inobj['depends_on'])
+                obj.add_dependencies(inobj['depends_on'])
 
     def find(self, obj, schema=None):
         """Find a table given its name.
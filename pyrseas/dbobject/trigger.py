@@ -7,7 +7,7 @@
     DbSchemaObject, and TriggerDict derived from DbObjectDict.
 """
 from . import DbObjectDict, DbSchemaObject
-from . import quote_id, commentable, split_schema_obj
+from . import quote_id, commentable, split_schema_obj, interned
 from .function import split_schema_func, join_schema_func
 
 EVENT_TYPES = ['insert', 'delete', 'update', 'truncate']
@@ -16,6 +16,11 @@ EVENT_TYPES = ['insert', 'delete', 'update', 'truncate']
 class Trigger(DbSchemaObject):
     """A procedural language trigger"""
 
+    __slots__ = ('table', 'procedure', 'arguments', 'timing', 'level',
+                 'events', 'constraint', 'deferrable', 'initially_deferred',
+                 'referencing_new', 'referencing_old', 'columns',
+                 'condition', 'oid', '_table', '_iscfg')
+
     keylist = ['schema', 'table', 'name']
     catalog = 'pg_trigger'
 
@@ -46,7 +51,7 @@ class Trigger(DbSchemaObject):
         """
         super(Trigger, self).__init__(name, schema, description)
         self._init_own_privs(None, [])
-        self.table = table
+        self.table = interned(table)
         if procedure[-2:] == '()':
             procedure = procedure[:-2]
         if '.' in procedure:
@@ -64,7 +64,7 @@ class View(DbClass):
                                   list(col.values())[0].get("type", None))
                            for i, col in enumerate(inobj.get("columns"))]
         if 'depends_on' in inobj:
-            obj.depends_on.extend(inobj['depends_on'])
+            obj.add_dependencies(inobj['depends_on'])
         obj.fix_privileges()
         obj.set_oldname(inobj)
         return obj
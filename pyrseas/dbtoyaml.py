@@ -7,21 +7,46 @@ import sys
 
 from pyrseas import __version__
 from pyrseas.yamlutil import yamldump
-from pyrseas.database import Database
-from pyrseas.cmdargs import cmd_parser, parse_args
+from pyrseas.lib.qstats import QueryStats
+from pyrseas.lib.trace import phase
+from pyrseas.cmdargs import cmd_parser, parse_args, finish_run
 
 
-def main(schema=None):
-    """Convert database table specifications to YAML."""
+def main(argv=None, stdout=None, stderr=None):
+    """Convert database table specifications to YAML.
+
+    :param argv: list of arguments (default sys.argv[1:])
+    :param stdout: stream for the output (default sys.stdout), unless
+                   the --output option is given
+    :param stderr: stream for messages (default sys.stderr)
+
+    This can be called in-process, e.g., by test harnesses.  Errors
+    in the arguments raise SystemExit.
+    """
     parser = cmd_parser("Extract the schema of a PostgreSQL database in "
                         "YAML format", __version__)
     parser.add_argument('-m', '--multiple-files', action='store_true',
                         help='output to multiple files (metadata directory)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of tables to copy out concurrently '
+                        '(default %(default)s)')
     parser.add_argument('-O', '--no-owner', action='store_true',
                         help='exclude object ownership information')
     parser.add_argument('-x', '--no-privileges', action='store_true',
                         dest='no_privs',
                         help='exclude privilege (GRANT/REVOKE) information')
+    parser.add_argument('--fingerprints', metavar='FILE',
+                        help='also save structural fingerprints of the '
+                        'schemas to a YAML file')
+    parser.add_argument('--snapshot', metavar='FILE',
+                        help='also save the catalog rows to a snapshot '
+                        'file')
+    parser.add_argument('--stats', action='store_true',
+                        help='print statistics of the catalog queries to '
+                        'standard error')
+    parser.add_argument('--stats-json', metavar='FILE',
+                        help='save statistics of the catalog queries to a '
+                        'JSON file')
     group = parser.add_argument_group("Object inclusion/exclusion options",
                                       "(each can be given multiple times)")
     group.add_argument('-n', '--schema', metavar='SCHEMA', dest='schemas',
@@ -38,20 +63,42 @@ def main(schema=None):
                        dest='excl_tables', action='append', default=[],
                        help="do NOT extract the named table(s) "
                        "(default none)")
-    parser.set_defaults(schema=schema)
-    cfg = parse_args(parser)
-    output = cfg['files']['output']
-    options = cfg['options']
-    if options.multiple_files and output:
-        parser.error("Cannot specify both --multiple-files and --output")
-
-    db = Database(cfg)
-    dbmap = db.to_map()
-
-    if not options.multiple_files:
-        print(yamldump(dbmap), file=output or sys.stdout)
-        if output:
-            output.close()
+    cfg = parse_args(parser, argv)
+    try:
+        stdout = stdout or sys.stdout
+        stderr = stderr or sys.stderr
+        output = cfg['files']['output']
+        options = cfg['options']
+        if options.multiple_files and output:
+            parser.error("Cannot specify both --multiple-files and --output")
+        if options.jobs < 1:
+            parser.error("Number of jobs must be at least 1")
+
+        # not imported at the top, so that --help need not load it
+        from pyrseas.database import Database
+        db = Database(cfg)
+        if options.stats or options.stats_json:
+            db.dbconn.stats = QueryStats()
+        if options.fingerprints:
+            with open(options.fingerprints, 'w') as f:
+                f.write(yamldump(db.fingerprints()))
+        if options.snapshot:
+            db.save_snapshot(options.snapshot)
+        dbmap = db.to_map()
+
+        if not options.multiple_files:
+            with phase("write output"):
+                print(yamldump(dbmap), file=output or stdout)
+                if output:
+                    output.close()
+        if options.stats:
+            print(db.dbconn.stats.report(), file=stderr)
+        if options.stats_json:
+            with open(options.stats_json, 'w') as f:
+                f.write(db.dbconn.stats.to_json())
+    finally:
+        finish_run(cfg)
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+    lib.binfile
+    ~~~~~~~~~~~
+
+    Functions to save Python objects, e.g., compiled database
+    specifications, to versioned binary files and to restore them.
+
+    The binary files are pickled, so loading one can run arbitrary
+    code: they are only used for the local cache.  Files that may be
+    exchanged, e.g., catalog snapshots, are saved as data only, in
+    JSON, by :func:`save_data`.
+"""
+import hashlib
+import json
+import os
+import pickle
+import sys
+
+from pyrseas import __version__
+
+FORMAT_VERSION = 4
+MAGIC = b'PYRSEAS'
+MIN_RECURSION_LIMIT = 20000
+CHUNK_SIZE = 1 << 20
+
+
+def cache_dir():
+    """Return the path to the directory holding Pyrseas cache files
+
+    :return: path
+
+    The directory can be specified with the PYRSEAS_CACHE_DIR
+    environment variable.
+    """
+    path = os.environ.get("PYRSEAS_CACHE_DIR")
+    if path:
+        return os.path.abspath(path)
+    if sys.platform == 'win32':
+        base = os.getenv('LOCALAPPDATA', os.getenv('APPDATA', ''))
+    else:
+        base = os.environ.get('XDG_CACHE_HOME', os.path.join(
+            os.environ['HOME'], '.cache'))
+    return os.path.join(os.path.abspath(base), 'pyrseas')
+
+
+def digest(*parts):
+    """Return a hexadecimal SHA-256 digest of strings or bytes
+
+    :param parts: strings or bytes objects
+    :return: digest string
+    """
+    return digest_parts(parts)
+
+
+def digest_parts(parts):
+    """Return a hexadecimal SHA-256 digest of a sequence of parts
+
+    :param parts: iterable of strings, bytes objects or files opened
+                  in binary mode
+    :return: digest string
+
+    Files are read in chunks of CHUNK_SIZE bytes, so that large files
+    are never held in memory.  The parts may be produced by a
+    generator, e.g., one that opens each file in turn.
+    """
+    hsh = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        if isinstance(part, bytes):
+            hsh.update(part)
+        else:
+            for chunk in iter(lambda: part.read(CHUNK_SIZE), b''):
+                hsh.update(chunk)
+        hsh.update(b'\0')
+    return hsh.hexdigest()
+
+
+def _header(kind):
+    return b'%s %s %d %s\n' % (MAGIC, kind.encode('ascii'), FORMAT_VERSION,
+                               __version__.encode('ascii'))
+
+
+class _recursion_limit(object):
+    "Context manager to allow pickling of deeply linked object graphs"
+
+    def __enter__(self):
+        self.limit = sys.getrecursionlimit()
+        if self.limit < MIN_RECURSION_LIMIT:
+            sys.setrecursionlimit(MIN_RECURSION_LIMIT)
+
+    def __exit__(self, *exc):
+        sys.setrecursionlimit(self.limit)
+
+
+def _write(path, kind, dump):
+    dirname = os.path.dirname(path)
+    if dirname and not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    tmppath = "%s.%d.tmp" % (path, os.getpid())
+    try:
+        with open(tmppath, 'wb') as f:
+            f.write(_header(kind))
+            dump(f)
+        os.replace(tmppath, path)
+    finally:
+        if os.path.exists(tmppath):
+            os.remove(tmppath)
+
+
+def _read(path, kind, load):
+    with open(path, 'rb') as f:
+        header = f.readline()
+        if header != _header(kind):
+            raise ValueError("File '%s' is not a compatible Pyrseas %s file"
+                             % (path, kind))
+        return load(f)
+
+
+def save(path, kind, obj):
+    """Save an object to a binary file
+
+    :param path: file name/path to write
+    :param kind: short identifier of the type of file, e.g., 'spec'
+    :param obj: object to save
+
+    The file is first written under a temporary name and then renamed,
+    so that concurrent readers never see a partial file.
+    """
+    def dump(f):
+        with _recursion_limit():
+            pickle.dump(obj, f, pickle.HIGHEST_PROTOCOL)
+    _write(path, kind, dump)
+
+
+def load(path, kind):
+    """Restore an object from a binary file
+
+    :param path: file name/path to read
+    :param kind: short identifier of the type of file, e.g., 'spec'
+    :return: the restored object
+
+    Raises ValueError if the file was not written by :func:`save` for
+    the same kind of object, format version and Pyrseas version.  The
+    file must be trusted: unpickling it can execute arbitrary code.
+    """
+    def unpickle(f):
+        with _recursion_limit():
+            return pickle.load(f)
+    return _read(path, kind, unpickle)
+
+
+def save_data(path, kind, data):
+    """Save plain data to a versioned JSON file
+
+    :param path: file name/path to write
+    :param kind: short identifier of the type of file, e.g., 'snapshot'
+    :param data: dictionaries, lists, strings, numbers, booleans and
+                 None, possibly nested
+
+    As with :func:`save`, the file is written under a temporary name
+    and then renamed.
+    """
+    def dump(f):
+        f.write(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+    _write(path, kind, dump)
+
+
+def load_data(path, kind):
+    """Restore the data saved by :func:`save_data`
+
+    :param path: file name/path to read
+    :param kind: short identifier of the type of file, e.g., 'snapshot'
+    :return: the data, with lists in place of any tuples
+
+    Raises ValueError if the file was not written by :func:`save_data`
+    for the same kind of file, format version and Pyrseas version, or
+    is not valid JSON.  Since only data is restored, the file need not
+    be trusted.
+    """
+    return _read(path, kind, lambda f: json.loads(f.read().decode('utf-8')))
@@ -6,16 +6,172 @@
     A `DbConnection` is a helper class representing a connection to a
     PostgreSQL database.
 """
+import copy
+import gzip
+import mmap
+import os
+import select
 import sys
+import time
 
-from psycopg import connect
+from psycopg import AsyncConnection, connect
+from psycopg.conninfo import conninfo_to_dict
+from psycopg.copy import LibpqWriter
 from psycopg.rows import dict_row
 
+from pyrseas.lib.qstats import caller, result_bytes
+from pyrseas.lib.trace import phase
+
+try:
+    from psycopg_pool import ConnectionPool
+except ImportError:
+    ConnectionPool = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    import lz4.frame as lz4frame
+except ImportError:
+    lz4frame = None
+
+COPY_BUFSIZE = 1024 * 1024
+
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst', 'lz4': '.lz4'}
+"""File name suffixes of the supported compression methods"""
+
+DECOMPRESS_PROGRAMS = {'gzip': 'gzip -dc', 'zstd': 'zstd -dc',
+                       'lz4': 'lz4 -dc'}
+"""Shell commands used by psql to decompress a data file"""
+
+
+def major_version(version):
+    """Return the major version part of a server version number
+
+    :param version: server version number, e.g., 160002
+    :return: major version, e.g., 16, or 96 for 90624
+    """
+    if version >= 100000:
+        return version // 10000
+    return version // 10000 * 10 + version // 100 % 100
+
+
+def compression_suffix(method):
+    """Return the file name suffix for a compression method
+
+    :param method: compression method, or None for no compression
+    :return: suffix string, e.g., '.gz'
+    """
+    if method is None:
+        return ''
+    if method not in COMPRESSION_SUFFIXES:
+        raise ValueError("Unsupported compression method: %s" % method)
+    return COMPRESSION_SUFFIXES[method]
+
+
+def file_compression(path):
+    """Return the compression method implied by a file name
+
+    :param path: file name/path
+    :return: compression method, or None if not compressed
+    """
+    for (method, suffix) in COMPRESSION_SUFFIXES.items():
+        if path.endswith(suffix):
+            return method
+    return None
+
+
+def open_data_file(path, mode):
+    """Open a data file, compressed according to its suffix
+
+    :param path: file name/path
+    :param mode: 'rb' or 'wb'
+    :return: file object, which compresses or decompresses as data
+             is written or read
+    """
+    method = file_compression(path)
+    if method == 'gzip':
+        return gzip.open(path, mode, compresslevel=6)
+    elif method == 'zstd':
+        if zstandard is None:
+            raise ValueError("The zstandard module is needed for %s" % path)
+        return zstandard.open(path, mode)
+    elif method == 'lz4':
+        if lz4frame is None:
+            raise ValueError("The lz4 module is needed for %s" % path)
+        return lz4frame.open(path, mode)
+    return open(path, mode)
+
+
+class FlushingWriter(LibpqWriter):
+    """A COPY writer that waits until each chunk is sent to the server
+
+    The default writer leaves the data not yet accepted by the server
+    in the libpq output buffer, which then grows with the size of the
+    input when the server is slower than the client.  Only the
+    public libpq interface of the connection is used to flush it.
+    """
+
+    def write(self, data):
+        super(FlushingWriter, self).write(data)
+        pgconn = self.connection.pgconn
+        while pgconn.flush():
+            (rlist, _, _) = select.select([pgconn.socket], [pgconn.socket],
+                                          [])
+            if rlist:
+                pgconn.consume_input()
+
+
+_pools = {}
+
+
+def shared_pool(conninfo, **kwargs):
+    """Return the connection pool for a connection string
+
+    :param conninfo: libpq connection string
+    :param kwargs: options for a new pool, e.g., min_size or max_size
+    :return: psycopg_pool ConnectionPool
+
+    Pools are created on first use and then shared by all the
+    DbConnection objects for the same connection string, e.g., those
+    of several Database instances in a long-running process.  The
+    connections are checked before being handed out and their session
+    settings are reset when they are returned.
+    """
+    if conninfo not in _pools:
+        if ConnectionPool is None:
+            raise ValueError("The psycopg_pool module is needed for "
+                             "connection pooling")
+        options = {'min_size': 1, 'check': ConnectionPool.check_connection,
+                   'reset': _reset_connection}
+        options.update(kwargs)
+        _pools[conninfo] = ConnectionPool(conninfo, open=True, **options)
+    return _pools[conninfo]
+
+
+def _reset_connection(conn):
+    "Undo session settings, e.g., the search path, of a pooled connection"
+    conn.execute("RESET ALL")
+    conn.commit()
+
+
+def close_pools():
+    """Close all shared connection pools"""
+    while _pools:
+        _pools.popitem()[1].close()
+
 
 class DbConnection(object):
     """A database connection, possibly disconnected"""
 
-    def __init__(self, dbname, user=None, pswd=None, host=None, port=None):
+    stats = None
+    """A QueryStats object to which the query statistics are added"""
+
+    recorder = None
+    """A QueryRecorder to which the queries and their results are added"""
+
+    def __init__(self, dbname, user=None, pswd=None, host=None, port=None,
+                 pool=None):
         """Initialize the connection information
 
         :param dbname: database name
@@ -23,6 +179,10 @@ class DbConnection(object):
         :param pswd: user password
         :param host: host name
         :param port: host port number
+        :param pool: a connection pool, e.g., a psycopg_pool
+                     ConnectionPool, or a dictionary of options to
+                     use a pool shared by connections to the same
+                     database (see :func:`shared_pool`)
         """
         self.dbname = dbname
         self.user = '' if user is None else " user=%s" % user
@@ -30,22 +190,85 @@ class DbConnection(object):
         self.host = '' if host is None else "host=%s " % host
         self.port = '' if port is None else "port=%d " % port
         self.conn = None
+        if isinstance(pool, dict):
+            pool = shared_pool(self.conninfo(), **pool)
+        self.pool = pool
+
+    def __getstate__(self):
+        """Return the attributes to be saved when pickling
+
+        Neither the connection nor the pool are saved.
+        """
+        state = self.__dict__.copy()
+        state['conn'] = None
+        state['pool'] = None
+        state.pop('stats', None)
+        return state
+
+    def conninfo(self):
+        """Return the libpq connection string
+
+        :return: string
+        """
+        return "%s%sdbname=%s%s%s" % (self.host, self.port, self.dbname,
+                                      self.user, self.pswd)
+
+    def params(self):
+        """Return the parameters needed to connect to the same database
+
+        :return: dictionary of the keyword arguments to create an
+                 equivalent DbConnection, without a pool
+
+        The parameters are plain values, e.g., to be passed to another
+        process.
+        """
+        info = conninfo_to_dict(self.conninfo())
+        return {'dbname': info['dbname'], 'user': info.get('user'),
+                'pswd': info.get('password'), 'host': info.get('host'),
+                'port': int(info['port']) if 'port' in info else None}
 
     def connect(self):
-        """Connect to the database"""
+        """Connect to the database
+
+        If there is a pool, a connection is taken from it instead.
+        """
         try:
-            self.conn = connect("%s%sdbname=%s%s%s" % (
-                self.host, self.port, self.dbname, self.user, self.pswd),
-                                row_factory=dict_row)
+            with phase("connect"):
+                if self.pool is not None:
+                    self.conn = self.pool.getconn()
+                    self.conn.row_factory = dict_row
+                else:
+                    self.conn = connect(self.conninfo(),
+                                        row_factory=dict_row)
         except Exception as exc:
             if str(exc)[:6] == 'FATAL:':
                 sys.exit("Database connection error: %s" % str(exc)[8:])
             else:
                 raise exc
+        if self.recorder is not None:
+            self.recorder.connected(self)
+
+    def clone(self):
+        """Return a new, not yet connected, connection to the same database
+
+        :return: DbConnection object
+
+        The new connection uses the same pool, if any.
+        """
+        dbconn = copy.copy(self)
+        dbconn.conn = None
+        return dbconn
 
     def close(self):
-        """Close the database connection"""
-        if self.conn and not self.conn.closed:
+        """Close the database connection
+
+        A pooled connection is returned to the pool instead.
+        """
+        if self.pool is not None and self.conn is not None:
+            if not self.conn.closed:
+                self.conn.rollback()
+            self.pool.putconn(self.conn)
+        elif self.conn and not self.conn.closed:
             self.conn.close()
         self.conn = None
 
@@ -64,16 +287,41 @@ class DbConnection(object):
         :param args: arguments to query
         :return: cursor
         """
+        (curs, elapsed) = self._execute(query, args)
+        if self.stats is not None:
+            self.stats.record(caller(self, query), max(curs.rowcount, 0),
+                              result_bytes(curs.pgresult), elapsed)
+        if self.recorder is not None:
+            self.recorder.record(query, args, None)
+        return curs
+
+    def _execute(self, query, args):
         if self.conn is None or self.conn.closed:
             self.connect()
         curs = self.conn.cursor()
+        start = time.perf_counter()
         try:
             curs.execute(query, args)
         except Exception as exc:
             self.conn.rollback()
             curs.close()
             raise exc
-        return curs
+        return (curs, time.perf_counter() - start)
+
+    def _fetch(self, query, args, fetch):
+        (curs, elapsed) = self._execute(query, args)
+        if self.stats is None:
+            result = fetch(curs)
+        else:
+            start = time.perf_counter()
+            result = fetch(curs)
+            self.stats.record(caller(self, query), max(curs.rowcount, 0),
+                              result_bytes(curs.pgresult), elapsed,
+                              time.perf_counter() - start)
+        if self.recorder is not None:
+            self.recorder.record(query, args, result)
+        curs.close()
+        return result
 
     def fetchone(self, query, args=None):
         """Execute a single row SELECT query and return row
@@ -84,10 +332,7 @@ class DbConnection(object):
 
         The cursor is closed.
         """
-        curs = self.execute(query, args)
-        row = curs.fetchone()
-        curs.close()
-        return row
+        return self._fetch(query, args, lambda curs: curs.fetchone())
 
     def fetchall(self, query, args=None):
         """Execute a SELECT query and return rows
@@ -98,39 +343,175 @@ class DbConnection(object):
 
         The cursor is closed.
         """
-        curs = self.execute(query, args)
-        rows = curs.fetchall()
-        curs.close()
-        return rows
+        return self._fetch(query, args, lambda curs: curs.fetchall())
 
     def sql_copy_to(self, sql, path):
         """Execute an SQL COPY command to a file
 
         :param sql: SQL copy command
         :param path: file name/path to copy into
+
+        The data is compressed if the file name has one of the
+        COMPRESSION_SUFFIXES.
         """
         if self.conn is None or self.conn.closed:
             self.connect()
         curs = self.conn.cursor()
         with curs.copy(sql) as copy:
-            with open(path, "wb") as f:
+            with open_data_file(path, "wb") as f:
                 for data in copy:
                     f.write(bytes(data))
 
-    def copy_from(self, path, table):
-        """Execute a COPY command from a file in CSV format
+    def copy_from(self, path, table, bufsize=None, use_mmap=False,
+                  binary=False):
+        """Execute a COPY command from a file in CSV or binary format
 
         :param path: file name/path to copy from
         :param table: possibly schema qualified table name
+        :param bufsize: size in bytes of the chunks sent to the server
+                        (default COPY_BUFSIZE)
+        :param use_mmap: memory-map the file instead of reading it
+        :param binary: the file is in PostgreSQL binary COPY format
+
+        The file is sent in chunks, so memory use is bounded by
+        `bufsize` regardless of the size of the file.  A compressed
+        file, as indicated by its suffix, is decompressed as it is
+        read, and is never memory-mapped.
         """
+        bufsize = bufsize or COPY_BUFSIZE
+        if file_compression(path) is not None:
+            use_mmap = False
         if self.conn is None or self.conn.closed:
             self.connect()
         curs = self.conn.cursor()
-        with open(path, 'r') as f:
-            try:
-                with curs.copy("COPY %s FROM STDIN WITH CSV" % table) as copy:
-                    while data := f.read():
+        sql = "COPY %s FROM STDIN WITH %s" % (
+            table, 'BINARY' if binary else 'CSV')
+        with open_data_file(path, 'rb') as f:
+            with curs.copy(sql, writer=FlushingWriter(curs)) as copy:
+                if use_mmap and os.fstat(f.fileno()).st_size > 0:
+                    # pages are released once sent, so align the chunks
+                    bufsize = -(-bufsize // mmap.PAGESIZE) * mmap.PAGESIZE
+                    with mmap.mmap(f.fileno(), 0,
+                                   access=mmap.ACCESS_READ) as buf:
+                        for pos in range(0, len(buf), bufsize):
+                            copy.write(buf[pos:pos + bufsize])
+                            if hasattr(mmap, 'MADV_DONTNEED'):
+                                buf.madvise(mmap.MADV_DONTNEED, pos,
+                                            min(bufsize, len(buf) - pos))
+                else:
+                    while data := f.read(bufsize):
                         copy.write(data)
-            except:
-                raise
         curs.close()
+
+
+class AsyncDbConnection(DbConnection):
+    """A database connection for use with asyncio, possibly disconnected
+
+    The connection information is as for DbConnection, but the methods
+    that perform I/O are coroutines, based on a psycopg AsyncConnection.
+    A pool, if given, must be a psycopg_pool AsyncConnectionPool,
+    already opened: the shared pools of :func:`shared_pool` are not
+    usable.
+    """
+
+    def __init__(self, dbname, user=None, pswd=None, host=None, port=None,
+                 pool=None):
+        """Initialize the connection information
+
+        :param dbname-port: see DbConnection.__init__ params
+        :param pool: a psycopg_pool AsyncConnectionPool
+        """
+        if isinstance(pool, dict) or (
+                ConnectionPool is not None and
+                isinstance(pool, ConnectionPool)):
+            raise ValueError("AsyncDbConnection needs an "
+                             "AsyncConnectionPool")
+        super(AsyncDbConnection, self).__init__(dbname, user, pswd, host,
+                                                port, pool)
+
+    async def connect(self):
+        """Connect to the database"""
+        if self.pool is not None:
+            self.conn = await self.pool.getconn()
+            self.conn.row_factory = dict_row
+        else:
+            self.conn = await AsyncConnection.connect(self.conninfo(),
+                                                      row_factory=dict_row)
+
+    async def close(self):
+        """Close the database connection
+
+        A pooled connection is returned to the pool instead.
+        """
+        if self.pool is not None and self.conn is not None:
+            if not self.conn.closed:
+                await self.conn.rollback()
+            await self.pool.putconn(self.conn)
+        elif self.conn and not self.conn.closed:
+            await self.conn.close()
+        self.conn = None
+
+    async def commit(self):
+        """Commit currently open transaction"""
+        await self.conn.commit()
+
+    async def rollback(self):
+        """Roll back currently open transaction"""
+        await self.conn.rollback()
+
+    async def execute(self, query, args=None):
+        """Create a cursor, execute a query and return the cursor
+
+        :param query: text of the statement to execute
+        :param args: arguments to query
+        :return: cursor
+        """
+        if self.conn is None or self.conn.closed:
+            await self.connect()
+        curs = self.conn.cursor()
+        try:
+            await curs.execute(query, args)
+        except Exception as exc:
+            await self.conn.rollback()
+            await curs.close()
+            raise exc
+        return curs
+
+    async def fetchone(self, query, args=None):
+        """Execute a single row SELECT query and return row
+
+        :param query: a SELECT query to be executed
+        :param args: arguments to query
+        :return: a psycopg DictRow
+        """
+        curs = await self.execute(query, args)
+        row = await curs.fetchone()
+        await curs.close()
+        return row
+
+    async def fetchall(self, query, args=None):
+        """Execute a SELECT query and return rows
+
+        :param query: a SELECT query to be executed
+        :param args: arguments to query
+        :return: a list of psycopg DictRow's
+        """
+        curs = await self.execute(query, args)
+        rows = await curs.fetchall()
+        await curs.close()
+        return rows
+
+    async def sql_copy_to(self, sql, path):
+        """Execute an SQL COPY command to a file
+
+        :param sql: SQL copy command
+        :param path: file name/path to copy into
+        """
+        if self.conn is None or self.conn.closed:
+            await self.connect()
+        curs = self.conn.cursor()
+        async with curs.copy(sql) as copy:
+            with open_data_file(path, "wb") as f:
+                async for data in copy:
+                    f.write(bytes(data))
+        await curs.close()
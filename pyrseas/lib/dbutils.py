@@ -32,7 +32,7 @@ def pgexecute(dbconn, oper, args=None):
 
 
 ADMIN_DB = os.environ.get("PG_ADMIN_DB", 'postgres')
-CREATE_DDL = "CREATE DATABASE %s TEMPLATE = template0"
+CREATE_DDL = "CREATE DATABASE %s TEMPLATE = %s"
 
 
 class PostgresDb(object):
@@ -67,7 +67,7 @@ class PostgresDb(object):
                 curs.close()
                 conn2 = pgconnect(ADMIN_DB, self.user, self.host, self.port,
                                   autocommit=True)
-                curs = pgexecute(conn2, CREATE_DDL % self.name)
+                curs = pgexecute(conn2, CREATE_DDL % (self.name, 'template0'))
                 curs.close()
             conn.close()
             self.conn = pgconnect(self.name, self.user, self.host, self.port)
@@ -85,12 +85,15 @@ class PostgresDb(object):
     def version(self):
         return self._version
 
-    def create(self):
-        "Drop the database if it exists and re-create it"
+    def create(self, template='template0'):
+        """Drop the database if it exists and re-create it
+
+        :param template: name of the database to copy
+        """
         conn = pgconnect(ADMIN_DB, self.user, self.host, self.port,
                          autocommit=True)
         curs = pgexecute(conn, "DROP DATABASE IF EXISTS %s" % self.name)
-        curs = pgexecute(conn, CREATE_DDL % self.name)
+        curs = pgexecute(conn, CREATE_DDL % (self.name, template))
         curs.close()
         conn.close()
 
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+    lib.qstats
+    ~~~~~~~~~~
+
+    A `QueryStats` object collects timing and size statistics of the
+    queries executed through a `DbConnection`, grouped by the code
+    that issued them, e.g., the catalog query of a `DbObjectDict`.
+"""
+import hashlib
+import json
+import sys
+import threading
+
+COLUMNS = ['calls', 'rows', 'bytes', 'server_time', 'decode_time']
+"""Statistics kept for each query issuer"""
+
+
+def result_bytes(pgresult):
+    """Return the size of the data in a query result
+
+    :param pgresult: a psycopg PGresult, or None
+    :return: total length in bytes of the (text or binary) values
+
+    The lengths are taken from libpq, without copying the values, if
+    the PGresult implementation provides `get_length`.
+    """
+    if pgresult is None or not pgresult.nfields:
+        return 0
+    get_length = getattr(pgresult, 'get_length', None)
+    if get_length is None:
+        get_value = pgresult.get_value
+
+        def get_length(row, col):
+            return len(get_value(row, col) or b'')
+    cols = range(pgresult.nfields)
+    return sum(get_length(row, col) for row in range(pgresult.ntuples)
+               for col in cols)
+
+
+def fingerprint(query):
+    """Return a short fingerprint of the text of a query
+
+    :param query: text of the query
+    :return: string of 8 hexadecimal digits
+    """
+    return hashlib.sha1(str(query).encode('utf-8')).hexdigest()[:8]
+
+
+def caller(dbconn, query=None):
+    """Return a name identifying the code that issued a query
+
+    :param dbconn: the DbConnection executing the query
+    :param query: text of the query
+    :return: string, e.g., 'ColumnDict.fetchall(Column)'
+
+    The methods of the connection itself, e.g., its fetchall method,
+    are skipped.  Since a `DbObjectDict` may fetch several classes of
+    objects, e.g., the constraints, the class passed to its fetchall
+    method is added to the name.  For other code, which may issue
+    several queries, a fingerprint of the query is added instead,
+    e.g., 'Database._build_dependency_graph[1f0c9e2a]'.
+    """
+    frame = sys._getframe(1)
+    while frame.f_back is not None and frame.f_locals.get('self') is dbconn:
+        frame = frame.f_back
+    obj = frame.f_locals.get('self')
+    if obj is None:
+        name = "%s.%s" % (frame.f_globals.get('__name__'),
+                          frame.f_code.co_name)
+    else:
+        name = "%s.%s" % (obj.__class__.__name__, frame.f_code.co_name)
+    cls = frame.f_locals.get('cls')
+    if frame.f_code.co_name == 'fetchall' and isinstance(cls, type):
+        return "%s(%s)" % (name, cls.__name__)
+    if query is not None:
+        return "%s[%s]" % (name, fingerprint(query))
+    return name
+
+
+class QueryStats(object):
+    """Statistics of the queries executed by one or more connections
+
+    Server time is that elapsed until the complete result has been
+    received, so it includes network transfer.  Decode time is that
+    spent converting the result rows to Python objects.
+    """
+
+    def __init__(self):
+        self.queries = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, rows=0, nbytes=0, server_time=0.0,
+               decode_time=0.0):
+        """Add the statistics of a query execution
+
+        :param name: identity of the query issuer
+        :param rows: number of rows returned
+        :param nbytes: size of the result
+        :param server_time: seconds until the result was received
+        :param decode_time: seconds spent fetching the rows
+        """
+        with self._lock:
+            if name not in self.queries:
+                self.queries[name] = dict.fromkeys(COLUMNS, 0)
+            entry = self.queries[name]
+            entry['calls'] += 1
+            entry['rows'] += rows
+            entry['bytes'] += nbytes
+            entry['server_time'] += server_time
+            entry['decode_time'] += decode_time
+
+    def ranked(self):
+        """Return the statistics, most time consuming first
+
+        :return: list of dictionaries, including the issuer `name`
+        """
+        with self._lock:
+            entries = [dict(name=name, **entry)
+                       for (name, entry) in self.queries.items()]
+        return sorted(entries, key=lambda e: (
+            -(e['server_time'] + e['decode_time']), e['name']))
+
+    def to_json(self):
+        """Return the ranked statistics as a JSON string
+
+        :return: JSON text
+        """
+        return json.dumps(self.ranked(), indent=2)
+
+    def report(self):
+        """Return the ranked statistics formatted as a table
+
+        :return: text, with one line per query issuer
+        """
+        entries = self.ranked()
+        width = max([len(e['name']) for e in entries] + [len('query')])
+        lines = ["%-*s %7s %9s %12s %10s %10s" % (
+            width, 'query', 'calls', 'rows', 'bytes', 'server ms',
+            'decode ms')]
+        total = dict((col, sum(e[col] for e in entries)) for col in COLUMNS)
+        for entry in entries + [dict(name='total', **total)]:
+            lines.append("%-*s %7d %9d %12d %10.1f %10.1f" % (
+                width, entry['name'], entry['calls'], entry['rows'],
+                entry['bytes'], entry['server_time'] * 1000,
+                entry['decode_time'] * 1000))
+        return '\n'.join(lines)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+    lib.replay
+    ~~~~~~~~~~
+
+    A `QueryRecorder` saves the queries executed through DbConnection
+    objects, together with their result rows, to a JSON fixture
+    file.  The file can later be loaded by a `ReplayDbConnection` (see
+    pyrseas.database) to serve the same results without a server.
+"""
+import copy
+import threading
+
+from pyrseas.lib import binfile
+from pyrseas.lib.dbconn import DbConnection
+
+KIND = 'queries'
+"""Kind of file holding recorded queries"""
+
+
+def query_key(query, args=None):
+    """Return the key identifying a query and its arguments
+
+    :param query: text of the query
+    :param args: arguments to query
+    :return: tuple
+    """
+    return (query, repr(args))
+
+
+class QueryRecorder(object):
+    """A recorder of the queries and results of database connections"""
+
+    def __init__(self):
+        self.dbname = None
+        self.version = None
+        self.queries = []
+        self._lock = threading.Lock()
+
+    def connected(self, dbconn):
+        """Note the database and server version of a new connection
+
+        :param dbconn: the connected DbConnection
+        """
+        self.dbname = dbconn.dbname
+        self.version = dbconn.conn.info.server_version
+
+    def record(self, query, args, rows):
+        """Add a query and its result
+
+        :param query: text of the query
+        :param args: arguments to query
+        :param rows: the result row or list of rows, or None if the
+                     results were not fetched
+        """
+        with self._lock:
+            self.queries.append((query_key(query, args),
+                                 copy.deepcopy(rows)))
+
+    def merge(self, other):
+        """Add the queries recorded by another recorder
+
+        :param other: a QueryRecorder
+        """
+        with self._lock:
+            if self.dbname is None:
+                (self.dbname, self.version) = (other.dbname, other.version)
+            self.queries.extend(other.queries)
+
+    def save(self, path):
+        """Save the recorded queries to a JSON fixture file
+
+        :param path: file name/path to write
+
+        The rows are saved as data only, so the file can be loaded
+        without being trusted.
+        """
+        with self._lock:
+            binfile.save_data(path, KIND, {'dbname': self.dbname,
+                                           'version': self.version,
+                                           'queries': list(self.queries)})
+
+
+def record_to():
+    """Record the queries of all DbConnection objects
+
+    :return: the QueryRecorder, whose :meth:`QueryRecorder.save`
+             should be called once done
+    """
+    DbConnection.recorder = QueryRecorder()
+    return DbConnection.recorder
+
+
+def load(path):
+    """Load queries saved by :meth:`QueryRecorder.save`
+
+    :param path: file name/path to read
+    :return: dictionary with keys 'dbname', 'version' and 'queries',
+             the latter a list of lists [key, rows]
+    """
+    return binfile.load_data(path, KIND)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+    lib.trace
+    ~~~~~~~~~
+
+    Functions to record the wall clock time, CPU time and peak memory
+    of the phases of a run, e.g., fetching the catalogs or generating
+    statements, and to save them as a Chrome trace event file, which
+    can be viewed with Perfetto or chrome://tracing.
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+
+_events = None
+_origin = None
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def start():
+    """Start recording phases
+
+    Memory allocations are traced from this point on, which slows
+    down execution.  The events are kept until :func:`stop` is
+    called, so :func:`save` should be called before.
+    """
+    global _events, _origin
+    _events = []
+    _origin = time.perf_counter()
+    tracemalloc.start()
+
+
+def stop():
+    """Stop recording phases and discard the recorded events"""
+    global _events
+    if _events is not None:
+        tracemalloc.stop()
+    _events = None
+
+
+def events():
+    """Return the events recorded so far
+
+    :return: list of Chrome trace event dictionaries
+    """
+    with _lock:
+        return list(_events or [])
+
+
+@contextmanager
+def phase(name, **args):
+    """Record a phase of the run, if recording has been started
+
+    :param name: name of the phase
+    :param args: additional information to show with the phase
+
+    Phases can be nested.  The peak memory of a phase includes that
+    of the phases nested in it.  Since memory allocations are traced
+    for the whole process, the peak memory is only recorded for the
+    phases of the main thread, and it includes the allocations made
+    meanwhile by other threads, e.g., those copying data concurrently.
+    """
+    if _events is None:
+        yield
+        return
+    peaks = threading.current_thread() is threading.main_thread()
+    if peaks:
+        stack = _local.__dict__.setdefault('stack', [])
+        if stack:
+            stack[-1]['peak'] = max(stack[-1]['peak'],
+                                    tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        entry = {'peak': 0}
+        stack.append(entry)
+    wall = time.perf_counter()
+    cpu = time.thread_time()
+    try:
+        yield
+    finally:
+        cpu = time.thread_time() - cpu
+        end = time.perf_counter()
+        args.update(cpu_ms=round(cpu * 1000, 3))
+        if peaks:
+            peak = max(entry['peak'], tracemalloc.get_traced_memory()[1])
+            stack.pop()
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            args.update(peak_kb=peak // 1024)
+        event = {'name': name, 'cat': 'pyrseas', 'ph': 'X',
+                 'ts': round((wall - _origin) * 1e6, 1),
+                 'dur': round((end - wall) * 1e6, 1),
+                 'pid': os.getpid(), 'tid': threading.get_ident(),
+                 'args': args}
+        with _lock:
+            if _events is not None:
+                _events.append(event)
+
+
+def traced(func):
+    """Decorator to record each call of a function as a phase
+
+    :param func: function whose name is used as that of the phase
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with phase(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def save(path):
+    """Save the recorded phases as a Chrome trace event file
+
+    :param path: file name/path
+    """
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events(), 'displayTimeUnit': 'ms'}, f)
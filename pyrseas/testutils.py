@@ -9,12 +9,12 @@ import glob
 import subprocess
 from unittest import TestCase
 
-import yaml
-
+from pyrseas import dbtoyaml, yamltodb
 from pyrseas.config import Config
 from pyrseas.database import Database
 from pyrseas.augmentdb import AugmentDatabase
-from pyrseas.lib.dbutils import pgexecute, PostgresDb
+from pyrseas.yamlutil import yamlload
+from pyrseas.lib.dbutils import ADMIN_DB, pgconnect, pgexecute, PostgresDb
 
 
 def fix_indent(stmt):
@@ -40,13 +40,24 @@ def remove_temp_files(tmpdir, prefix=''):
             os.remove(tfile)
 
 
-TEST_DBNAME = os.environ.get("PYRSEAS_TEST_DB", 'pyrseas_testdb')
+WORKER = os.environ.get("PYTEST_XDIST_WORKER")
+
+
+def _worker_name(name):
+    "Return a name made distinct for each pytest-xdist worker process"
+    return name if WORKER is None else "%s_%s" % (name, WORKER)
+
+
+TEST_DBNAME = _worker_name(os.environ.get("PYRSEAS_TEST_DB",
+                                          'pyrseas_testdb'))
 TEST_USER = os.environ.get("PYRSEAS_TEST_USER", getpass.getuser())
 TEST_HOST = os.environ.get("PYRSEAS_TEST_HOST", None)
 TEST_PORT = int(os.environ.get("PYRSEAS_TEST_PORT", 5432))
+TEMPLATE_DBNAME = os.environ.get("PYRSEAS_TEST_TEMPLATE",
+                                 'pyrseas_test_template')
 PG_OWNER = 'postgres'
-TEST_DIR = os.path.join(tempfile.gettempdir(),
-                        os.environ.get("PYRSEAS_TEST_DIR", 'pyrseas_test'))
+TEST_DIR = os.path.join(tempfile.gettempdir(), _worker_name(
+    os.environ.get("PYRSEAS_TEST_DIR", 'pyrseas_test')))
 TRAVIS = (os.environ.get("TRAVIS", 'false') == 'true')
 
 
@@ -140,8 +151,46 @@ class PgTestDb(PostgresDb):
         return row and True
 
 
+def create_template_db(replace=False):
+    """Create the clean database from which test databases are copied
+
+    :param replace: re-create the template if it already exists
+
+    The template only has the default schema, so that clearing a copy
+    of it before each test is quick.
+    """
+    conn = pgconnect(ADMIN_DB, TEST_USER, TEST_HOST, TEST_PORT)
+    curs = pgexecute(conn, "SELECT 1 FROM pg_database WHERE datname = %s",
+                     (TEMPLATE_DBNAME, ))
+    exists = curs.fetchone() is not None
+    curs.close()
+    conn.close()
+    if exists and not replace:
+        return
+    tpl = PgTestDb(TEMPLATE_DBNAME, TEST_USER, TEST_HOST, TEST_PORT)
+    tpl.create()
+    tpl.connect()
+    tpl.clear()
+    tpl.close()
+
+
+_copied_dbs = set()
+
+
 def _connect_clear(dbname):
+    """Connect to a test database and clear it
+
+    :param dbname: name of the test database
+    :return: the PgTestDb
+
+    The first time in a process, the database is re-created as a copy
+    of the template, so that each pytest-xdist worker has its own.
+    """
     db = PgTestDb(dbname, TEST_USER, TEST_HOST, TEST_PORT)
+    if dbname not in _copied_dbs:
+        create_template_db()
+        db.create(TEMPLATE_DBNAME)
+        _copied_dbs.add(dbname)
     db.connect()
     db.clear()
     return db
@@ -221,7 +270,7 @@ class DatabaseToMapTestCase(PyrseasTestCase):
         with open(os.path.join(self.cfg['files']['metadata_path'],
                                subdir or '', filename), 'r') as f:
             inmap = f.read()
-        return yaml.safe_load(inmap)
+        return yamlload(inmap)
 
     def remove_tempfiles(self):
         remove_temp_files(TEST_DIR)
@@ -283,7 +332,8 @@ class InputMapToSqlTestCase(PyrseasTestCase):
         return base
 
 
-TEST_DBNAME_SRC = os.environ.get("PYRSEAS_TEST_DB_SRC", 'pyrseas_testdb_src')
+TEST_DBNAME_SRC = _worker_name(os.environ.get("PYRSEAS_TEST_DB_SRC",
+                                              'pyrseas_testdb_src'))
 
 
 class DbMigrateTestCase(TestCase):
@@ -292,9 +342,6 @@ class DbMigrateTestCase(TestCase):
     def setUpClass(cls):
         cls.srcdb = _connect_clear(TEST_DBNAME_SRC)
         cls.db = _connect_clear(TEST_DBNAME)
-        progdir = os.path.abspath(os.path.dirname(__file__))
-        cls.dbtoyaml = os.path.join(progdir, 'dbtoyaml.py')
-        cls.yamltodb = os.path.join(progdir, 'yamltodb.py')
         cls.tmpdir = TEST_DIR
         if not os.path.exists(cls.tmpdir):
             os.mkdir(cls.tmpdir)
@@ -364,34 +411,34 @@ class DbMigrateTestCase(TestCase):
         args.extend(['-f', dumpfile, dbname])
         subprocess.check_call(args)
 
-    def invoke(self, args):
-        args.insert(0, sys.executable)
-        path = [os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))]
-        path.append(os.path.abspath(os.path.join(os.path.dirname(
-                    yaml.__file__), '..')))
-        env = os.environ.copy()
-        env.update({'PYTHONPATH': os.pathsep.join(path)})
-        subprocess.check_call(args, env=env)
+    def invoke(self, main, args):
+        """Run a utility in-process
+
+        :param main: main function of the utility
+        :param args: list of command line arguments
+        """
+        status = main(argv=args)
+        if status:
+            raise AssertionError("%s %s exited with status %d" % (
+                main.__module__, ' '.join(args), status))
 
     def create_yaml(self, yamlfile='', srcdb=False):
         dbname = self.srcdb.name if srcdb else self.db.name
-        args = [self.dbtoyaml]
-        args.extend(self._db_params())
+        args = self._db_params()
         if yamlfile:
             args.extend(['-o', yamlfile, dbname])
         else:
             args.extend(['-r', TEST_DIR, '-m', dbname])
-        self.invoke(args)
+        self.invoke(dbtoyaml.main, args)
 
     def migrate_target(self, yamlfile, outfile):
-        args = [self.yamltodb]
-        args.extend(self._db_params())
+        args = self._db_params()
         if yamlfile:
             args.extend(['-u', '-o', outfile, self.db.name, yamlfile])
         else:
             args.extend(['-u', '-o', outfile, '-r', TEST_DIR, '-m',
                          self.db.name])
-        self.invoke(args)
+        self.invoke(yamltodb.main, args)
 
 
 class AugmentToMapTestCase(PyrseasTestCase):
@@ -10,12 +10,23 @@ from argparse import FileType
 import yaml
 
 from pyrseas import __version__
-from pyrseas.database import Database
-from pyrseas.cmdargs import cmd_parser, parse_args
+from pyrseas.cmdargs import cmd_parser, parse_args, finish_run
+from pyrseas.lib.trace import phase
+from pyrseas.yamlutil import yamlload
 
 
-def main():
-    """Convert YAML specifications to database DDL."""
+def main(argv=None, stdout=None, stderr=None):
+    """Convert YAML specifications to database DDL.
+
+    :param argv: list of arguments (default sys.argv[1:])
+    :param stdout: stream for the output (default sys.stdout), unless
+                   the --output option is given
+    :param stderr: stream for messages (default sys.stderr)
+    :return: exit status
+
+    This can be called in-process, e.g., by test harnesses.  Errors
+    in the arguments raise SystemExit.
+    """
     parser = cmd_parser("Generate SQL statements to update a PostgreSQL "
                         "database to match the schema specified in a "
                         "YAML-formatted file(s)", __version__)
@@ -27,54 +38,111 @@ def main():
                         dest='onetrans', help="wrap commands in BEGIN/COMMIT")
     parser.add_argument('-u', '--update', action='store_true',
                         help="apply changes to database (implies -1)")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="number of tables to load concurrently "
+                        "with --update (default %(default)s)")
     parser.add_argument('--revert', action='store_true',
                         help="generate SQL to revert changes (experimental)")
+    parser.add_argument('--check', action='store_true',
+                        help="only check whether the database matches the "
+                        "specification, exiting with status 1 if not")
     parser.add_argument('-n', '--schema', metavar='SCHEMA', dest='schemas',
                         action='append', default=[],
                         help="process only named schema(s) (default all)")
-    cfg = parse_args(parser)
-    output = cfg['files']['output']
-    options = cfg['options']
-    db = Database(cfg)
-    if options.multiple_files:
-        inmap = db.map_from_dir()
-    else:
-        try:
-            inmap = yaml.safe_load(options.spec)
-        except Exception as exc:
-            print("Unable to process the input YAML file")
-            print("Error is '%s'" % exc)
-            return 1
-
-    stmts = db.diff_map(inmap)
-    if stmts:
-        fd = output or sys.stdout
-        if options.onetrans or options.update:
-            print("BEGIN;", file=fd)
-        for stmt in stmts:
-            if isinstance(stmt, tuple):
-                outstmt = "".join(stmt) + '\n'
-            else:
-                outstmt = "%s;\n" % stmt
-            print(outstmt, file=fd)
-        if options.onetrans or options.update:
-            print("COMMIT;", file=fd)
-        if options.update:
+    parser.add_argument('--cache', action='store_true',
+                        help="use the cache of compiled specifications")
+    parser.add_argument('--fingerprints', metavar='FILE',
+                        help="only compare schemas whose fingerprints "
+                        "differ from those saved by dbtoyaml")
+    parser.add_argument('--against-snapshot', metavar='FILE',
+                        dest='snapshot',
+                        help="compare to a catalog snapshot saved by "
+                        "dbtoyaml instead of the live database")
+    cfg = parse_args(parser, argv)
+    try:
+        stdout = stdout or sys.stdout
+        stderr = stderr or sys.stderr
+        output = cfg['files']['output']
+        options = cfg['options']
+        if options.check and (options.update or options.revert):
+            parser.error("Cannot specify --check with --update or --revert")
+        if options.jobs < 1:
+            parser.error("Number of jobs must be at least 1")
+        if options.snapshot and options.update:
+            parser.error("Cannot specify both --against-snapshot and --update")
+        if options.snapshot and options.fingerprints:
+            parser.error("Cannot specify both --against-snapshot and "
+                         "--fingerprints")
+        # not imported at the top, so that --help need not load it
+        from pyrseas.database import Database
+        from pyrseas.dbobject.table import copy_command
+        db = Database(cfg)
+        if options.fingerprints:
+            try:
+                with open(options.fingerprints) as f:
+                    fingerprints = yamlload(f)
+            except (OSError, yaml.YAMLError) as exc:
+                sys.exit("Unable to read the fingerprints file: %s" % exc)
+            schemas = db.drifted_schemas(fingerprints or {})
+            if schemas is not None:
+                if options.schemas:
+                    schemas = [sch for sch in schemas
+                               if sch in options.schemas]
+                if not schemas:
+                    return
+                options.schemas = schemas
+        if options.snapshot:
             try:
+                db.load_snapshot(options.snapshot)
+            except (OSError, ValueError) as exc:
+                sys.exit("Unable to load the catalog snapshot: %s" % exc)
+        spec = None
+        if not options.multiple_files:
+            spec = options.spec.read()
+        if options.cache and db.load_spec_cache(spec):
+            inmap = None
+        elif options.multiple_files:
+            inmap = db.map_from_dir()
+        else:
+            try:
+                with phase("load spec"):
+                    inmap = yamlload(spec)
+            except Exception as exc:
+                print("Unable to process the input YAML file", file=stdout)
+                print("Error is '%s'" % exc, file=stdout)
+                return 1
+
+        if options.check:
+            diff = db.check_map(inmap)
+            if diff is not None:
+                print("Database does not match the specification: %s" % diff,
+                      file=output or stdout)
+            if output:
+                output.close()
+            return 0 if diff is None else 1
+
+        stmts = db.diff_map(inmap)
+        if stmts:
+            fd = output or stdout
+            with phase("write output"):
+                if options.onetrans or options.update:
+                    print("BEGIN;", file=fd)
                 for stmt in stmts:
                     if isinstance(stmt, tuple):
-                        # expected format: (\copy, table, from, path, csv)
-                        db.dbconn.copy_from(stmt[3], stmt[1])
+                        outstmt = copy_command(stmt) + '\n'
                     else:
-                        db.dbconn.execute(stmt)
-            except:
-                db.dbconn.rollback()
-                raise
-            else:
-                db.dbconn.commit()
-                print("Changes applied", file=sys.stderr)
-        if output:
-            output.close()
+                        outstmt = "%s;\n" % stmt
+                    print(outstmt, file=fd)
+                if options.onetrans or options.update:
+                    print("COMMIT;", file=fd)
+            if options.update:
+                db.apply_stmts(stmts, options.jobs)
+                print("Changes applied", file=stderr)
+            if output:
+                output.close()
+    finally:
+        finish_run(cfg)
+
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
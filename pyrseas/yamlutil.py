@@ -1,7 +1,13 @@
 # -*- coding: utf-8 -*-
 """Pyrseas YAML utilities"""
 
-from yaml import add_representer, dump
+from yaml import add_representer, dump, load
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+from pyrseas.lib.trace import phase
 
 class MultiLineStr(str):
     """ Marker for multiline strings"""
@@ -18,4 +24,14 @@ def yamldump(objmap):
     :param objmap: dictionary
     :return: dumped object map
     """
-    return dump(objmap, default_flow_style=False, allow_unicode=True)
+    with phase("YAML dump"):
+        return dump(objmap, default_flow_style=False, allow_unicode=True)
+
+
+def yamlload(stream):
+    """Load a YAML document safely, with the LibYAML parser if available
+
+    :param stream: string or open file
+    :return: loaded object map
+    """
+    return load(stream, Loader=SafeLoader)
@@ -37,6 +37,10 @@ setup(
     install_requires=[
         'psycopg >= 3.1',
         'PyYAML >= 5.3'],
+    extras_require={
+        'pool': ['psycopg_pool >= 3.2'],
+        'zstd': ['zstandard'],
+        'lz4': ['lz4']},
 
     tests_require=['pytest'],
     cmdclass={'test': PyTest},
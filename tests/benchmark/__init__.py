@@ -0,0 +1 @@
+"""Pyrseas scaling benchmarks"""
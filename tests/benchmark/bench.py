@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""Measure how the main Pyrseas operations scale with catalog size
+
+Run as, e.g.::
+
+  python -m tests.benchmark.bench 1x10x5 2x40x5 4x80x5
+
+For each size, a synthetic catalog (see tests.benchmark.catalog) is
+created in the test database (which is cleared first), and the time
+(and optionally the peak memory) of each phase is measured.  With
+--record, the catalog queries of each size are saved, so that they
+can later be replayed with --replay, without a server.
+"""
+import json
+import math
+import os
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser, Namespace
+
+import yaml
+
+from pyrseas.config import Config
+from pyrseas.database import Database, ReplayDbConnection
+from pyrseas.lib.dbconn import DbConnection
+from pyrseas.lib.replay import QueryRecorder
+from pyrseas.testutils import PgTestDb, TEST_DBNAME, TEST_HOST, TEST_PORT
+from pyrseas.testutils import TEST_USER
+from pyrseas.yamlutil import yamldump
+from tests.benchmark.catalog import catalog_stmts, parse_size
+
+PHASES = ['from_catalog', 'to_map', 'yaml_dump', 'yaml_load', 'from_map',
+          'dep_sorted', 'diff_map']
+
+
+def bench_config(dbname, user=None, host=None, port=None):
+    """Return a configuration to process a database
+
+    :param dbname: database name
+    :param user: user name
+    :param host: host name
+    :param port: host port number
+    :return: Config object
+    """
+    cfg = Config(sys_only=True)
+    cfg['database'] = {'dbname': dbname, 'username': user,
+                       'password': None, 'host': host, 'port': port}
+    cfg['options'] = Namespace(schemas=[], excl_schemas=[], tables=[],
+                               excl_tables=[], no_owner=False,
+                               no_privs=False, multiple_files=False,
+                               revert=False)
+    return cfg
+
+
+def create_catalog(size):
+    """Create a synthetic catalog in the (cleared) test database
+
+    :param size: tuple (schemas, tables, columns)
+    :return: the PgTestDb
+    """
+    db = PgTestDb(TEST_DBNAME, TEST_USER, TEST_HOST, TEST_PORT)
+    db.connect()
+    db.clear()
+    for stmt in catalog_stmts(*size):
+        db.execute(stmt)
+    db.conn.commit()
+    return db
+
+
+class Timer(object):
+    """Measure the phases of a benchmark run"""
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.results = {}
+
+    def run(self, phase, func, *args):
+        """Run and measure a phase
+
+        :param phase: name of the phase
+        :param func: function to call
+        :param args: arguments to `func`
+        :return: result of `func`
+        """
+        if self.memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        result = func(*args)
+        self.results[phase] = {'time': time.perf_counter() - start}
+        if self.memory:
+            self.results[phase]['peak_kb'] = \
+                tracemalloc.get_traced_memory()[1] // 1024
+        return result
+
+
+def run_phases(cfg, dbconn=None, memory=False):
+    """Run and measure the phases on the catalog of a database
+
+    :param cfg: configuration
+    :param dbconn: connection to use, e.g., a ReplayDbConnection
+    :param memory: also measure the peak memory of each phase
+    :return: dictionary of phase results
+    """
+    timer = Timer(memory)
+    db = Database(cfg, dbconn)
+    timer.run('from_catalog', db.from_catalog, True)
+    dbmap = timer.run('to_map', db.to_map, False)
+    text = timer.run('yaml_dump', yamldump, dbmap)
+    inmap = timer.run('yaml_load', yaml.safe_load, text)
+    ndb = Database(cfg, dbconn)
+    ndb.db = db.db
+    timer.run('from_map', ndb.from_map, inmap)
+    objs = [obj for _, d in ndb.ndb.all_dicts() for obj in d.values()]
+    timer.run('dep_sorted', ndb.dep_sorted, objs, ndb.ndb)
+    stmts = timer.run('diff_map', Database(cfg, dbconn).diff_map,
+                      yaml.safe_load(text), False)
+    if stmts:
+        raise AssertionError("Catalog differs from its own map: %s" %
+                             stmts[0])
+    return timer.results
+
+
+def query_file(directory, size):
+    return os.path.join(directory, "queries-%dx%dx%d.json" % size)
+
+
+def run_size(size, args):
+    """Run the benchmark on a catalog of a given size
+
+    :param size: tuple (schemas, tables, columns)
+    :param args: command line arguments
+    :return: dictionary of phase results
+    """
+    if args.replay:
+        dbconn = ReplayDbConnection(query_file(args.replay, size))
+        cfg = bench_config(dbconn.dbname)
+        return run_phases(cfg, dbconn, args.memory)
+    db = create_catalog(size)
+    cfg = bench_config(db.name, db.user, db.host, db.port)
+    if args.record:
+        DbConnection.recorder = QueryRecorder()
+    try:
+        results = run_phases(cfg, memory=args.memory)
+        if args.record:
+            DbConnection.recorder.save(query_file(args.record, size))
+    finally:
+        DbConnection.recorder = None
+        db.clear()
+        db.close()
+    return results
+
+
+def scaling(sizes, results, phase):
+    """Return the exponents of the growth of a phase's time
+
+    :param sizes: list of sizes, by increasing number of tables
+    :param results: corresponding list of results
+    :param phase: name of the phase
+    :return: list of exponents, e.g., 1.0 for linear growth between
+             each size and the previous one
+    """
+    exps = []
+    for i in range(1, len(sizes)):
+        ratio = (sizes[i][0] * sizes[i][1]) / (sizes[i - 1][0] *
+                                               sizes[i - 1][1])
+        if ratio > 1:
+            exps.append(math.log(results[i][phase]['time'] /
+                                 results[i - 1][phase]['time']) /
+                        math.log(ratio))
+    return exps
+
+
+def report(sizes, results, memory=False):
+    """Return the benchmark results formatted as a table
+
+    :param sizes: list of sizes
+    :param results: corresponding list of results
+    :param memory: include the peak memory
+    :return: text
+    """
+    lines = ["%-14s" % 'phase' + "".join(
+        "%14s" % ("%dx%dx%d" % size) for size in sizes) + "  scaling"]
+    for phase in PHASES:
+        exps = scaling(sizes, results, phase)
+        lines.append("%-14s" % phase + "".join(
+            "%12.1fms" % (res[phase]['time'] * 1000) for res in results) +
+            "  " + " ".join("%.2f" % exp for exp in exps))
+        if memory:
+            lines.append("%-14s" % '  peak' + "".join(
+                "%12dkB" % res[phase]['peak_kb'] for res in results))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Measure the scaling of Pyrseas "
+                            "operations on synthetic catalogs")
+    parser.add_argument('sizes', nargs='+', metavar='SIZE',
+                        help="catalog size, as SCHEMASxTABLESxCOLUMNS")
+    parser.add_argument('--memory', action='store_true',
+                        help="also measure peak memory (slower)")
+    parser.add_argument('--json', metavar='FILE',
+                        help="save the results to a JSON file")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--record', metavar='DIR',
+                       help="save the catalog queries of each size")
+    group.add_argument('--replay', metavar='DIR',
+                       help="use saved catalog queries instead of a server")
+    args = parser.parse_args(argv)
+    try:
+        sizes = sorted([parse_size(size) for size in args.sizes],
+                       key=lambda s: (s[0] * s[1], s))
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    if args.memory:
+        tracemalloc.start()
+    try:
+        results = [run_size(size, args) for size in sizes]
+    finally:
+        if args.memory:
+            tracemalloc.stop()
+    print(report(sizes, results, args.memory))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump([{'size': "%dx%dx%d" % size, 'phases': res}
+                       for (size, res) in zip(sizes, results)], f, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Generator of synthetic catalogs of parametric size
+
+A catalog of size (N, M, K) has N schemas, each with M tables of K
+columns.  Each table has a serial primary key, a foreign key to the
+previous table of its schema, an index and a view, and is queried
+by a function.  Each schema also has a standalone sequence and a
+table partitioned by range.
+"""
+
+COLUMN_TYPES = ['text', 'integer', 'numeric(12,2)', 'date', 'boolean',
+                'character varying(32)']
+PARTITIONS = 4
+
+
+def parse_size(size):
+    """Parse a catalog size specification
+
+    :param size: string of the form NxMxK, e.g., '4x50x8'
+    :return: tuple of integers (schemas, tables, columns)
+    """
+    try:
+        (nschemas, ntables, ncols) = [int(n) for n in size.split('x')]
+    except ValueError:
+        raise ValueError("Invalid catalog size '%s', expected "
+                         "SCHEMASxTABLESxCOLUMNS" % size)
+    if nschemas < 1 or ntables < 1 or ncols < 3:
+        raise ValueError("Catalog size '%s' too small" % size)
+    return (nschemas, ntables, ncols)
+
+
+def table_stmts(sch, tbl, ncols):
+    """Return the statements to create a table and its related objects
+
+    :param sch: schema name
+    :param tbl: table number, starting at 1
+    :param ncols: number of columns
+    :return: list of SQL statements
+    """
+    name = "%s.t%d" % (sch, tbl)
+    cols = ["c1 serial PRIMARY KEY", "c2 integer NOT NULL"]
+    for col in range(3, ncols + 1):
+        cols.append("c%d %s" % (col, COLUMN_TYPES[col % len(COLUMN_TYPES)]))
+    stmts = ["CREATE TABLE %s (%s)" % (name, ", ".join(cols))]
+    if tbl > 1:
+        stmts.append("ALTER TABLE %s ADD CONSTRAINT t%d_c2_fkey FOREIGN KEY "
+                     "(c2) REFERENCES %s.t%d (c1)" % (name, tbl, sch,
+                                                      tbl - 1))
+    stmts.extend([
+        "CREATE INDEX t%d_c3_idx ON %s (c3)" % (tbl, name),
+        "CREATE VIEW %s.v%d AS SELECT c1, c2, c3 FROM %s WHERE c2 > 0" % (
+            sch, tbl, name),
+        "CREATE FUNCTION %s.f%d(integer) RETURNS bigint LANGUAGE sql "
+        "STABLE AS 'SELECT count(*) FROM %s WHERE c2 = $1'" % (
+            sch, tbl, name),
+        "COMMENT ON TABLE %s IS 'Table %d of schema %s'" % (name, tbl, sch)])
+    return stmts
+
+
+def catalog_stmts(nschemas, ntables, ncols):
+    """Return the statements to create a synthetic catalog
+
+    :param nschemas: number of schemas
+    :param ntables: number of tables per schema
+    :param ncols: number of columns per table
+    :return: list of SQL statements
+    """
+    stmts = []
+    for i in range(1, nschemas + 1):
+        sch = "s%d" % i
+        stmts.append("CREATE SCHEMA %s" % sch)
+        for tbl in range(1, ntables + 1):
+            stmts.extend(table_stmts(sch, tbl, ncols))
+        stmts.extend([
+            "CREATE SEQUENCE %s.seq1 START 1000" % sch,
+            "CREATE TABLE %s.p1 (c1 integer NOT NULL, c2 date NOT NULL, "
+            "c3 text) PARTITION BY RANGE (c2)" % sch])
+        for part in range(1, PARTITIONS + 1):
+            stmts.append(
+                "CREATE TABLE %s.p1_%d PARTITION OF %s.p1 FOR VALUES FROM "
+                "('%d-01-01') TO ('%d-01-01')" % (sch, part, sch, 2000 + part,
+                                                  2001 + part))
+    return stmts
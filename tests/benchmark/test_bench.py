@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Test the synthetic catalogs and the benchmark runner"""
+
+import os
+
+from pyrseas.testutils import PyrseasTestCase, TEST_DIR
+from tests.benchmark import bench
+from tests.benchmark.catalog import PARTITIONS, catalog_stmts, parse_size
+
+
+class BenchmarkTestCase(PyrseasTestCase):
+    """Test running the benchmarks on small catalogs"""
+
+    def tearDown(self):
+        for size in [(1, 2, 3), (2, 3, 4)]:
+            path = bench.query_file(TEST_DIR, size)
+            if os.path.exists(path):
+                os.remove(path)
+        super(BenchmarkTestCase, self).tearDown()
+
+    def test_parse_size(self):
+        "Parse catalog size specifications"
+        assert parse_size('2x30x5') == (2, 30, 5)
+        with self.assertRaises(ValueError):
+            parse_size('2x30')
+        with self.assertRaises(ValueError):
+            parse_size('2x30x2')
+
+    def test_catalog(self):
+        "Create the objects of a synthetic catalog"
+        for stmt in catalog_stmts(2, 3, 4):
+            self.db.execute(stmt)
+        self.db.conn.commit()
+        db = self.database()
+        db.from_catalog()
+        tables = [key for key in db.db.tables if key[0] == 's2']
+        # tables, views and their sequences, plus sequence and partitions
+        assert len(tables) == 3 * 3 + 1 + 1 + PARTITIONS
+        assert len(db.db.tables[('s2', 't3')].columns) == 4
+        assert ('s2', 't3_c2_fkey') in [
+            (key[0], key[2]) for key in db.db.constraints]
+
+    def test_record_replay(self):
+        "Run the benchmark phases live and on recorded queries"
+        results = bench.main(['2x3x4', '1x2x3', '--record', TEST_DIR])
+        assert set(results[0]) == set(bench.PHASES)
+        assert os.path.exists(bench.query_file(TEST_DIR, (1, 2, 3)))
+        replayed = bench.main(['1x2x3', '2x3x4', '--replay', TEST_DIR,
+                               '--memory'])
+        assert replayed[1]['from_map']['peak_kb'] > 0
+
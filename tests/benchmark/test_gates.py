@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""Performance regression gates
+
+These tests measure selected hot paths on synthetic input, without a
+database, and fail if their time or peak traced memory exceeds the
+baselines saved in baselines.json by more than the tolerance.  Times
+are compared as ratios to that of a calibration workload measured in
+the same session, so that the baselines hold on slower or faster
+machines.  The tests are skipped unless pytest is invoked with --perf
+(see conftest.py).  Use --perf-update to save new baselines, e.g.,
+after an intended change.
+"""
+
+import gc
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from argparse import Namespace
+from unittest import TestCase
+
+import pytest
+
+from pyrseas.config import Config
+from pyrseas.database import Database
+from pyrseas.dbobject.column import Column
+from pyrseas.dbobject.privileges import privileges_to_map
+
+BASELINES = os.path.join(os.path.dirname(__file__), 'baselines.json')
+MEMORY_SLACK = 64
+
+
+def offline_database(**files):
+    """Return a Database that can process input maps without a server
+
+    :param files: additional configuration file paths
+    :return: Database
+    """
+    cfg = Config(sys_only=True)
+    cfg['database'] = {'dbname': 'pyrseas_perf', 'username': None,
+                       'password': None, 'host': None, 'port': None}
+    cfg['files'] = files
+    cfg['options'] = Namespace(schemas=[], excl_schemas=[], tables=[],
+                               excl_tables=[], no_owner=False,
+                               no_privs=False, multiple_files=False,
+                               revert=False)
+    db = Database(cfg)
+    db._ext_langs = []
+    return db
+
+
+def columns_map(sch, tbl, ncols):
+    """Return the input map of a table's columns
+
+    :param sch: schema name
+    :param tbl: table name
+    :param ncols: number of columns
+    :return: list
+    """
+    cols = [{'c1': {'type': 'integer', 'not_null': True,
+                    'default': "nextval('%s.%s_c1_seq'::regclass)" % (
+                        sch, tbl)}}]
+    types = ['integer', 'text', 'date', 'numeric(12,2)']
+    cols.extend({'c%d' % i: {'type': types[i % len(types)]}}
+                for i in range(2, ncols + 1))
+    return cols
+
+
+def table_map(sch, tbl, ncols, refs=None):
+    """Return the input map of a table with related objects
+
+    :param sch: schema name
+    :param tbl: table name
+    :param ncols: number of columns (at least 2)
+    :param refs: name of a table referenced by a foreign key, if any
+    :return: dictionary of the table and its owned sequence
+    """
+    tblmap = {'columns': columns_map(sch, tbl, ncols), 'owner': 'postgres',
+              'primary_key': {'%s_pkey' % tbl: {'columns': ['c1']}},
+              'indexes': {'%s_c2_idx' % tbl: {'keys': ['c2']}},
+              'privileges': [{'PUBLIC': ['select']},
+                             {'alice': ['insert', 'update']}]}
+    if refs is not None:
+        tblmap['foreign_keys'] = {'%s_c2_fkey' % tbl: {
+            'columns': ['c2'], 'references': {
+                'schema': sch, 'table': refs, 'columns': ['c1']}}}
+    return {'table %s' % tbl: tblmap,
+            'sequence %s_c1_seq' % tbl: {
+                'owner_table': tbl, 'owner_column': 'c1', 'start_value': 1,
+                'increment_by': 1, 'max_value': None, 'min_value': None,
+                'cache_value': 1}}
+
+
+def schemas_map(nschemas, ntables):
+    """Return the input map of schemas with chains of related tables
+
+    :param nschemas: number of schemas
+    :param ntables: number of tables per schema
+    :return: dictionary
+    """
+    inmap = {}
+    for i in range(nschemas):
+        sch = 's%d' % i
+        schmap = {}
+        for j in range(ntables):
+            schmap.update(table_map(sch, 't%d' % j, 4,
+                                    't%d' % (j - 1) if j else None))
+        inmap['schema ' + sch] = schmap
+    return inmap
+
+
+def measure(func, repeat, memory=True):
+    """Measure the time and peak memory of a function
+
+    :param func: function to call
+    :param repeat: number of timed calls
+    :param memory: measure the peak memory
+    :return: tuple of best time in seconds and peak memory in kB (or
+             None if not measured)
+
+    The memory is measured in an additional call, since tracing the
+    allocations slows down execution.  Garbage left by earlier calls
+    is collected before each call, so that it does not add to its time.
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    if not memory:
+        return (min(times), None)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return (min(times), peak // 1024)
+
+
+def calibration():
+    """Return the time of a fixed workload on this machine
+
+    :return: best time in seconds
+
+    The workload creates, sorts and looks up dictionaries, as the
+    gated hot paths mostly do.  It is measured just before each gated
+    workload, so that both run under the same machine load.
+    """
+    def workload():
+        objs = {}
+        for i in range(50000):
+            objs['o%d' % i] = {'name': 'o%d' % i, 'deps': [i // 2, i // 3]}
+        for key in sorted(objs, reverse=True):
+            objs[key]['deps'].append(len(objs[key]['name']))
+
+    return measure(workload, 5, False)[0]
+
+
+@pytest.mark.perf
+class PerfGateTestCase(TestCase):
+    """Gate the performance of hot paths against saved baselines"""
+
+    perf_config = None
+
+    def gate(self, name, func, repeat=3, memory=True):
+        """Measure a workload and compare it to its baseline
+
+        :param name: name of the workload
+        :param func: function running the workload
+        :param repeat: number of timed calls
+        :param memory: also gate the peak memory
+
+        The time is saved and compared as a ratio to the time of the
+        calibration workload.  The memory limit has an allowance of
+        MEMORY_SLACK kB, so that workloads that allocate little are not
+        failed by noise.
+        """
+        if self.perf_config is None:
+            self.skipTest("Performance gates need pytest --perf")
+        base_time = calibration()
+        (elapsed, peak_kb) = measure(func, repeat, memory)
+        ratio = elapsed / base_time
+        baselines = {}
+        if os.path.exists(BASELINES):
+            with open(BASELINES) as f:
+                baselines = json.load(f)
+        if self.perf_config.getoption('perf_update'):
+            baselines[name] = {'ratio': round(ratio, 3), 'peak_kb': peak_kb}
+            with open(BASELINES, 'w') as f:
+                json.dump(baselines, f, indent=2, sort_keys=True)
+                f.write('\n')
+            return
+        if name not in baselines:
+            self.skipTest("No baseline for %s, run with --perf-update" % name)
+        limit = 1 + self.perf_config.getoption('perf_tolerance')
+        base = baselines[name]
+        assert ratio <= base['ratio'] * limit, \
+            "%s took %.2f times the calibration, baseline is %.2f" % (
+                name, ratio, base['ratio'])
+        if peak_kb is not None:
+            assert peak_kb <= base['peak_kb'] * limit + MEMORY_SLACK, \
+                "%s used %d kB, baseline is %d kB" % (name, peak_kb,
+                                                      base['peak_kb'])
+
+    def test_dep_sorted(self):
+        "Sort 20,000 objects in dependency order"
+        db = offline_database()
+        db.from_map(schemas_map(20, 200))
+        objs = [obj for _, d in db.ndb.all_dicts() for obj in d.values()]
+        assert len(objs) == 20000
+        self.gate('dep_sorted_20k', lambda: db.dep_sorted(objs, db.ndb))
+
+    def test_table_to_map(self):
+        "Map a table with 1,600 columns"
+        db = offline_database()
+        # constraints from a map refer to column names, not numbers
+        db.from_map({'schema s1': {'table t1': {
+            'columns': columns_map('s1', 't1', 1600), 'owner': 'postgres',
+            'privileges': [{'PUBLIC': ['select']}]}}})
+        table = db.ndb.tables[('s1', 't1')]
+        opts = db.config['options']
+        self.gate('table_to_map_1600_columns',
+                  lambda: table.to_map(db.ndb, db.ndb.schemas, opts), 10)
+
+    def test_map_from_dir(self):
+        "Read a metadata directory of 50,000 files"
+        tmpdir = tempfile.mkdtemp(prefix='pyrseas_perf')
+        try:
+            for i in range(10):
+                sch = 's%d' % i
+                with open(os.path.join(tmpdir, 'schema.%s.yaml' % sch),
+                          'w') as f:
+                    f.write("schema %s:\n  owner: postgres\n" % sch)
+                os.mkdir(os.path.join(tmpdir, 'schema.' + sch))
+                for j in range(4999):
+                    with open(os.path.join(tmpdir, 'schema.' + sch,
+                                           'table.t%d.yaml' % j), 'w') as f:
+                        f.write("table t%d:\n  columns:\n  - c1:\n"
+                                "      not_null: true\n"
+                                "      type: integer\n  - c2:\n"
+                                "      type: text\n" % j)
+            db = offline_database(metadata_path=tmpdir)
+            # tracing the allocations of this workload would take minutes
+            self.gate('map_from_dir_50k_files', db.map_from_dir, 1, False)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_privileges_to_map(self):
+        "Map 100,000 access privileges"
+        acls = ['user%d=arw%s/owner%d' % (i, '*' if i % 2 else '', i % 3)
+                for i in range(100000)]
+
+        def map_all():
+            for acl in acls:
+                privileges_to_map(acl, 'arwdDxt', 'owner0')
+        self.gate('privileges_to_map_100k', map_all)
+
+    def test_column_objects(self):
+        "Create 1,000,000 column objects"
+        types = ['integer', 'text', 'date', 'numeric(12,2)']
+        # the rows hold distinct strings, as returned by the driver
+        rows = [{'schema': ''.join(['s', str(i // 100000)]),
+                 'table': ''.join(['t', str(i // 100)]),
+                 'name': 'c%d' % (i % 100 + 1), 'number': i % 100 + 1,
+                 'type': ''.join(types[i % 4]), 'not_null': i % 100 == 0,
+                 'identity': '', 'statistics': -1, 'privileges': None}
+                for i in range(1000000)]
+        self.gate('column_objects_1m',
+                  lambda: [Column(**row) for row in rows], 1)
+
+    def test_help_startup(self):
+        "Print the help of dbtoyaml in a new interpreter"
+        cmd = [sys.executable, '-m', 'pyrseas.dbtoyaml', '--help']
+        self.gate('dbtoyaml_help_startup', lambda: subprocess.run(
+            cmd, check=True, stdout=subprocess.DEVNULL), 5, False)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Pytest options and markers for the Pyrseas tests"""
+
+import os
+import shutil
+import tempfile
+
+import pytest
+from psycopg import OperationalError
+
+from pyrseas.testutils import WORKER, create_template_db
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('pyrseas', "Pyrseas performance gates")
+    group.addoption('--perf', action='store_true',
+                    help="run the performance regression gates")
+    group.addoption('--perf-update', action='store_true',
+                    help="run the performance gates and save their "
+                    "measurements as the new baselines")
+    group.addoption('--perf-tolerance', type=float, default=0.5,
+                    help="fraction by which time or memory may exceed the "
+                    "baselines (default %(default)s)")
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers', "perf: performance regression gate, only run with --perf")
+    # keep the files cached by the tests out of the user's cache
+    config._pyrseas_cache = tempfile.mkdtemp(prefix='pyrseas_cache')
+    os.environ["PYRSEAS_CACHE_DIR"] = config._pyrseas_cache
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(config._pyrseas_cache, ignore_errors=True)
+
+
+def pytest_sessionstart(session):
+    "Re-create the template of the test databases, once per run"
+    if WORKER is not None:
+        return
+    try:
+        create_template_db(replace=True)
+    except OperationalError:
+        # no server: the tests needing one will report the error
+        pass
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('perf') or config.getoption('perf_update'):
+        return
+    skip = pytest.mark.skip(reason="performance gate, needs --perf to run")
+    for item in items:
+        if 'perf' in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture(autouse=True)
+def _perf_config(request):
+    "Make the pytest configuration available to performance gates"
+    if request.instance is not None and 'perf' in request.keywords:
+        request.instance.perf_config = request.config
@@ -167,6 +167,16 @@ class ColumnToMapTestCase(DatabaseToMapTestCase):
                   'owner_table': 't1', 'owner_column': 'c1'}
         assert dbmap['schema sd']['sequence t1_c1_seq'] == expmap
 
+    def test_map_generated(self):
+        "Map a table with a generated column"
+        stmts = ["CREATE TABLE t1 (c1 integer, c2 integer GENERATED ALWAYS "
+                 "AS (c1 * 2) STORED)"]
+        dbmap = self.to_map(stmts)
+        expmap = {'columns': [{'c1': {'type': 'integer'}},
+                              {'c2': {'type': 'integer', 'default': '(c1 * 2)',
+                                      'generated': 'stored'}}]}
+        assert dbmap['schema sd']['table t1'] == expmap
+
 
 class ColumnToSqlTestCase(InputMapToSqlTestCase):
     """Test SQL generation of column-related statements from input schemas"""
@@ -213,6 +223,58 @@ class ColumnToSqlTestCase(InputMapToSqlTestCase):
             "IDENTITY (SEQUENCE NAME sd.t1_c1_seq START WITH 1 INCREMENT BY 1 "
             "NO MINVALUE NO MAXVALUE CACHE 1), c2 text)")
 
+    def test_create_column_generated(self):
+        "Create a table with a generated column"
+        inmap = self.std_map()
+        inmap['schema sd'].update({'table t1': {
+            'columns': [{'c1': {'type': 'integer'}},
+                        {'c2': {'type': 'integer', 'default': '(c1 * 2)',
+                                'generated': 'stored'}}]}})
+        sql = self.to_sql(inmap)
+        assert fix_indent(sql[0]) == (
+            "CREATE TABLE sd.t1 (c1 integer, c2 integer GENERATED ALWAYS AS "
+            "((c1 * 2)) STORED)")
+
+    def test_change_column_generated(self):
+        "Change the expression of a generated column"
+        stmt = ("CREATE TABLE t1 (c1 integer, c2 integer GENERATED ALWAYS "
+                "AS (c1 * 2) STORED)")
+        inmap = self.std_map()
+        inmap['schema sd'].update({'table t1': {
+            'columns': [{'c1': {'type': 'integer'}},
+                        {'c2': {'type': 'integer', 'default': '(c1 * 3)',
+                                'generated': 'stored'}}]}})
+        sql = self.to_sql(inmap, [stmt])
+        assert fix_indent(sql[0]) == (
+            "ALTER TABLE sd.t1 DROP COLUMN c2, ADD COLUMN c2 integer "
+            "GENERATED ALWAYS AS ((c1 * 3)) STORED")
+
+    def test_add_column_generated(self):
+        "Change a regular column to a generated column"
+        stmt = "CREATE TABLE t1 (c1 integer, c2 integer DEFAULT 0)"
+        inmap = self.std_map()
+        inmap['schema sd'].update({'table t1': {
+            'columns': [{'c1': {'type': 'integer'}},
+                        {'c2': {'type': 'integer', 'default': '(c1 * 2)',
+                                'generated': 'stored'}}]}})
+        sql = self.to_sql(inmap, [stmt])
+        assert fix_indent(sql[0]) == (
+            "ALTER TABLE sd.t1 DROP COLUMN c2, ADD COLUMN c2 integer "
+            "GENERATED ALWAYS AS ((c1 * 2)) STORED")
+
+    def test_drop_column_generated(self):
+        "Change a generated column to a regular column with a default"
+        stmt = ("CREATE TABLE t1 (c1 integer, c2 integer GENERATED ALWAYS "
+                "AS (c1 * 2) STORED)")
+        inmap = self.std_map()
+        inmap['schema sd'].update({'table t1': {
+            'columns': [{'c1': {'type': 'integer'}},
+                        {'c2': {'type': 'integer', 'default': '0'}}]}})
+        sql = self.to_sql(inmap, [stmt])
+        assert fix_indent(sql[0]) == (
+            "ALTER TABLE sd.t1 ALTER COLUMN c2 DROP EXPRESSION, "
+            "ALTER COLUMN c2 SET DEFAULT 0")
+
     def test_change_column_default(self):
         "Change the default value for an existing column"
         stmt = "CREATE TABLE t1 (c1 integer, c2 boolean default true)"
@@ -1,8 +1,16 @@
 # -*- coding: utf-8 -*-
 """Test loading of data from and into static tables"""
+import gzip
 import os
+import tempfile
+import tracemalloc
 
-from pyrseas.testutils import DatabaseToMapTestCase
+from pyrseas.dbobject.table import copy_command
+from pyrseas.lib import dbconn
+from pyrseas.lib.dbconn import major_version
+
+from pyrseas.testutils import PyrseasTestCase, DatabaseToMapTestCase
+from pyrseas.testutils import TEST_DIR
 from pyrseas.testutils import InputMapToSqlTestCase
 
 CREATE_STMT = "CREATE TABLE t1 (c1 integer, c2 text)"
@@ -56,6 +64,92 @@ class StaticTableToMapTestCase(DatabaseToMapTestCase):
                 recs.append((int(c1), c2, c3.rstrip()))
         assert recs == sorted(TABLE_DATA2)
 
+    def test_copy_static_table_gzip(self):
+        "Copy a table to a gzip-compressed file"
+        self.db.execute(CREATE_STMT)
+        for row in TABLE_DATA:
+            self.db.execute("INSERT INTO t1 VALUES (%s, %s)", row)
+        cfg = {'datacopy': {'compression': 'gzip', 'schema sd': ['t1']}}
+        self.to_map([], config=cfg)
+        recs = []
+        with gzip.open(os.path.join(self.cfg['files']['data_path'],
+                                    "schema.sd", FILE_PATH + '.gz'),
+                       'rt') as f:
+            for line in f:
+                (c1, c2) = line.split(',')
+                recs.append((int(c1), c2.rstrip()))
+        assert recs == TABLE_DATA
+
+    def test_copy_static_table_binary(self):
+        "Copy a table to a file in binary format"
+        self.db.execute(CREATE_STMT)
+        for row in TABLE_DATA:
+            self.db.execute("INSERT INTO t1 VALUES (%s, %s)", row)
+        cfg = {'datacopy': {'schema sd': [{'t1': {'format': 'binary'}}]}}
+        self.to_map([], config=cfg)
+        path = os.path.join(
+            self.cfg['files']['data_path'], "schema.sd", "table.t1.pg%d.bin" %
+            major_version(self.db.conn.info.server_version))
+        with open(path, 'rb') as f:
+            assert f.read(11) == b'PGCOPY\n\xff\r\n\x00'
+
+    def test_copy_static_table_binary_fallback(self):
+        "Copy a table as CSV if a column type has no binary format"
+        self.db.execute("CREATE TABLE t1 (c1 integer PRIMARY KEY, c2 aclitem)")
+        self.db.execute("INSERT INTO t1 VALUES (1, makeaclitem("
+                        "10, 10, 'SELECT', false))")
+        cfg = {'datacopy': {'schema sd': [{'t1': {'format': 'binary'}}]}}
+        self.to_map([], config=cfg)
+        datadir = os.path.join(self.cfg['files']['data_path'], "schema.sd")
+        assert os.listdir(datadir) == [FILE_PATH]
+
+    def test_copy_static_table_binary_user_types(self):
+        "Copy tables as CSV if a column type embeds user type OIDs"
+        self.db.execute("CREATE TYPE ty1 AS (x integer, y text)")
+        self.db.execute("CREATE TYPE ty2 AS ENUM ('a', 'b')")
+        self.db.execute("CREATE DOMAIN dm1 AS ty1")
+        self.db.execute("CREATE TABLE t1 (c1 integer PRIMARY KEY, c2 ty1)")
+        self.db.execute("CREATE TABLE t2 (c1 integer PRIMARY KEY, c2 ty2[])")
+        self.db.execute("CREATE TABLE t3 (c1 integer PRIMARY KEY, c2 dm1)")
+        self.db.execute("CREATE TABLE t4 (c1 integer PRIMARY KEY, c2 ty2,"
+                        "c3 text[])")
+        cfg = {'datacopy': {'schema sd': [{'t%d' % i: {'format': 'binary'}}
+                                          for i in range(1, 5)]}}
+        self.to_map([], config=cfg)
+        datadir = os.path.join(self.cfg['files']['data_path'], "schema.sd")
+        assert sorted(os.listdir(datadir)) == [
+            'table.t1.data', 'table.t2.data', 'table.t3.data',
+            "table.t4.pg%d.bin" % major_version(
+                self.db.conn.info.server_version)]
+
+    def test_copy_static_tables_jobs(self):
+        "Copy several tables concurrently"
+        self.db.execute(CREATE_STMT)
+        self.db.execute("CREATE TABLE t2 (c1 integer, c2 text)")
+        self.db.execute("CREATE SCHEMA s1")
+        self.db.execute("CREATE TABLE s1.t3 (c1 integer, c2 text)")
+        for tbl in ('t1', 't2', 's1.t3'):
+            for row in TABLE_DATA:
+                self.db.execute("INSERT INTO %s VALUES (%%s, %%s)" % tbl, row)
+        self.config_options(schemas=[], tables=[], no_owner=True,
+                            no_privs=True, multiple_files=False, jobs=2)
+        self.cfg.merge({'datacopy': {'schema sd': ['t1', 't2'],
+                                     'schema s1': ['t3']},
+                        'files': {'data_path': os.path.join(
+                            TEST_DIR, self.cfg['repository']['data'])}})
+        self.db.conn.commit()
+        db = self.database()
+        db.to_map()
+        for (sch, tbl) in (('sd', 't1'), ('sd', 't2'), ('s1', 't3')):
+            recs = []
+            with open(os.path.join(self.cfg['files']['data_path'],
+                                   "schema.%s" % sch,
+                                   "table.%s.data" % tbl)) as f:
+                for line in f:
+                    (c1, c2) = line.split(',')
+                    recs.append((int(c1), c2.rstrip()))
+            assert recs == TABLE_DATA
+
 
 class StaticTableToSqlTestCase(InputMapToSqlTestCase):
     """Test SQL generation of data import statements"""
@@ -74,6 +168,226 @@ class StaticTableToSqlTestCase(InputMapToSqlTestCase):
         assert sql[0] == "TRUNCATE ONLY sd.t1"
         assert sql[1] == copy_stmt
 
+    def test_load_static_table_options(self):
+        "Accept copying options in the datacopy configuration"
+        inmap = self.std_map()
+        inmap['schema sd'].update({'table t1': {
+            'columns': [{'c1': {'type': 'integer'}},
+                        {'c2': {'type': 'text'}}]}})
+        cfg = {'datacopy': {'buffer_size': 65536, 'mmap': True,
+                            'schema sd': ['t1']}}
+        sql = self.to_sql(inmap, [CREATE_STMT], config=cfg)
+        assert sql[0] == "TRUNCATE ONLY sd.t1"
+        assert sql[1][1] == 'sd.t1'
+
+    def test_load_static_table_gzip(self):
+        "Import a table from a gzip-compressed file"
+        inmap = self.std_map()
+        inmap['schema sd'].update({'table t1': {
+            'columns': [{'c1': {'type': 'integer'}},
+                        {'c2': {'type': 'text'}}]}})
+        cfg = {'datacopy': {'compression': 'gzip', 'schema sd': ['t1']}}
+        sql = self.to_sql(inmap, [CREATE_STMT], config=cfg)
+        copy_stmt = ("\\copy ", 'sd.t1', " from program 'gzip -dc ",
+                     os.path.join(self.cfg['files']['data_path'],
+                                  "schema.sd", FILE_PATH + '.gz'), "' csv")
+        assert sql[1] == copy_stmt
+
+    def test_copy_command_quoted(self):
+        "Quote a compressed file path for the shell and for psql"
+        stmt = ("\\copy ", 'sd.t1', " from program 'gzip -dc ",
+                "/tmp/it's here.data.gz", "' csv")
+        assert copy_command(stmt) == (
+            "\\copy sd.t1 from program 'gzip -dc "
+            "''/tmp/it''\"''\"''s here.data.gz''' csv")
+        stmt = ("\\copy ", 'sd.t1', " from '", "/tmp/it's.data", "' csv")
+        assert copy_command(stmt) == "\\copy sd.t1 from '/tmp/it''s.data' csv"
+
+    def test_load_static_table_binary(self):
+        "Import a table from a file in binary format"
+        inmap = self.std_map()
+        inmap['schema sd'].update({'table t1': {
+            'columns': [{'c1': {'type': 'integer'}},
+                        {'c2': {'type': 'text'}}]}})
+        cfg = {'datacopy': {'schema sd': [{'t1': {'format': 'binary'}}]}}
+        datadir = os.path.join(TEST_DIR, self.cfg['repository']['data'],
+                               "schema.sd")
+        path = os.path.join(datadir, "table.t1.pg%d.bin" % major_version(
+            self.db.conn.info.server_version))
+        os.makedirs(datadir, exist_ok=True)
+        open(path, 'wb').close()
+        try:
+            sql = self.to_sql(inmap, [CREATE_STMT], config=cfg)
+        finally:
+            os.remove(path)
+        assert sql[1] == ("\\copy ", 'sd.t1', " from '", path, "' binary")
+
+    def test_load_static_table_binary_version(self):
+        "Reject a binary file written by a different server version"
+        inmap = self.std_map()
+        inmap['schema sd'].update({'table t1': {
+            'columns': [{'c1': {'type': 'integer'}},
+                        {'c2': {'type': 'text'}}]}})
+        cfg = {'datacopy': {'schema sd': [{'t1': {'format': 'binary'}}]}}
+        datadir = os.path.join(TEST_DIR, self.cfg['repository']['data'],
+                               "schema.sd")
+        path = os.path.join(datadir, "table.t1.pg1.bin")
+        os.makedirs(datadir, exist_ok=True)
+        open(path, 'wb').close()
+        try:
+            with self.assertRaises(ValueError):
+                self.to_sql(inmap, [CREATE_STMT], config=cfg)
+        finally:
+            os.remove(path)
+
+    def test_sync_static_table(self):
+        "Apply only the differences between a file and a table"
+        inmap = self.std_map()
+        inmap['schema sd'].update({'table t1': {
+            'columns': [{'c1': {'type': 'integer', 'not_null': True}},
+                        {'c2': {'type': 'text'}}],
+            'primary_key': {'t1_pkey': {'columns': ['c1']}}}})
+        cfg = {'datacopy': {'schema sd': [{'t1': {'mode': 'sync'}}]}}
+        sql = self.to_sql(inmap, [
+            "CREATE TABLE t1 (c1 integer PRIMARY KEY, c2 text)",
+            "INSERT INTO t1 VALUES (1, 'abc'), (2, 'old'), (4, 'gone')"],
+            config=cfg)
+        assert sql[0] == "CREATE TEMP TABLE pyrseas_stage (LIKE sd.t1)"
+        assert sql[1][1] == 'pyrseas_stage'
+        assert sql[2] == "DELETE FROM sd.t1 t WHERE NOT EXISTS (SELECT 1 " \
+            "FROM pyrseas_stage s WHERE s.c1 = t.c1)"
+        assert sql[3] == "UPDATE sd.t1 t SET c2 = s.c2 FROM pyrseas_stage " \
+            "s WHERE s.c1 = t.c1 AND (t.c2) IS DISTINCT FROM (s.c2)"
+        assert sql[4] == "INSERT INTO sd.t1 (c1, c2) SELECT s.c1, s.c2 " \
+            "FROM pyrseas_stage s WHERE NOT EXISTS (SELECT 1 FROM sd.t1 t " \
+            "WHERE s.c1 = t.c1)"
+        assert sql[5] == "DROP TABLE pyrseas_stage"
+        xmin = self.db.fetchone("SELECT xmin FROM t1 WHERE c1 = 1")['xmin']
+        os.makedirs(os.path.dirname(sql[1][3]), exist_ok=True)
+        with open(sql[1][3], 'w') as f:
+            f.write("1,abc\n2,def\n3,ghi\n")
+        try:
+            self.database().apply_stmts(sql)
+        finally:
+            os.remove(sql[1][3])
+        assert self.db.fetchone(
+            "SELECT string_agg(c1 || c2, ',' ORDER BY c1) AS rows "
+            "FROM t1")['rows'] == '1abc,2def,3ghi'
+        assert self.db.fetchone(
+            "SELECT xmin FROM t1 WHERE c1 = 1")['xmin'] == xmin
+
+    def test_sync_static_table_identity(self):
+        "Sync a table with identity and generated columns"
+        inmap = self.std_map()
+        inmap['schema sd'].update({'table t1': {
+            'columns': [{'c1': {'type': 'integer', 'not_null': True,
+                                'identity': 'always'}},
+                        {'c2': {'type': 'text'}},
+                        {'c3': {'type': 'integer', 'default': 'length(c2)',
+                                'generated': 'stored'}}],
+            'primary_key': {'t1_pkey': {'columns': ['c1']}}},
+                                   'sequence t1_c1_seq': {
+            'cache_value': 1, 'data_type': 'integer', 'increment_by': 1,
+            'max_value': 2147483647, 'min_value': None, 'start_value': 1,
+            'owner_table': 't1', 'owner_column': 'c1'}})
+        cfg = {'datacopy': {'schema sd': [{'t1': {'mode': 'sync'}}]}}
+        sql = self.to_sql(inmap, [
+            "CREATE TABLE t1 (c1 integer GENERATED ALWAYS AS IDENTITY "
+            "PRIMARY KEY, c2 text, c3 integer GENERATED ALWAYS AS "
+            "(length(c2)) STORED)",
+            "INSERT INTO t1 (c2) VALUES ('abc'), ('old')"], config=cfg)
+        assert sql[0] == "CREATE TEMP TABLE pyrseas_stage (LIKE sd.t1 " \
+            "INCLUDING GENERATED)"
+        assert sql[3] == "UPDATE sd.t1 t SET c2 = s.c2 FROM pyrseas_stage " \
+            "s WHERE s.c1 = t.c1 AND (t.c2) IS DISTINCT FROM (s.c2)"
+        assert sql[4] == "INSERT INTO sd.t1 (c1, c2) OVERRIDING SYSTEM " \
+            "VALUE SELECT s.c1, s.c2 FROM pyrseas_stage s WHERE NOT EXISTS " \
+            "(SELECT 1 FROM sd.t1 t WHERE s.c1 = t.c1)"
+        os.makedirs(os.path.dirname(sql[1][3]), exist_ok=True)
+        with open(sql[1][3], 'w') as f:
+            f.write("1,abc\n2,defg\n5,hi\n")
+        try:
+            self.database().apply_stmts(sql)
+        finally:
+            os.remove(sql[1][3])
+        assert self.db.fetchone(
+            "SELECT string_agg(c1 || c2 || c3, ',' ORDER BY c1) AS rows "
+            "FROM t1")['rows'] == '1abc3,2defg4,5hi2'
+
+    def test_sync_static_table_referenced(self):
+        "Keep the foreign keys referring to a synced table"
+        inmap = self.std_map()
+        inmap['schema sd'].update({'table t1': {
+            'columns': [{'c1': {'type': 'integer', 'not_null': True}},
+                        {'c2': {'type': 'text'}}],
+            'primary_key': {'t1_pkey': {'columns': ['c1']}}},
+                                   'table t2': {
+            'columns': [{'c1': {'type': 'integer'}},
+                        {'c2': {'type': 'integer'}}],
+            'foreign_keys': {'t2_c2_fkey': {
+                'columns': ['c2'], 'references': {
+                    'table': 't1', 'columns': ['c1']}}}}})
+        cfg = {'datacopy': {'schema sd': [{'t1': {'mode': 'sync'}}]}}
+        sql = self.to_sql(inmap, [
+            "CREATE TABLE t1 (c1 integer PRIMARY KEY, c2 text)",
+            "CREATE TABLE t2 (c1 integer, c2 integer REFERENCES t1 (c1))",
+            "INSERT INTO t1 VALUES (1, 'abc'), (2, 'old')",
+            "INSERT INTO t2 VALUES (1, 2)"], config=cfg)
+        assert not [stmt for stmt in sql if isinstance(stmt, str)
+                    and "CONSTRAINT" in stmt]
+        os.makedirs(os.path.dirname(sql[1][3]), exist_ok=True)
+        with open(sql[1][3], 'w') as f:
+            f.write("1,abc\n2,def\n3,ghi\n")
+        try:
+            self.database().apply_stmts(sql)
+        finally:
+            os.remove(sql[1][3])
+        assert self.db.fetchone(
+            "SELECT string_agg(c1 || c2, ',' ORDER BY c1) AS rows "
+            "FROM t1")['rows'] == '1abc,2def,3ghi'
+
+    def test_sync_static_table_no_pk(self):
+        "Reject syncing a table without a primary key"
+        inmap = self.std_map()
+        inmap['schema sd'].update({'table t1': {
+            'columns': [{'c1': {'type': 'integer'}},
+                        {'c2': {'type': 'text'}}]}})
+        cfg = {'datacopy': {'schema sd': [{'t1': {'mode': 'sync'}}]}}
+        with self.assertRaises(ValueError):
+            self.to_sql(inmap, [CREATE_STMT], config=cfg)
+
+    def test_skip_unchanged_table(self):
+        "Skip loading a table whose file and contents have not changed"
+        def inmap():
+            inmap = self.std_map()
+            inmap['schema sd'].update({'table t1': {
+                'columns': [{'c1': {'type': 'integer'}},
+                            {'c2': {'type': 'text'}}]}})
+            return inmap
+        self.db.execute(CREATE_STMT)
+        for row in TABLE_DATA:
+            self.db.execute("INSERT INTO t1 VALUES (%s, %s)", row)
+        self.db.conn.commit()
+        cfg = {'datacopy': {'skip_unchanged': True, 'schema sd': ['t1']}}
+        datadir = os.path.join(TEST_DIR, self.cfg['repository']['data'])
+        self.config_options(schemas=[], tables=[], no_owner=True,
+                            no_privs=True, multiple_files=False)
+        self.cfg.merge(cfg)
+        self.cfg.merge({'files': {'data_path': datadir}})
+        self.database().to_map()
+        path = os.path.join(datadir, "schema.sd", FILE_PATH)
+        try:
+            assert self.to_sql(inmap(), config=cfg) == []
+            self.db.execute_commit("UPDATE t1 SET c2 = 'xyz' WHERE c1 = 2")
+            assert self.to_sql(inmap(), config=cfg)[0] == "TRUNCATE ONLY sd.t1"
+            self.db.execute_commit("UPDATE t1 SET c2 = 'def' WHERE c1 = 2")
+            with open(path, 'a') as f:
+                f.write("4,jkl\n")
+            assert self.to_sql(inmap(), config=cfg)[0] == "TRUNCATE ONLY sd.t1"
+        finally:
+            os.remove(path)
+            os.remove(os.path.join(datadir, "datacopy.manifest"))
+
     def test_load_static_table_fk(self):
         "Truncate and import a table which has a foreign key dependency"
         stmts = ["CREATE TABLE t1 (pc1 integer PRIMARY KEY, pc2 text)",
@@ -101,3 +415,159 @@ class StaticTableToSqlTestCase(InputMapToSqlTestCase):
         assert sql[2] == copy_stmt
         assert sql[3] == "ALTER TABLE sd.t2 ADD CONSTRAINT t2_c2_fkey " \
             "FOREIGN KEY (c2) REFERENCES sd.t1 (pc1)"
+
+    def fk_map(self):
+        inmap = self.std_map()
+        inmap['schema sd'].update({'table t1': {
+            'columns': [{'pc1': {'type': 'integer', 'not_null': True}},
+                        {'pc2': {'type': 'text'}}],
+            'primary_key': {'t1_pkey': {'columns': ['pc1']}}}, 'table t2': {
+                'columns': [{'c1': {'type': 'integer'}},
+                            {'c2': {'type': 'integer'}},
+                            {'c3': {'type': 'text'}}],
+                'foreign_keys': {'t2_c2_fkey': {
+                    'columns': ['c2'],
+                    'references': {'schema': 'sd', 'table': 't1',
+                                   'columns': ['pc1']}}}}})
+        return inmap
+
+    def test_load_static_tables_fk(self):
+        "Drop and add a foreign key once when loading related tables"
+        stmts = ["CREATE TABLE t1 (pc1 integer PRIMARY KEY, pc2 text)",
+                 "CREATE TABLE t2 (c1 integer, c2 integer REFERENCES t1, "
+                 "c3 text)"]
+        cfg = {'datacopy': {'schema sd': ['t1', 't2']}}
+        sql = self.to_sql(self.fk_map(), stmts, config=cfg)
+        assert len(sql) == 6
+        assert sql[0] == "ALTER TABLE sd.t2 DROP CONSTRAINT t2_c2_fkey"
+        assert sql[1] == "TRUNCATE ONLY sd.t1"
+        assert sql[2][1] == 'sd.t1'
+        assert sql[3] == "TRUNCATE ONLY sd.t2"
+        assert sql[4][1] == 'sd.t2'
+        assert sql[5] == "ALTER TABLE sd.t2 ADD CONSTRAINT t2_c2_fkey " \
+            "FOREIGN KEY (c2) REFERENCES sd.t1 (pc1)"
+
+    def test_load_static_tables_fk_not_valid(self):
+        "Add a foreign key as NOT VALID and validate it separately"
+        stmts = ["CREATE TABLE t1 (pc1 integer PRIMARY KEY, pc2 text)",
+                 "CREATE TABLE t2 (c1 integer, c2 integer REFERENCES t1, "
+                 "c3 text)"]
+        cfg = {'datacopy': {'deferred_validation': True,
+                            'schema sd': ['t1', 't2']}}
+        sql = self.to_sql(self.fk_map(), stmts, config=cfg)
+        assert sql[5] == "ALTER TABLE sd.t2 ADD CONSTRAINT t2_c2_fkey " \
+            "FOREIGN KEY (c2) REFERENCES sd.t1 (pc1) NOT VALID"
+        assert sql[6] == "ALTER TABLE sd.t2 VALIDATE CONSTRAINT t2_c2_fkey"
+
+    def test_apply_load_jobs(self):
+        "Load related tables concurrently"
+        stmts = ["CREATE TABLE t1 (pc1 integer PRIMARY KEY, pc2 text)",
+                 "CREATE TABLE t2 (c1 integer, c2 integer REFERENCES t1, "
+                 "c3 text)", "INSERT INTO t1 VALUES (9, 'old')",
+                 "INSERT INTO t2 VALUES (1, 9, 'old')"]
+        cfg = {'datacopy': {'deferred_validation': True,
+                            'schema sd': ['t1', 't2']}}
+        sql = self.to_sql(self.fk_map(), stmts, config=cfg)
+        os.makedirs(os.path.dirname(sql[2][3]), exist_ok=True)
+        with open(sql[2][3], 'w') as f:
+            f.write("1,abc\n2,def\n")
+        with open(sql[4][3], 'w') as f:
+            f.write("1,1,row 1\n2,2,row 2\n3,1,row 3\n")
+        try:
+            self.database().apply_stmts(sql, 2)
+        finally:
+            os.remove(sql[2][3])
+            os.remove(sql[4][3])
+        assert self.db.fetchone("SELECT count(*) FROM t1")['count'] == 2
+        assert self.db.fetchone("SELECT count(*) FROM t2")['count'] == 3
+        assert self.db.fetchone(
+            "SELECT convalidated FROM pg_constraint "
+            "WHERE conname = 't2_c2_fkey'")['convalidated']
+
+
+class CopyFromTestCase(PyrseasTestCase):
+    """Test streaming data files into tables"""
+
+    def setUp(self):
+        super(CopyFromTestCase, self).setUp()
+        self.db.execute_commit(CREATE_STMT)
+        (fd, self.path) = tempfile.mkstemp(suffix='.data')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+        super(CopyFromTestCase, self).tearDown()
+
+    def write_data(self, nrows):
+        with open(self.path, 'w') as f:
+            for i in range(nrows):
+                f.write("%d,row number %d\n" % (i, i))
+
+    def copy_from(self, **kwargs):
+        dbconn = self.database().dbconn
+        dbconn.copy_from(self.path, 'sd.t1', **kwargs)
+        dbconn.commit()
+        dbconn.close()
+        row = self.db.fetchone("SELECT count(*), max(c2) FROM t1")
+        return (row['count'], row['max'])
+
+    def test_copy_chunks(self):
+        "Copy a file in chunks smaller than its lines"
+        self.write_data(100)
+        assert self.copy_from(bufsize=7) == (100, 'row number 99')
+
+    def test_copy_mmap(self):
+        "Copy a memory-mapped file"
+        self.write_data(100)
+        assert self.copy_from(bufsize=64, use_mmap=True) == \
+            (100, 'row number 99')
+
+    def test_copy_empty_mmap(self):
+        "Copy an empty memory-mapped file"
+        assert self.copy_from(use_mmap=True) == (0, None)
+
+    def test_copy_gzip(self):
+        "Copy a gzip-compressed file"
+        gzpath = self.path + '.gz'
+        with open(self.path, 'wb') as f:
+            f.write(gzip.compress(b''.join(
+                b"%d,row number %d\n" % (i, i) for i in range(100))))
+        os.rename(self.path, gzpath)
+        self.path = gzpath
+        assert self.copy_from(bufsize=64, use_mmap=True) == \
+            (100, 'row number 99')
+
+    def test_copy_zstd(self):
+        "Copy a zstd-compressed file"
+        if dbconn.zstandard is None:
+            self.skipTest("The zstandard module is not installed")
+        zpath = self.path + '.zst'
+        with open(self.path, 'wb') as f:
+            f.write(dbconn.zstandard.compress(b''.join(
+                b"%d,row number %d\n" % (i, i) for i in range(100))))
+        os.rename(self.path, zpath)
+        self.path = zpath
+        assert self.copy_from(bufsize=64) == (100, 'row number 99')
+
+    def test_copy_binary(self):
+        "Copy a file in binary format"
+        self.db.execute_commit("INSERT INTO t1 SELECT i, 'row number ' || i "
+                               "FROM generate_series(0, 99) i")
+        dbconn = self.database().dbconn
+        dbconn.sql_copy_to("COPY sd.t1 TO STDOUT WITH BINARY", self.path)
+        dbconn.close()
+        self.db.execute_commit("TRUNCATE t1")
+        assert self.copy_from(bufsize=64, binary=True) == \
+            (100, 'row number 99')
+
+    def test_copy_memory(self):
+        "Use memory bounded by the buffer size, not the file size"
+        self.write_data(400000)
+        assert os.path.getsize(self.path) > 8 * 1024 * 1024
+        tracemalloc.start()
+        try:
+            assert self.copy_from(bufsize=64 * 1024)[0] == 400000
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        assert peak < 1024 * 1024
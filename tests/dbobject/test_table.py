@@ -298,6 +298,19 @@ class TableToSqlTestCase(InputMapToSqlTestCase):
         assert fix_indent(sql[2]) == (
             "CREATE TABLE sd.t1b PARTITION OF t1 FOR VALUES %s" % spec2)
 
+    def test_unchanged_partition(self):
+        "Do not alter an existing partition, which has no columns in map"
+        inmap = self.std_map()
+        spec1 = "FROM (1) TO (100)"
+        inmap['schema sd'].update({'table t1': {
+            'columns': [{'c1': {'type': 'integer'}}, {'c2': {'type': 'text'}}],
+            'partition_by': {'range': ['c1']}}, 'table t1a': {
+                'partition_bound_spec': spec1, 'partition_of': 't1'}})
+        sql = self.to_sql(inmap, [
+            "CREATE TABLE t1 (c1 integer, c2 text) PARTITION BY RANGE (c1)",
+            "CREATE TABLE t1a PARTITION OF t1 FOR VALUES %s" % spec1])
+        assert sql == []
+
 
 class TableCommentToSqlTestCase(InputMapToSqlTestCase):
     """Test SQL generation of table and column COMMENT statements"""
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""Test the asyncio interface to the catalogs"""
+
+import asyncio
+import os
+
+import pytest
+
+from pyrseas.database import AsyncDatabase
+from pyrseas.lib.dbconn import AsyncDbConnection
+from pyrseas.dbobject.schema import read_manifest
+from pyrseas.testutils import PyrseasTestCase, TEST_DIR, remove_temp_files
+
+CREATE_STMTS = ["CREATE TABLE t1 (c1 integer PRIMARY KEY, c2 text)",
+                "CREATE SEQUENCE seq1",
+                "CREATE VIEW v1 AS SELECT c1 FROM t1"]
+
+
+class AsyncDatabaseTestCase(PyrseasTestCase):
+    """Test fetching and comparing catalog objects with asyncio"""
+
+    def setUp(self):
+        super(AsyncDatabaseTestCase, self).setUp()
+        for stmt in CREATE_STMTS:
+            self.db.execute(stmt)
+        self.db.conn.commit()
+        self.config_options(schemas=[], tables=[], no_owner=True,
+                            no_privs=True, multiple_files=False,
+                            revert=False)
+
+    def input_map(self):
+        return {'schema sd': {'table t1': {
+            'columns': [{'c1': {'type': 'integer', 'not_null': True}},
+                        {'c2': {'type': 'text'}}],
+            'primary_key': {'t1_pkey': {'columns': ['c1']}}}}}
+
+    def test_from_catalog(self):
+        "Fetch the catalog objects from a coroutine"
+        async def fetch():
+            db = AsyncDatabase(self.cfg)
+            await db.from_catalog()
+            await db.close()
+            return db
+        db = asyncio.run(fetch())
+        assert ('sd', 't1') in db.db.tables
+        assert ('sd', 'seq1') in db.db.tables
+        assert db.db.tables[('sd', 't1')] in \
+            db.db.tables[('sd', 'v1')].depends_on
+
+    def test_to_map(self):
+        "Map the catalog objects as the synchronous interface does"
+        async def to_map():
+            db = AsyncDatabase(self.cfg)
+            dbmap = await db.to_map(quote_reserved=False)
+            await db.close()
+            return dbmap
+        assert asyncio.run(to_map()) == \
+            self.database().to_map(quote_reserved=False)
+
+    def test_to_map_datacopy(self):
+        "Copy the data of a table and record its hash"
+        self.db.execute("INSERT INTO t1 VALUES (1, 'abc'), (2, 'def')")
+        self.db.conn.commit()
+        datadir = os.path.join(TEST_DIR, self.cfg['repository']['data'])
+        self.cfg.merge({'datacopy': {'skip_unchanged': True,
+                                     'schema sd': ['t1']},
+                        'files': {'data_path': datadir}})
+
+        async def to_map():
+            db = AsyncDatabase(self.cfg)
+            await db.to_map(quote_reserved=False)
+            await db.close()
+        try:
+            asyncio.run(to_map())
+            with open(os.path.join(datadir, "schema.sd",
+                                   "table.t1.data")) as f:
+                assert f.read() == "1,abc\n2,def\n"
+            manifest = read_manifest(datadir)
+            assert manifest['schema.sd/table.t1.data']['rows']
+        finally:
+            remove_temp_files(TEST_DIR)
+
+    def test_diff_map(self):
+        "Generate the same statements as the synchronous interface"
+        async def diff():
+            db = AsyncDatabase(self.cfg)
+            stmts = await db.diff_map(self.input_map(), quote_reserved=False)
+            await db.close()
+            return stmts
+        stmts = asyncio.run(diff())
+        assert stmts == self.database().diff_map(self.input_map(),
+                                                 quote_reserved=False)
+        assert "DROP VIEW sd.v1" in stmts
+
+    def test_concurrent(self):
+        "Compare two databases concurrently"
+        async def diff_both():
+            dbs = [AsyncDatabase(self.cfg), AsyncDatabase(self.cfg)]
+            results = await asyncio.gather(*[
+                db.diff_map(self.input_map(), quote_reserved=False)
+                for db in dbs])
+            for db in dbs:
+                await db.close()
+            return results
+        stmts1, stmts2 = asyncio.run(diff_both())
+        assert stmts1 == stmts2
+        assert "DROP SEQUENCE sd.seq1" in stmts1
+
+    def test_not_prefetched(self):
+        "Reject a query that was not fetched beforehand"
+        async def fetch():
+            db = AsyncDatabase(self.cfg)
+            await db.from_catalog()
+            await db.close()
+            return db
+        db = asyncio.run(fetch())
+        with pytest.raises(KeyError, match="not prefetched"):
+            db.database.dbconn.fetchone("SELECT 1")
+
+    def test_pool_options(self):
+        "Reject the options of a shared, blocking, pool"
+        with pytest.raises(ValueError):
+            AsyncDbConnection(self.cfg['database']['dbname'],
+                              pool={'max_size': 2})
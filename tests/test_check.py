@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Test checking whether a database matches a spec"""
+
+from pyrseas.testutils import InputMapToSqlTestCase
+
+CREATE_STMT = "CREATE TABLE t1 (c1 integer, c2 text)"
+
+
+class CheckMapTestCase(InputMapToSqlTestCase):
+    """Test stopping at the first difference between database and spec"""
+
+    def setUp(self):
+        super(CheckMapTestCase, self).setUp()
+        self.config_options(schemas=[], revert=False)
+
+    def table_map(self, coltype):
+        inmap = self.std_map()
+        inmap['schema sd'].update({'table t1': {
+            'columns': [{'c1': {'type': 'integer'}},
+                        {'c2': {'type': coltype}}]}})
+        return inmap
+
+    def test_matching(self):
+        "Report no differences for a matching database"
+        self.db.execute_commit(CREATE_STMT)
+        db = self.database()
+        assert db.check_map(self.table_map('text'),
+                            quote_reserved=False) is None
+
+    def test_altered_table(self):
+        "Report a table that needs to be altered"
+        self.db.execute_commit(CREATE_STMT)
+        db = self.database()
+        diff = db.check_map(self.table_map('varchar(16)'),
+                            quote_reserved=False)
+        assert diff == "table sd.t1: ALTER TABLE sd.t1"
+
+    def test_missing_table(self):
+        "Report a table that needs to be created"
+        db = self.database()
+        diff = db.check_map(self.table_map('text'), quote_reserved=False)
+        assert diff == "table sd.t1: CREATE TABLE sd.t1 ("
+
+    def test_extra_table(self):
+        "Report a table that needs to be dropped"
+        self.db.execute_commit(CREATE_STMT)
+        db = self.database()
+        diff = db.check_map(self.std_map(), quote_reserved=False)
+        assert diff == "table sd.t1: DROP TABLE sd.t1"
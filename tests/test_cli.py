@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Test running the utilities in-process"""
+
+import json
+import os
+from io import StringIO
+
+import pytest
+
+from pyrseas import cmdargs, dbtoyaml, yamltodb
+from pyrseas.lib.dbconn import DbConnection
+from pyrseas.testutils import PyrseasTestCase, TEST_DIR, fix_indent
+from pyrseas.yamlutil import yamldump, yamlload
+
+CREATE_STMT = "CREATE TABLE t1 (c1 integer, c2 text)"
+SPEC_FILE = os.path.join(TEST_DIR, 'cli-spec.yaml')
+CFG_FILE = os.path.join(TEST_DIR, 'cli-config.yaml')
+
+
+class InProcessTestCase(PyrseasTestCase):
+    """Test calling the main functions of the utilities"""
+
+    @pytest.fixture(autouse=True)
+    def _isolate(self, tmpdir, monkeypatch):
+        "Ignore the user configuration and that of the current directory"
+        monkeypatch.setenv("PYRSEAS_USER_CONFIG", tmpdir.strpath)
+        monkeypatch.setenv("PYRSEAS_CACHE_DIR", tmpdir.join('cache').strpath)
+        monkeypatch.chdir(tmpdir.strpath)
+        self.tmpdir = tmpdir
+
+    def setUp(self):
+        super(InProcessTestCase, self).setUp()
+        if not os.path.exists(TEST_DIR):
+            os.mkdir(TEST_DIR)
+        self.db.execute_commit(CREATE_STMT)
+
+    def tearDown(self):
+        for path in [SPEC_FILE, CFG_FILE]:
+            if os.path.exists(path):
+                os.remove(path)
+        super(InProcessTestCase, self).tearDown()
+
+    def args(self, *args):
+        dbc = self.cfg['database']
+        argv = ['--username=%s' % dbc['username']]
+        if dbc['host'] is not None:
+            argv.append('--host=%s' % dbc['host'])
+        if dbc['port'] is not None:
+            argv.append('--port=%d' % dbc['port'])
+        return argv + list(args) + [dbc['dbname']]
+
+    def dbtoyaml(self, *args):
+        out = StringIO()
+        dbtoyaml.main(argv=self.args('-O', '-x', *args), stdout=out)
+        return yamlload(out.getvalue())
+
+    def test_dbtoyaml(self):
+        "Write the map of a database to a stream"
+        dbmap = self.dbtoyaml()
+        assert dbmap['schema sd']['table t1'] == {'columns': [
+            {'c1': {'type': 'integer'}}, {'c2': {'type': 'text'}}]}
+
+    def test_config_not_shared(self):
+        "Do not carry over the configuration of an earlier run"
+        with open(CFG_FILE, 'w') as f:
+            f.write(yamldump({'datacopy': {'schema sd': ['t1']}}))
+        self.dbtoyaml('--config', CFG_FILE,
+                      '--repository', TEST_DIR)
+        assert 'datacopy' in cmdargs._cfg
+        self.dbtoyaml()
+        assert 'datacopy' not in cmdargs._cfg
+
+    def test_recording_not_shared(self):
+        "Save the query recording of a run and do not carry it over"
+        path = self.tmpdir.join('queries.rec')
+        self.dbtoyaml('--record-queries', path.strpath)
+        assert path.size() > 0
+        assert DbConnection.recorder is None
+
+    def test_profile_twice(self):
+        "Save the trace of each of two runs"
+        paths = [self.tmpdir.join('trace%d.json' % i) for i in range(2)]
+        for path in paths:
+            self.dbtoyaml('--profile', path.strpath)
+        for path in paths:
+            events = json.loads(path.read())['traceEvents']
+            assert 'fetch ClassDict' in [event['name'] for event in events]
+
+    def test_yamltodb(self):
+        "Write the statements to update a database to a stream"
+        dbmap = self.dbtoyaml()
+        dbmap['schema sd']['table t1']['columns'].append(
+            {'c3': {'type': 'date'}})
+        with open(SPEC_FILE, 'w') as f:
+            f.write(yamldump(dbmap))
+        out = StringIO()
+        argv = self.args()
+        assert yamltodb.main(argv=argv + [SPEC_FILE], stdout=out) is None
+        assert fix_indent(out.getvalue()) == \
+            "ALTER TABLE sd.t1 ADD COLUMN c3 date;\n\n"
+
+    def test_yamltodb_check(self):
+        "Return the exit status of a check"
+        dbmap = self.dbtoyaml()
+        with open(SPEC_FILE, 'w') as f:
+            f.write(yamldump(dbmap))
+        argv = self.args('--check')
+        assert yamltodb.main(argv=argv + [SPEC_FILE], stdout=StringIO()) == 0
+        del dbmap['schema sd']['table t1']
+        with open(SPEC_FILE, 'w') as f:
+            f.write(yamldump(dbmap))
+        out = StringIO()
+        assert yamltodb.main(argv=argv + [SPEC_FILE], stdout=out) == 1
+        assert out.getvalue().startswith(
+            "Database does not match the specification")
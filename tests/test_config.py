@@ -79,3 +79,40 @@ def test_repo_user_config(tmpdir):
     repof.write(yamldump(CFG_DATA))
     cfg = Config()
     assert cfg['datacopy'] == CFG_TABLE_DATA
+
+
+def test_cached_config(tmpdir, monkeypatch):
+    "Use the cached configuration if the files have not changed"
+    monkeypatch.setenv("PYRSEAS_CACHE_DIR", tmpdir.join('cache').strpath)
+    f = tmpdir.join(CFG_FILE)
+    f.write(yamldump(USER_CFG_DATA))
+    monkeypatch.setenv("PYRSEAS_USER_CONFIG", f.strpath)
+    cfg = Config()
+    assert len(tmpdir.join('cache', 'config').listdir()) == 1
+
+    def fail(stream):
+        raise AssertionError("configuration file parsed")
+    monkeypatch.setattr('pyrseas.yamlutil.yamlload', fail)
+    assert Config() == cfg
+
+
+def test_cached_config_changed(tmpdir, monkeypatch):
+    "Do not use the cached configuration if a file was modified"
+    monkeypatch.setenv("PYRSEAS_CACHE_DIR", tmpdir.join('cache').strpath)
+    f = tmpdir.join(CFG_FILE)
+    f.write(yamldump(USER_CFG_DATA))
+    monkeypatch.setenv("PYRSEAS_USER_CONFIG", f.strpath)
+    assert Config()['database'] == {'port': 5433}
+    f.write(yamldump({'database': {'port': 15433}}))
+    assert Config()['database'] == {'port': 15433}
+
+
+def test_cached_config_new_file(tmpdir, monkeypatch):
+    "Do not use the cached configuration if a repository file was added"
+    monkeypatch.setenv("PYRSEAS_CACHE_DIR", tmpdir.join('cache').strpath)
+    userf = tmpdir.join("usercfg.yaml")
+    userf.write(yamldump({'repository': {'path': tmpdir.strpath}}))
+    monkeypatch.setenv("PYRSEAS_USER_CONFIG", userf.strpath)
+    assert 'datacopy' not in Config()
+    tmpdir.join("config.yaml").write(yamldump(CFG_DATA))
+    assert Config()['datacopy'] == CFG_TABLE_DATA
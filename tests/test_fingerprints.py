@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Test server-side structural fingerprints"""
+
+from pyrseas.testutils import PyrseasTestCase
+
+CREATE_STMTS = ["CREATE TABLE t1 (c1 serial PRIMARY KEY, c2 text UNIQUE)",
+                "CREATE TABLE t2 (c1 integer REFERENCES t1, c2 text)",
+                "CREATE INDEX t2_idx ON t2 (c2)",
+                "CREATE VIEW v1 AS SELECT c1 FROM t2",
+                "COMMENT ON TABLE t1 IS 'Test table t1'"]
+
+
+class FingerprintTestCase(PyrseasTestCase):
+    """Test detecting schema drift with fingerprints"""
+
+    def create_objects(self):
+        for stmt in CREATE_STMTS:
+            self.db.execute(stmt)
+        self.db.conn.commit()
+
+    def test_unchanged(self):
+        "Report no drift for an unchanged database"
+        self.create_objects()
+        fingerprints = self.database().fingerprints()
+        assert 'schema sd' in fingerprints
+        assert 'database' in fingerprints
+        assert self.database().drifted_schemas(fingerprints) == []
+
+    def test_recreated(self):
+        "Report no drift when objects are dropped and recreated identically"
+        self.create_objects()
+        fingerprints = self.database().fingerprints()
+        self.db.clear()
+        self.create_objects()
+        assert self.database().fingerprints() == fingerprints
+
+    def test_changed_table(self):
+        "Report drift in the schema of an altered table"
+        self.create_objects()
+        self.db.execute_commit("CREATE SCHEMA s1")
+        fingerprints = self.database().fingerprints()
+        self.db.execute_commit("ALTER TABLE t2 ALTER COLUMN c2 SET NOT NULL")
+        assert self.database().drifted_schemas(fingerprints) == ['sd']
+
+    def test_new_schema(self):
+        "Report a schema that was not fingerprinted"
+        fingerprints = self.database().fingerprints()
+        self.db.execute_commit("CREATE SCHEMA s1")
+        assert self.database().drifted_schemas(fingerprints) == ['s1']
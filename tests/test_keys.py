@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""Test the saved keys and hashes of database objects"""
+
+import pickle
+
+from pyrseas.dbobject.column import Column
+from pyrseas.dbobject.table import Table
+
+
+def test_key_saved():
+    "Compute the key of an object only once"
+    tbl = Table('t1', 'sd', None, 'postgres', [])
+    assert tbl.key() == ('sd', 't1')
+    tbl.name = 't2'
+    assert tbl.key() == ('sd', 't1')
+
+
+def test_reset_key():
+    "Recompute the key and hash of a renamed object"
+    tbl = Table('t1', 'sd', None, 'postgres', [])
+    objs = {tbl}
+    tbl.name = 't2'
+    tbl.reset_key()
+    assert tbl.key() == ('sd', 't2')
+    assert hash(tbl) == hash((Table, ('sd', 't2')))
+    assert tbl not in objs
+    assert tbl in {Table('t2', 'sd', None, 'postgres', [])}
+
+
+def test_unpickled_hash():
+    "Discard the hash of an unpickled object, computed by another process"
+    col = Column('c1', 'sd', 't1', 1, 'integer')
+    col._hash = 12345
+    newcol = pickle.loads(pickle.dumps(col))
+    assert newcol.key() == ('sd', 't1')
+    assert hash(newcol) == hash((Column, ('sd', 't1')))
+    assert newcol == col
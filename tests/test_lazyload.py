@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""Test loading the objects of selected schemas from the catalogs"""
+
+from pyrseas.testutils import PyrseasTestCase
+
+CREATE_STMTS = ["CREATE SCHEMA s1", "CREATE SCHEMA s2", "CREATE SCHEMA s3",
+                "CREATE SCHEMA s4",
+                "CREATE TABLE s2.t2 (c1 integer PRIMARY KEY, c2 text)",
+                "CREATE TABLE s1.t1 (c1 integer REFERENCES s2.t2, c2 text)",
+                "CREATE VIEW s1.v1 AS SELECT c1 FROM s1.t1",
+                "CREATE TABLE s3.t3 (c1 integer, c2 text)"]
+
+
+class LoadSchemasTestCase(PyrseasTestCase):
+    """Test fetching catalog objects per schema"""
+
+    def setUp(self):
+        super(LoadSchemasTestCase, self).setUp()
+        for stmt in CREATE_STMTS:
+            self.db.execute(stmt)
+        self.db.conn.commit()
+
+    def test_load_schema(self):
+        "Load the objects of a schema and of the schemas it references"
+        db = self.database()
+        db.load_schemas(['s1'])
+        assert sorted(db.db.schemas.keys()) == ['s1', 's2']
+        assert sorted(db.db.tables.keys()) == [('s1', 't1'), ('s1', 'v1'),
+                                               ('s2', 't2')]
+        assert [col.name for col in db.db.tables[('s1', 't1')].columns] == \
+            ['c1', 'c2']
+        assert db.db.tables[('s1', 't1')] in \
+            db.db.tables[('s1', 'v1')].depends_on
+
+    def test_load_schema_depends(self):
+        "Load the schemas of objects that a view and a default depend on"
+        self.db.execute("CREATE VIEW s1.v3 AS SELECT c1 FROM s3.t3")
+        self.db.execute("CREATE FUNCTION s4.f1() RETURNS integer "
+                        "LANGUAGE sql AS 'SELECT 1'")
+        self.db.execute("ALTER TABLE s3.t3 ALTER c1 SET DEFAULT s4.f1()")
+        self.db.conn.commit()
+        db = self.database()
+        db.load_schemas(['s1'])
+        assert sorted(db.db.schemas.keys()) == ['s1', 's2', 's3', 's4']
+        assert ('s4', 'f1', '') in db.db.functions
+
+    def test_load_more_schemas(self):
+        "Fetch only the schemas not loaded by an earlier call"
+        db = self.database()
+        db.load_schemas(['s1'])
+        fetched = set(key[1] for key in db.dbconn._schema_rows)
+        assert fetched == set(['s1', 's2'])
+        db.load_schemas(['s3'])
+        assert sorted(db.db.schemas.keys()) == ['s1', 's2', 's3']
+        assert ('s3', 't3') in db.db.tables
+
+    def test_commit_invalidates(self):
+        "Discard the memoized catalog rows when committing"
+        query = """SELECT nspname AS schema, relname FROM pg_class c
+                   JOIN pg_namespace n ON (relnamespace = n.oid)
+                   WHERE relkind = 'r' ORDER BY relname"""
+        dbconn = self.database().dbconn
+        rows = dbconn.fetch_schema_rows(query, 'schema', ['s3'])
+        assert [row['relname'] for row in rows] == ['t3']
+        dbconn.execute("CREATE TABLE s3.t4 (c1 integer)")
+        dbconn.commit()
+        rows = dbconn.fetch_schema_rows(query, 'schema', ['s3', 's2'])
+        assert [row['relname'] for row in rows] == ['t3', 't4', 't2']
+
+    def test_diff_schema(self):
+        "Compare only a selected schema against an input map"
+        self.config_options(schemas=['s3'], revert=False)
+        inmap = {'schema s3': {'table t3': {
+            'columns': [{'c1': {'type': 'integer'}},
+                        {'c2': {'type': 'text'}}]}}}
+        assert self.database().diff_map(inmap, quote_reserved=False) == []
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Test sharing pooled database connections"""
+
+import pickle
+
+from pyrseas.lib import dbconn
+from pyrseas.testutils import PyrseasTestCase
+
+CREATE_STMT = "CREATE TABLE t1 (c1 integer, c2 text)"
+
+
+class ConnectionPoolTestCase(PyrseasTestCase):
+    """Test taking catalog connections from a shared pool"""
+
+    def setUp(self):
+        if dbconn.ConnectionPool is None:
+            self.skipTest("The psycopg_pool module is not installed")
+        super(ConnectionPoolTestCase, self).setUp()
+        self.cfg['database']['pool'] = {'max_size': 1}
+
+    def tearDown(self):
+        dbconn.close_pools()
+        super(ConnectionPoolTestCase, self).tearDown()
+
+    def backend_pid(self, db):
+        pid = db.dbconn.fetchone("SELECT pg_backend_pid() AS pid")['pid']
+        db.dbconn.close()
+        return pid
+
+    def test_shared_pool(self):
+        "Share a pool between databases with the same connection string"
+        db1 = self.database()
+        db2 = self.database()
+        assert db1.dbconn.pool is db2.dbconn.pool
+        assert self.backend_pid(db1) == self.backend_pid(db2)
+
+    def test_reuse_after_catalog(self):
+        "Reuse the connection used to query the catalogs"
+        self.db.execute_commit(CREATE_STMT)
+        db = self.database()
+        db.from_catalog()
+        assert ('sd', 't1') in db.db.tables
+        assert self.backend_pid(db) == self.backend_pid(self.database())
+
+    def test_reset_search_path(self):
+        "Reset the session settings of a returned connection"
+        db = self.database()
+        db.dbconn.execute("SET search_path TO pg_catalog")
+        db.dbconn.commit()
+        db.dbconn.close()
+        dbc = dbconn.DbConnection(self.db.name, self.db.user, None,
+                                  self.db.host, self.db.port,
+                                  db.dbconn.pool)
+        row = dbc.fetchone("SHOW search_path")
+        dbc.close()
+        assert row['search_path'] != 'pg_catalog'
+
+    def test_pickle(self):
+        "Do not save the pool when pickling a connection"
+        db = self.database()
+        db.dbconn.fetchone("SELECT 1")
+        dbc = pickle.loads(pickle.dumps(db.dbconn))
+        db.dbconn.close()
+        assert dbc.pool is None and dbc.conn is None
+
+    def test_params(self):
+        "Connect with the plain parameters of a pooled connection"
+        db = self.database()
+        dbc = dbconn.DbConnection(**db.dbconn.params())
+        assert dbc.pool is None
+        assert dbc.conninfo() == db.dbconn.conninfo()
+        assert dbc.fetchone("SELECT current_database() AS db")['db'] == \
+            self.db.name
+        dbc.close()
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Test collecting catalog query statistics"""
+
+import json
+
+from pyrseas.lib.qstats import QueryStats, fingerprint
+from pyrseas.testutils import PyrseasTestCase
+
+CREATE_STMT = "CREATE TABLE t1 (c1 integer PRIMARY KEY, c2 text)"
+
+
+class QueryStatsTestCase(PyrseasTestCase):
+    """Test recording statistics of the queries of a connection"""
+
+    def test_catalog_queries(self):
+        "Record the catalog queries by issuing class and object class"
+        self.db.execute_commit(CREATE_STMT)
+        db = self.database()
+        db.dbconn.stats = QueryStats()
+        db.from_catalog()
+        stats = dict((e['name'], e) for e in db.dbconn.stats.ranked())
+        assert stats['ColumnDict.fetchall(Column)']['calls'] == 1
+        assert stats['ColumnDict.fetchall(Column)']['rows'] >= 2
+        assert stats['ColumnDict.fetchall(Column)']['bytes'] > 0
+        assert stats['ConstraintDict.fetchall(PrimaryKey)']['rows'] >= 1
+        assert stats['ConstraintDict.fetchall(ForeignKey)']['calls'] == 1
+        deps = [name for name in stats
+                if name.startswith('Database._build_dependency_graph[')]
+        assert len(deps) == 3
+        assert 'CatDbConnection' not in ' '.join(stats)
+
+    def test_fetchone(self):
+        "Record the time spent receiving and decoding a row"
+        db = self.database()
+        db.dbconn.connect()
+        db.dbconn.stats = QueryStats()
+        db.dbconn.fetchone("SELECT 'abc' AS x")
+        db.dbconn.close()
+        [entry] = db.dbconn.stats.ranked()
+        assert entry['name'] == 'QueryStatsTestCase.test_fetchone[%s]' % (
+            fingerprint("SELECT 'abc' AS x"))
+        assert (entry['calls'], entry['rows'], entry['bytes']) == (1, 1, 3)
+        assert entry['server_time'] > 0 and entry['decode_time'] > 0
+
+    def test_report(self):
+        "Rank the statistics by total time"
+        stats = QueryStats()
+        stats.record('A.fetchall', 10, 100, 0.001, 0.001)
+        stats.record('B.fetchall', 5, 50, 0.002, 0.001)
+        stats.record('A.fetchall', 10, 100, 0.001, 0.001)
+        lines = stats.report().split('\n')
+        assert [line.split()[0] for line in lines] == [
+            'query', 'A.fetchall', 'B.fetchall', 'total']
+        assert lines[-1].split()[1:4] == ['3', '25', '250']
+        assert json.loads(stats.to_json())[0]['calls'] == 2
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Test recording catalog queries and replaying them without a server"""
+
+import json
+import os
+
+from pyrseas.database import Database, ReplayDbConnection
+from pyrseas.lib.dbconn import DbConnection
+from pyrseas.lib.replay import QueryRecorder
+from pyrseas.testutils import InputMapToSqlTestCase, TEST_DIR
+
+CREATE_STMTS = ["CREATE SCHEMA s1",
+                "CREATE TABLE t1 (c1 integer PRIMARY KEY, c2 text)",
+                "CREATE TABLE s1.t2 (c1 integer REFERENCES t1, c2 text)",
+                "CREATE VIEW v1 AS SELECT c1 FROM t1"]
+RECORD_FILE = os.path.join(TEST_DIR, 'queries.json')
+
+
+class ReplayTestCase(InputMapToSqlTestCase):
+    """Test serving recorded catalog query results"""
+
+    def setUp(self):
+        super(ReplayTestCase, self).setUp()
+        self.config_options(schemas=[], tables=[], no_owner=True,
+                            no_privs=True, multiple_files=False,
+                            revert=False)
+        for stmt in CREATE_STMTS:
+            self.db.execute(stmt)
+        self.db.conn.commit()
+
+    def tearDown(self):
+        DbConnection.recorder = None
+        if os.path.exists(RECORD_FILE):
+            os.remove(RECORD_FILE)
+        super(ReplayTestCase, self).tearDown()
+
+    def input_map(self):
+        inmap = self.std_map()
+        inmap['schema sd'].update({'table t1': {
+            'columns': [{'c1': {'type': 'integer', 'not_null': True}},
+                        {'c2': {'type': 'text'}}, {'c3': {'type': 'date'}}],
+            'primary_key': {'t1_pkey': {'columns': ['c1']}}}})
+        return inmap
+
+    def record(self, func):
+        DbConnection.recorder = QueryRecorder()
+        result = func(self.database())
+        DbConnection.recorder.save(RECORD_FILE)
+        DbConnection.recorder = None
+        return result
+
+    def replay_database(self):
+        return Database(self.cfg, ReplayDbConnection(RECORD_FILE))
+
+    def test_to_map(self):
+        "Map the recorded catalogs as the live ones"
+        dbmap = self.record(lambda db: db.to_map(quote_reserved=False))
+        self.db.execute_commit("DROP VIEW v1")
+        db = self.replay_database()
+        assert db.to_map(quote_reserved=False) == dbmap
+        assert db.dbconn.version == self.db.version
+
+    def test_diff_map(self):
+        "Generate the same statements from the recorded catalogs"
+        stmts = self.record(lambda db: db.diff_map(self.input_map()))
+        assert "DROP TABLE s1.t2" in stmts
+        assert self.replay_database().diff_map(self.input_map()) == stmts
+
+    def test_selected_schemas(self):
+        "Replay the catalog queries of selected schemas"
+        self.config_options(schemas=['sd'], revert=False)
+        stmts = self.record(lambda db: db.diff_map(self.input_map(),
+                                                   quote_reserved=False))
+        assert "DROP VIEW sd.v1" in stmts
+        assert self.replay_database().diff_map(
+            self.input_map(), quote_reserved=False) == stmts
+
+    def test_not_recorded(self):
+        "Fail on a query that was not recorded"
+        self.record(lambda db: db.from_catalog())
+        with self.assertRaises(KeyError):
+            self.replay_database().dbconn.fetchone("SELECT 1")
+
+    def test_data_file(self):
+        "Save the recorded rows as JSON data"
+        self.record(lambda db: db.from_catalog())
+        with open(RECORD_FILE, 'rb') as f:
+            f.readline()
+            recording = json.loads(f.read().decode('utf-8'))
+        assert recording['version'] == self.db.version
+        assert len(recording['queries']) > 0
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""Test catalog snapshots"""
+
+import json
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from pyrseas.lib import binfile
+from pyrseas.testutils import InputMapToSqlTestCase
+
+CREATE_STMTS = ["CREATE TABLE t1 (c1 integer PRIMARY KEY, c2 text)",
+                "CREATE TABLE t2 (c1 integer REFERENCES t1, c2 text)",
+                "CREATE VIEW v1 AS SELECT c1 FROM t2"]
+
+
+class SnapshotTestCase(InputMapToSqlTestCase):
+    """Test diffing a YAML spec against a saved catalog snapshot"""
+
+    def setUp(self):
+        super(SnapshotTestCase, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'test.snapshot')
+        self.config_options(schemas=[], revert=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        super(SnapshotTestCase, self).tearDown()
+
+    def base_map(self):
+        inmap = self.std_map()
+        inmap['schema sd'].update({'table t1': {
+            'columns': [{'c1': {'type': 'integer', 'not_null': True}},
+                        {'c2': {'type': 'text'}}],
+            'primary_key': {'t1_pkey': {'columns': ['c1']}}}})
+        return inmap
+
+    def test_diff_against_snapshot(self):
+        "Generate the same SQL from a snapshot as from the catalogs"
+        for stmt in CREATE_STMTS:
+            self.db.execute(stmt)
+        self.db.conn.commit()
+        db = self.database()
+        db.save_snapshot(self.path)
+        sql = self.database().diff_map(self.base_map(), quote_reserved=False)
+        assert "DROP TABLE sd.t2" in sql
+        # connecting to a non-existent database would fail
+        self.cfg['database']['dbname'] = 'pyrseas_no_such_db'
+        db = self.database()
+        db.load_snapshot(self.path)
+        assert db.diff_map(self.base_map()) == sql
+
+    def test_incompatible_snapshot(self):
+        "Reject a file that is not a catalog snapshot"
+        with open(self.path, 'wb') as f:
+            f.write(b"schema sd: {}\n")
+        with pytest.raises(ValueError):
+            self.database().load_snapshot(self.path)
+
+    def test_snapshot_is_data(self):
+        "Save the catalog rows as JSON data"
+        db = self.database()
+        db.save_snapshot(self.path)
+        with open(self.path, 'rb') as f:
+            f.readline()
+            snap = json.loads(f.read().decode('utf-8'))
+        assert snap['version'] == db.dbconn.version
+        assert len(snap['queries']) > 0
+
+    def test_pickled_snapshot(self):
+        "Reject a snapshot file that is not plain data"
+        binfile.save(self.path, 'snapshot', {'queries': []})
+        with pytest.raises(ValueError):
+            self.database().load_snapshot(self.path)
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Test the compiled specification cache"""
+
+import os
+import shutil
+import tempfile
+
+from pyrseas.testutils import InputMapToSqlTestCase, fix_indent
+from pyrseas.yamlutil import yamldump
+
+CREATE_STMT = "CREATE TABLE t1 (c1 integer, c2 text)"
+
+
+class SpecCacheTestCase(InputMapToSqlTestCase):
+    """Test caching of the linked objects built from a YAML spec"""
+
+    def setUp(self):
+        super(SpecCacheTestCase, self).setUp()
+        self.cachedir = tempfile.mkdtemp()
+        self.prevdir = os.environ.get("PYRSEAS_CACHE_DIR")
+        os.environ["PYRSEAS_CACHE_DIR"] = self.cachedir
+        self.config_options(schemas=[], revert=False)
+
+    def tearDown(self):
+        if self.prevdir is None:
+            del os.environ["PYRSEAS_CACHE_DIR"]
+        else:
+            os.environ["PYRSEAS_CACHE_DIR"] = self.prevdir
+        shutil.rmtree(self.cachedir)
+        super(SpecCacheTestCase, self).tearDown()
+
+    def table_map(self, coltype):
+        inmap = self.std_map()
+        inmap['schema sd'].update({'table t1': {
+            'columns': [{'c1': {'type': 'integer'}},
+                        {'c2': {'type': coltype}}]}})
+        return inmap
+
+    def test_cached_spec(self):
+        "Generate the same SQL from a cached compiled spec"
+        self.db.execute_commit(CREATE_STMT)
+        inmap = self.table_map('varchar(16)')
+        spec = yamldump(inmap)
+        db = self.database()
+        assert not db.load_spec_cache(spec)
+        sql = db.diff_map(inmap, quote_reserved=False)
+        db = self.database()
+        assert db.load_spec_cache(spec)
+        assert db.diff_map(None, quote_reserved=False) == sql
+        assert fix_indent(sql[0]) == \
+            "ALTER TABLE sd.t1 ALTER COLUMN c2 TYPE varchar(16)"
+
+    def test_changed_spec(self):
+        "Do not use the cache for a different spec"
+        self.db.execute_commit(CREATE_STMT)
+        db = self.database()
+        inmap = self.table_map('text')
+        db.load_spec_cache(yamldump(inmap))
+        assert db.diff_map(inmap, quote_reserved=False) == []
+        inmap = self.table_map('varchar(16)')
+        db = self.database()
+        assert not db.load_spec_cache(yamldump(inmap))
+
+    def test_changed_schemas(self):
+        "Do not use the cache when a different set of schemas is selected"
+        inmap = self.table_map('text')
+        spec = yamldump(inmap)
+        db = self.database()
+        db.load_spec_cache(spec)
+        db.diff_map(inmap, quote_reserved=False)
+        self.config_options(schemas=['sd'], revert=False)
+        db = self.database()
+        assert not db.load_spec_cache(spec)
+
+    def test_metadata_dir_digest(self):
+        "Digest only the YAML files of a metadata directory"
+        mddir = os.path.join(self.cachedir, 'metadata')
+        os.makedirs(os.path.join(mddir, 'schema.sd'))
+        for (path, text) in [('schema.sd.yaml', "schema sd: {}\n"),
+                             ('schema.sd/table.t1.yaml',
+                              "table t1:\n  columns:\n  - c1: integer\n"),
+                             ('schema.sd/table.t1.data', "1\n"),
+                             ('datacopy.manifest', "x\n")]:
+            with open(os.path.join(mddir, path), 'w') as f:
+                f.write(text)
+        self.cfg.merge({'files': {'metadata_path': mddir}})
+        db = self.database()
+        digest = db.spec_digest()
+        with open(os.path.join(mddir, 'schema.sd', 'table.t1.data'),
+                  'w') as f:
+            f.write("2\n")
+        assert db.spec_digest() == digest
+        with open(os.path.join(mddir, 'schema.sd', 'table.t1.yaml'),
+                  'a') as f:
+            f.write("  - c2: text\n")
+        assert db.spec_digest() != digest
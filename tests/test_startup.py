@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Test that the command line utilities start without loading unneeded
+modules"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import pyrseas
+from pyrseas.database import DICT_CLASSES, dict_class
+
+HEAVY_MODULES = ('psycopg', 'pyrseas.database', 'pyrseas.dbobject')
+
+LOADED_MODULES = """
+import sys
+sys.argv = ['%(prog)s', '--help']
+from pyrseas import %(prog)s
+try:
+    %(prog)s.main()
+except SystemExit:
+    pass
+print(' '.join(sys.modules))
+"""
+
+
+def loaded_modules(code):
+    "Run code in a new interpreter and return the modules it loaded"
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(
+        os.path.dirname(pyrseas.__file__)))
+    out = subprocess.run([sys.executable, '-c', code], check=True, env=env,
+                         stdout=subprocess.PIPE, universal_newlines=True)
+    return out.stdout.split('\n')[-2].split()
+
+
+@pytest.mark.parametrize('prog', ['dbtoyaml', 'yamltodb', 'dbaugment'])
+def test_help(prog):
+    "Print the help of a utility without loading the catalog modules"
+    mods = loaded_modules(LOADED_MODULES % {'prog': prog})
+    assert 'pyrseas.cmdargs' in mods
+    assert [mod for mod in mods if mod.startswith(HEAVY_MODULES)] == []
+
+
+def test_import_database():
+    "Import the database module without the object type modules"
+    mods = loaded_modules("import sys\nimport pyrseas.database\n"
+                          "print(' '.join(sys.modules))\n")
+    assert 'pyrseas.dbobject' in mods
+    assert 'pyrseas.dbobject.table' not in mods
+    assert 'pyrseas.dbobject.function' not in mods
+
+
+def test_dict_classes():
+    "Resolve the class of each Database.Dicts member"
+    for (attr, module, clsname) in DICT_CLASSES:
+        cls = dict_class(attr)
+        assert cls.__name__ == clsname
+        assert cls.__module__ == 'pyrseas.dbobject.' + module
+
+
+def test_dict_class_unknown():
+    "Error resolving an unknown Database.Dicts member"
+    with pytest.raises(KeyError):
+        dict_class('widgets')
+
+
+def test_dicts_lazy():
+    "Import the module of a Database.Dicts member only on first use"
+    mods = loaded_modules("import sys\nfrom pyrseas.database import Database\n"
+                          "db = Database.Dicts()\nassert len(db.casts) == 0\n"
+                          "print(' '.join(sys.modules))\n")
+    assert 'pyrseas.dbobject.cast' in mods
+    assert 'pyrseas.dbobject.table' not in mods
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Test recording processing phases in a trace file"""
+
+import json
+import os
+import threading
+
+from pyrseas.lib import trace
+from pyrseas.testutils import InputMapToSqlTestCase, TEST_DIR
+
+CREATE_STMT = "CREATE TABLE t1 (c1 integer, c2 text)"
+TRACE_FILE = os.path.join(TEST_DIR, 'trace.json')
+
+
+class TraceTestCase(InputMapToSqlTestCase):
+    """Test recording the phases of catalog extraction and diffing"""
+
+    def setUp(self):
+        super(TraceTestCase, self).setUp()
+        self.config_options(schemas=[], revert=False)
+        trace.start()
+
+    def tearDown(self):
+        trace.stop()
+        if os.path.exists(TRACE_FILE):
+            os.remove(TRACE_FILE)
+        super(TraceTestCase, self).tearDown()
+
+    def test_diff_phases(self):
+        "Record the phases of comparing a database to a spec"
+        self.db.execute_commit(CREATE_STMT)
+        inmap = self.std_map()
+        inmap['schema sd'].update({'table t1': {
+            'columns': [{'c1': {'type': 'integer'}},
+                        {'c2': {'type': 'text'}}]}})
+        self.database().diff_map(inmap, quote_reserved=False)
+        names = [event['name'] for event in trace.events()]
+        for name in ['connect', 'fetch ClassDict', '_build_dependency_graph',
+                     '_link_refs', 'from_map', 'dep_sorted',
+                     'generate statements']:
+            assert name in names
+        assert names.index('fetch ClassDict') < names.index('from_map')
+
+    def test_nested_phases(self):
+        "Include the duration and memory of nested phases"
+        with trace.phase("outer"):
+            with trace.phase("inner", table='t1'):
+                data = [str(i) for i in range(10000)]
+            del data
+        (inner, outer) = trace.events()
+        assert inner['args']['table'] == 't1'
+        assert outer['ts'] <= inner['ts']
+        assert outer['ts'] + outer['dur'] >= inner['ts'] + inner['dur']
+        assert outer['args']['peak_kb'] >= inner['args']['peak_kb'] > 0
+
+    def test_thread_phases(self):
+        "Record the peak memory only for the phases of the main thread"
+        def copy_table():
+            with trace.phase("copy"):
+                pass
+        thread = threading.Thread(target=copy_table)
+        with trace.phase("export"):
+            thread.start()
+            thread.join()
+        (copy, export) = trace.events()
+        assert 'peak_kb' not in copy['args']
+        assert 'cpu_ms' in copy['args']
+        assert 'peak_kb' in export['args']
+
+    def test_save(self):
+        "Save the phases in Chrome trace event format"
+        with trace.phase("outer"):
+            pass
+        trace.save(TRACE_FILE)
+        with open(TRACE_FILE) as f:
+            events = json.load(f)['traceEvents']
+        assert [(e['name'], e['ph']) for e in events] == [('outer', 'X')]
+        assert 'cpu_ms' in events[0]['args']